@@ -1,14 +1,15 @@
-from flask import Flask, render_template, jsonify, request, url_for, session, redirect, flash
+from flask import Flask, render_template, jsonify, request, url_for, session, redirect, flash, send_from_directory
 from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity, set_access_cookies, unset_jwt_cookies
-from flask_wtf.csrf import CSRFProtect
+from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity, set_access_cookies, unset_jwt_cookies, current_user, decode_token
+from flask_wtf.csrf import CSRFProtect, validate_csrf
+from wtforms.validators import ValidationError
 from werkzeug.middleware.proxy_fix import ProxyFix
-from werkzeug.utils import secure_filename
 from functools import wraps
 import os
 import json
 from urllib.parse import unquote, quote
 from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import func
 from flask_migrate import Migrate
@@ -23,7 +24,9 @@ from firebase_admin import credentials, auth as firebase_auth
 
 # Local imports
 from database import db
-from models import User, Pandit, PujaMaterial, Testimonial, Bundle, Admin, Booking, Order, OrderItem, OTP, Temple, TemplePuja
+from hashing import password_hasher, HashingOverloaded
+from models import User, Pandit, PujaMaterial, Testimonial, Bundle, Admin, Booking, Order, OrderItem, Temple, TemplePuja
+from services import payment_events, payment_intents, TimeoutSession, apply_captured_payments, create_kv, otp_store, rate_limiter, RateLimitExceeded, firebase_tokens, user_loader, token_revocation, login_identities, normalize_phone, national_phone, fragment_cache, catalog_version, image_variants, create_storage, is_content_key, IMMUTABLE_CACHE_CONTROL, receive_file, UploadRejected, static_assets, response_compression, StreamedQuery, stream_page, read_replicas, engine_options, pool_stats, cart_store, CartError
 
 # Load environment variables
 load_dotenv(override=True)
@@ -50,21 +53,35 @@ config_dict = {
 }
 
 # Only add connection pooling for PostgreSQL/MySQL (not SQLite)
+# DB_POOL=queue keeps (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections per worker at most;
+# DB_POOL=null leaves pooling to PgBouncer in transaction mode (see services/db_pool.py)
 if not database_url.startswith('sqlite'):
-    config_dict['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_pre_ping': True,
-        'pool_recycle': 300,
-        'pool_size': 10,
-        'max_overflow': 20
-    }
+    config_dict['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+        database_url,
+        strategy=os.getenv("DB_POOL", "queue"),
+        size=int(os.getenv("DB_POOL_SIZE", 5)),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 5)),
+        timeout=int(os.getenv("DB_POOL_TIMEOUT", 30)),
+        recycle=int(os.getenv("DB_POOL_RECYCLE", 300)),
+    )
+
+# Read replicas (comma-separated URLs): GET requests read from one of them, see services/replicas.py
+replica_urls = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(',') if url.strip()]
+if replica_urls:
+    config_dict['SQLALCHEMY_BINDS'] = {f'replica_{i}': url for i, url in enumerate(replica_urls)}
 
 app.config.update(
     **config_dict,
+    DB_POOL=os.getenv("DB_POOL", "queue"),
+    READ_YOUR_WRITES_SECONDS=int(os.getenv("READ_YOUR_WRITES_SECONDS", 10)),  # keep above replica lag
     JWT_SECRET_KEY=os.getenv("JWT_SECRET_KEY"),
     SECRET_KEY=os.getenv("SECRET_KEY", "dev-secret-key-change-in-production"),
     UPLOAD_FOLDER=os.path.join(os.path.abspath(os.path.dirname(__file__)), 'static/uploads'),
     ALLOWED_EXTENSIONS={'png', 'jpg', 'jpeg', 'gif'},
     MAX_CONTENT_LENGTH=16 * 1024 * 1024,  # 16MB file size limit
+    # Per-route upload limits, enforced while the file streams in (see services/uploads.py)
+    UPLOAD_MAX_SIZE=int(os.getenv("UPLOAD_MAX_SIZE", 5 * 1024 * 1024)),
+    ADMIN_UPLOAD_MAX_SIZE=int(os.getenv("ADMIN_UPLOAD_MAX_SIZE", 10 * 1024 * 1024)),
     # JWT Cookie Configuration (enables direct page navigation for protected routes)
     JWT_TOKEN_LOCATION=['headers', 'cookies'],
     JWT_COOKIE_SECURE=not os.getenv("FLASK_DEBUG"),  # HTTPS only in production
@@ -75,8 +92,38 @@ app.config.update(
     FIREBASE_API_KEY=os.getenv("FIREBASE_API_KEY", ""),
     FIREBASE_AUTH_DOMAIN=os.getenv("FIREBASE_AUTH_DOMAIN", ""),
     FIREBASE_PROJECT_ID=os.getenv("FIREBASE_PROJECT_ID", ""),
+    # Google's ID-token signing certs (point at scripts/fake_firebase_keys.py locally)
+    FIREBASE_CERTS_URL=os.getenv("FIREBASE_CERTS_URL", "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"),
+    # Shared key-value store for OTPs (memory:// is per worker; use Redis with several workers)
+    REDIS_URL=os.getenv("REDIS_URL", "memory://"),
+    RATELIMIT_ENABLED=os.getenv("RATELIMIT_ENABLED", "true").lower() != "false",
+    # Password hashing (pick the cost with scripts/bench_bcrypt_cost.py)
+    BCRYPT_LOG_ROUNDS=int(os.getenv("BCRYPT_LOG_ROUNDS", 12)),
+    PASSWORD_VERIFY_CACHE_TTL=int(os.getenv("PASSWORD_VERIFY_CACHE_TTL", 0)),  # seconds, 0 disables
+    # Response compression (pick the levels with scripts/bench_compression.py)
+    COMPRESS_ENABLED=os.getenv("COMPRESS_ENABLED", "true").lower() != "false",
+    COMPRESS_BROTLI_QUALITY=int(os.getenv("COMPRESS_BROTLI_QUALITY", 4)),
+    COMPRESS_GZIP_LEVEL=int(os.getenv("COMPRESS_GZIP_LEVEL", 6)),
+    # Templates: no per-render mtime checks outside debug; compiled code filled by build_templates.py
+    TEMPLATES_AUTO_RELOAD=bool(os.getenv("FLASK_DEBUG")),
+    JINJA_BYTECODE_CACHE_DIR=os.getenv("JINJA_BYTECODE_CACHE_DIR", os.path.join(os.path.abspath(os.path.dirname(__file__)), '.jinja_cache')),
+    # {% cache %} fragments are keyed by release (falls back to a digest of the templates)
+    FRAGMENT_CACHE_VERSION=os.getenv("DEPLOY_VERSION") or os.getenv("RAILWAY_GIT_COMMIT_SHA", ""),
+    # Uploads: local:// keeps them in UPLOAD_FOLDER, s3://bucket/prefix uses S3 (or MinIO via S3_ENDPOINT_URL)
+    UPLOAD_STORAGE_URL=os.getenv("UPLOAD_STORAGE_URL", "local://"),
+    S3_ENDPOINT_URL=os.getenv("S3_ENDPOINT_URL"),
+    S3_PUBLIC_URL=os.getenv("S3_PUBLIC_URL"),
+    S3_REGION=os.getenv("S3_REGION"),
 )
 
+# Load compiled templates from the bytecode cache instead of parsing them in every new worker
+if app.config['JINJA_BYTECODE_CACHE_DIR']:
+    try:
+        os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
+    except OSError as e:
+        print(f"WARNING: Jinja bytecode cache disabled: {str(e)}")
+
 # Initialize OAuth AFTER app configuration
 if os.getenv("FLASK_DEBUG"):
     app.config['SESSION_COOKIE_SECURE'] = False
@@ -96,12 +143,17 @@ google = oauth.register(
 
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
+RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET")  # Dashboard > Webhooks secret
 
 if not RAZORPAY_KEY_ID or not RAZORPAY_KEY_SECRET:
     raise ValueError("Razorpay keys not set in environment variables")
 
-# Intialise Razorpay Client
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+# Intialise Razorpay Client (RAZORPAY_API_BASE points it at scripts/fake_razorpay.py locally)
+razorpay_options = {'base_url': os.getenv("RAZORPAY_API_BASE")} if os.getenv("RAZORPAY_API_BASE") else {}
+# Every API call gives up after RAZORPAY_TIMEOUT seconds (the client sets no timeout of its own)
+RAZORPAY_TIMEOUT = float(os.getenv("RAZORPAY_TIMEOUT", "10"))
+razorpay_client = razorpay.Client(session=TimeoutSession(RAZORPAY_TIMEOUT), auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET),
+                                  **razorpay_options)
 
 # Configure Flask-Mail (AWS SES SMTP)
 app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'email-smtp.ap-south-1.amazonaws.com')
@@ -117,9 +169,34 @@ mail = Mail(app)
 
 db.init_app(app) # Initialize database
 migrate = Migrate(app, db) # Initialize Flask-Migrate AFTER db
+read_replicas.init_app(app)  # GET reads from DATABASE_REPLICA_URLS; writes and writers stay on the primary
 bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
 csrf = CSRFProtect(app)
+password_hasher.init_app(app)  # bcrypt runs in a process pool, not the request thread
+kv_store = create_kv(app.config['REDIS_URL'])
+upload_storage = create_storage(  # Uploads stored once per content hash
+    app.config['UPLOAD_STORAGE_URL'],
+    app.config['UPLOAD_FOLDER'],
+    endpoint_url=app.config['S3_ENDPOINT_URL'],
+    public_url=app.config['S3_PUBLIC_URL'],
+    region=app.config['S3_REGION']
+)
+otp_store.init_app(app, kv_store)  # Email OTPs expire in the store, not the database
+rate_limiter.init_app(app, kv_store)  # Auth/OTP throttling shared through the same store
+fragment_cache.init_app(app, kv_store)  # {% cache %} blocks for the static parts of pages
+cart_store.init_app(app, kv_store)  # Server-side carts: priced line snapshots behind a cart_id cookie
+pool_stats.init_app(app, kv_store)  # Per-worker DB pool waits/checkouts/overflow, gathered at /admin/db-pool
+catalog_version.init_app(app)  # ETag/304 for pages built from catalog tables
+image_variants.init_app(app)  # Resized AVIF/WebP copies of images, used by picture() in templates
+static_assets.init_app(app)  # url_for('static') -> fingerprinted, precompressed copies from build_assets.py
+response_compression.init_app(app)  # brotli/gzip for HTML and JSON, per Accept-Encoding
+firebase_tokens.init_app(app)  # Firebase ID tokens verified against cached Google certs
+user_loader.init_app(app)  # Short-lived cache behind jwt current_user
+login_identities.init_app(app)  # email/username/phone -> user in one probe
+token_revocation.init_app(app)  # Logged-out tokens, checked through a bloom filter
+payment_events.init_app(app)  # Background consumer for Razorpay webhooks
+payment_intents.init_app(app, razorpay_client)  # Reuses Razorpay orders across payment-page clicks
 
 # JWT error handlers - redirect to home for page routes, return JSON for API routes
 @jwt.unauthorized_loader
@@ -144,6 +221,30 @@ def expired_token_callback(jwt_header, jwt_payload):
         return jsonify({'error': 'Token has expired'}), 401
     return redirect('/?login=expired')
 
+@jwt.token_in_blocklist_loader
+def token_in_blocklist_callback(jwt_header, jwt_payload):
+    """Refuse tokens revoked by logout"""
+    return token_revocation.is_revoked(jwt_payload['jti'])
+
+@jwt.revoked_token_loader
+def revoked_token_callback(jwt_header, jwt_payload):
+    """Handle a revoked JWT token"""
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Token has been revoked'}), 401
+    return redirect('/?login=required')
+
+@jwt.user_lookup_loader
+def user_lookup_callback(jwt_header, jwt_payload):
+    """Load the token's user once per request (available as current_user)"""
+    return user_loader.load(int(jwt_payload['sub']))
+
+@jwt.user_lookup_error_loader
+def user_lookup_error_callback(jwt_header, jwt_payload):
+    """Handle a valid token whose user no longer exists"""
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'User not found'}), 404
+    return redirect('/?login=required')
+
 # Note: API routes are exempted from CSRF after all routes are defined (see bottom of file)
 
 # Initialize Firebase Admin SDK for Phone Auth
@@ -167,11 +268,6 @@ with app.app_context():
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     # db.create_all()
 
-def allowed_file(filename):
-    """Check if filename has an allowed extension"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
-
 # Admin login required decorator
 def admin_required(f):
     @wraps(f)
@@ -181,6 +277,38 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Shed load when the password hashing pool is saturated
+@app.errorhandler(HashingOverloaded)
+def handle_hashing_overloaded(error):
+    """Answer 503 straight away instead of queueing more bcrypt work"""
+    app.logger.warning(f"Password hashing overloaded on {request.path}: {str(error)}")
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': 'Too many sign-in attempts right now. Please try again in a moment.'})
+    else:
+        response = app.make_response('Service busy, please try again in a moment.')
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    return response
+
+# Too many requests for a rate-limited route
+@app.errorhandler(RateLimitExceeded)
+def handle_rate_limited(error):
+    """Answer 429 with Retry-After instead of running the route"""
+    message = error.message or 'Too many attempts. Please try again later.'
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': message, 'wait_seconds': error.retry_after})
+    else:
+        response = app.make_response(message)
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+# Cart change refused (unknown item, bad quantity, full cart)
+@app.errorhandler(CartError)
+def handle_cart_error(error):
+    """Answer with the reason instead of the generic 500"""
+    return jsonify({'error': error.message}), error.status
+
 # Global error handler for API routes
 @app.errorhandler(Exception)
 def handle_api_error(error):
@@ -692,6 +820,7 @@ def current_user_is_authenticated():
 
 
 @app.route("/")
+@catalog_version.conditional
 def home():
     """Main landing page route"""
     try:
@@ -711,6 +840,7 @@ def home():
         }), 500
 
 @app.route('/api/verify-reset-phone', methods=['POST'])
+@rate_limiter.limit('reset-phone', 20, 3600)
 def verify_reset_phone():
     """Verify Firebase phone token for password reset"""
     try:
@@ -730,7 +860,7 @@ def verify_reset_phone():
         # Verify Firebase ID token
         try:
             app.logger.info(f"Attempting to verify Firebase token (length: {len(id_token)})")
-            decoded_token = firebase_auth.verify_id_token(id_token)
+            decoded_token = firebase_tokens.verify_id_token(id_token)
             phone = decoded_token.get('phone_number')
             app.logger.info(f"Token verified successfully. Phone: {phone}")
         except firebase_auth.InvalidIdTokenError as e:
@@ -750,15 +880,12 @@ def verify_reset_phone():
             app.logger.error("Phone number not found in decoded token")
             return jsonify({'error': 'Phone number not found in token'}), 400
             
-        # Normalize phone (remove +91 or +)
-        phone_clean = phone.replace('+91', '') if phone.startswith('+91') else phone
-        phone_clean = phone_clean.lstrip('+') 
-        app.logger.info(f"Looking for user with phone: {phone_clean}")
+        app.logger.info(f"Looking for user with phone: {phone}")
         
         # Find user
-        user = User.query.filter_by(phone=phone_clean).first()
+        user = login_identities.find_by_phone(phone)
         if not user:
-            app.logger.warning(f"No user found with phone: {phone_clean}")
+            app.logger.warning(f"No user found with phone: {phone}")
             return jsonify({'error': 'No account found with this phone number.'}), 404
             
         # Generate reset token (same as email flow)
@@ -790,31 +917,26 @@ def test_email():
         return f"Email sent to {email}"
     except Exception as e:
         return f"Error sending email: {str(e)}"
+
+# Register new user with email and password
+@app.route('/api/register', methods=['POST'])
+@rate_limiter.limit('register', 10, 3600)
 def register():
     try:
         data = request.json
         email = data.get('email')
-        phone = data.get('phone', '').replace('+91', '').strip()
+        phone = national_phone(data.get('phone'))
 
         # Check if email already exists
-        if User.query.filter_by(email=email).first():
+        if login_identities.find_by_email(email):
             return jsonify({'error': 'Email already registered'}), 400
 
         # Check if phone already exists (if provided)
-        if phone and User.query.filter_by(phone=phone).first():
+        if phone and login_identities.find_by_phone(phone):
             return jsonify({'error': 'Phone number already registered'}), 400
 
-        # Generate unique username if not provided or already taken
-        base_username = data.get('username') or email.split('@')[0]
-        username = base_username
-        counter = 1
-        while User.query.filter_by(username=username).first():
-            username = f"{base_username}{counter}"
-            counter += 1
-
         # Create new user with profile data (email_verified defaults to False)
         user = User(
-            username=username,
             email=email,
             full_name=data.get('full_name', ''),
             phone=phone,
@@ -823,14 +945,12 @@ def register():
         )
         user.set_password(data.get('password'))
 
-        db.session.add(user)
+        # Unique username (requested one or email prefix, with a numeric suffix if taken)
+        user.assign_username(data.get('username') or email.split('@')[0])
         db.session.commit()
 
         # Generate and send OTP for email verification
-        new_otp = OTP(email=email)
-        db.session.add(new_otp)
-        db.session.commit()
-        send_otp_email(email, new_otp.otp_code)
+        send_otp_email(email, otp_store.issue(email))
 
         # Generate JWT token
         access_token = create_access_token(identity=str(user.id))
@@ -845,17 +965,23 @@ def register():
         set_access_cookies(response, access_token)
         return response, 201
 
+    except HashingOverloaded:
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
 # Login with email/phone and password
 @app.route('/api/login', methods=['POST'])
+@rate_limiter.limit('login', 30, 60)
+@rate_limiter.limit('login', 10, 300, by='email')
+@rate_limiter.limit('login', 10, 300, by='phone')
 def login():
     try:
         data = request.json
         email = data.get('email')
-        phone = data.get('phone', '').replace('+91', '').strip() if data.get('phone') else None
+        phone = data.get('phone')
         password = data.get('password')
 
         if not password:
@@ -867,13 +993,13 @@ def login():
         # Find user by email or phone
         user = None
         if email:
-            user = User.query.filter(
-                (User.email == email) | (User.username == email)
-            ).first()
+            user = login_identities.find_by_login(email)
         elif phone:
-            user = User.query.filter_by(phone=phone).first()
+            user = login_identities.find_by_phone(phone)
 
         if user and user.check_password(password):
+            if db.session.is_modified(user):
+                db.session.commit()  # Password hash upgraded to the current cost
             access_token = create_access_token(identity=str(user.id))
 
             response = jsonify({
@@ -886,12 +1012,15 @@ def login():
 
         return jsonify({'error': 'Invalid credentials'}), 401
 
+    except HashingOverloaded:
+        raise
     except Exception as e:
         app.logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'An internal error occurred. Please try again.'}), 500
 
 # Firebase Phone Auth Login
 @app.route('/api/firebase/login', methods=['POST'])
+@rate_limiter.limit('firebase-login', 30, 60)
 def firebase_login():
     """Authenticate user via Firebase Phone Auth"""
     try:
@@ -902,18 +1031,17 @@ def firebase_login():
             return jsonify({'error': 'ID token is required'}), 400
 
         # Verify Firebase ID token
-        decoded_token = firebase_auth.verify_id_token(id_token)
+        decoded_token = firebase_tokens.verify_id_token(id_token)
         phone = decoded_token.get('phone_number')
 
         if not phone:
             return jsonify({'error': 'Phone number not found in token'}), 400
 
         # Remove country code prefix for storage (keep just 10 digits)
-        phone_clean = phone.replace('+91', '') if phone.startswith('+91') else phone
-        phone_clean = phone_clean.lstrip('+')  # Remove any remaining + prefix
+        phone_clean = national_phone(phone)
 
         # Find existing user by phone
-        user = User.query.filter_by(phone=phone_clean).first()
+        user = login_identities.find_by_phone(phone)
 
         if not user:
             # Create new user with phone
@@ -949,6 +1077,9 @@ def firebase_login():
         return jsonify({'error': 'Invalid token'}), 401
     except firebase_auth.ExpiredIdTokenError:
         return jsonify({'error': 'Token expired'}), 401
+    except HashingOverloaded:
+        db.session.rollback()
+        raise
     except Exception as e:
         app.logger.error(f"Firebase login error: {str(e)}")
         db.session.rollback()
@@ -956,6 +1087,7 @@ def firebase_login():
 
 # Register new user with phone verification via Firebase
 @app.route('/api/register-with-phone', methods=['POST'])
+@rate_limiter.limit('register', 10, 3600)
 def register_with_phone():
     """Register new user with phone verification via Firebase"""
     try:
@@ -966,35 +1098,26 @@ def register_with_phone():
             return jsonify({'error': 'Firebase token is required'}), 400
 
         # Verify Firebase ID token
-        decoded_token = firebase_auth.verify_id_token(firebase_token)
-        phone_from_token = decoded_token.get('phone_number', '').replace('+91', '')
+        decoded_token = firebase_tokens.verify_id_token(firebase_token)
+        phone_from_token = normalize_phone(decoded_token.get('phone_number'))
 
         email = data.get('email')
-        phone = data.get('phone', '').replace('+91', '').strip()
+        phone = national_phone(data.get('phone'))
 
         # Verify phone matches token
-        if phone != phone_from_token:
+        if not phone or normalize_phone(phone) != phone_from_token:
             return jsonify({'error': 'Phone verification mismatch'}), 400
 
         # Check if email already exists
-        if User.query.filter_by(email=email).first():
+        if login_identities.find_by_email(email):
             return jsonify({'error': 'Email already registered'}), 400
 
         # Check if phone already exists
-        if User.query.filter_by(phone=phone).first():
+        if login_identities.find_by_phone(phone):
             return jsonify({'error': 'Phone number already registered'}), 400
 
-        # Generate unique username
-        base_username = email.split('@')[0]
-        username = base_username
-        counter = 1
-        while User.query.filter_by(username=username).first():
-            username = f"{base_username}{counter}"
-            counter += 1
-
         # Create new user with phone verified
         user = User(
-            username=username,
             email=email,
             phone=phone,
             full_name=data.get('full_name', ''),
@@ -1003,7 +1126,8 @@ def register_with_phone():
         )
         user.set_password(data.get('password'))
 
-        db.session.add(user)
+        # Unique username from the email prefix
+        user.assign_username(email.split('@')[0])
         db.session.commit()
 
         # Generate JWT token
@@ -1021,6 +1145,9 @@ def register_with_phone():
         return jsonify({'error': 'Invalid Firebase token'}), 401
     except firebase_auth.ExpiredIdTokenError:
         return jsonify({'error': 'Firebase token expired'}), 401
+    except HashingOverloaded:
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         app.logger.error(f"Phone registration error: {str(e)}")
@@ -1028,6 +1155,8 @@ def register_with_phone():
 
 # OTP Verification Routes
 @app.route('/api/send-otp', methods=['POST'])
+@rate_limiter.limit('otp-send', 20, 3600)
+@rate_limiter.limit('otp-send', 1, 60, by='email', message='Please wait before requesting another OTP')
 def send_otp():
     """Send OTP to user's email for verification"""
     try:
@@ -1037,18 +1166,11 @@ def send_otp():
         if not email:
             return jsonify({'error': 'Email is required'}), 400
 
-        # Invalidate any existing unused OTPs for this email
-        existing_otps = OTP.query.filter_by(email=email, is_used=False).all()
-        for otp in existing_otps:
-            otp.is_used = True
-
-        # Create new OTP
-        new_otp = OTP(email=email)
-        db.session.add(new_otp)
-        db.session.commit()
+        # Issue a new OTP (replaces any earlier code for this email)
+        otp_code = otp_store.issue(email)
 
         # Send OTP email
-        if send_otp_email(email, new_otp.otp_code):
+        if send_otp_email(email, otp_code):
             return jsonify({
                 'message': 'OTP sent successfully',
                 'email': email
@@ -1062,6 +1184,8 @@ def send_otp():
         return jsonify({'error': 'Failed to send OTP'}), 500
 
 @app.route('/api/verify-otp', methods=['POST'])
+@rate_limiter.limit('otp-verify', 30, 300)
+@rate_limiter.limit('otp-verify', 5, 300, by='email')
 def verify_otp():
     """Verify the OTP code entered by user"""
     try:
@@ -1072,21 +1196,9 @@ def verify_otp():
         if not email or not otp_code:
             return jsonify({'error': 'Email and OTP code are required'}), 400
 
-        # Find the most recent valid OTP for this email
-        otp_record = OTP.query.filter_by(
-            email=email,
-            otp_code=otp_code,
-            is_used=False
-        ).order_by(OTP.created_at.desc()).first()
-
-        if not otp_record:
-            return jsonify({'error': 'Invalid OTP code'}), 400
-
-        if not otp_record.is_valid():
-            return jsonify({'error': 'OTP has expired. Please request a new one.'}), 400
-
-        # Mark OTP as used
-        otp_record.mark_as_used()
+        # Check and consume the OTP in one step (expired codes are already gone)
+        if not otp_store.verify(email, otp_code):
+            return jsonify({'error': 'Invalid or expired OTP code. Please request a new one if needed.'}), 400
 
         # Mark user's email as verified
         user = User.query.filter_by(email=email).first()
@@ -1106,6 +1218,8 @@ def verify_otp():
         return jsonify({'error': 'Failed to verify OTP'}), 500
 
 @app.route('/api/resend-otp', methods=['POST'])
+@rate_limiter.limit('otp-send', 20, 3600)
+@rate_limiter.limit('otp-send', 1, 60, by='email', message='Please wait before requesting another OTP')
 def resend_otp():
     """Resend a new OTP to user's email"""
     try:
@@ -1115,27 +1229,10 @@ def resend_otp():
         if not email:
             return jsonify({'error': 'Email is required'}), 400
 
-        # Check rate limiting (optional: prevent spam)
-        recent_otp = OTP.query.filter_by(email=email).order_by(OTP.created_at.desc()).first()
-        if recent_otp:
-            time_diff = datetime.now(timezone.utc) - recent_otp.created_at
-            if time_diff.total_seconds() < 60:  # 1 minute cooldown
-                return jsonify({
-                    'error': 'Please wait before requesting another OTP',
-                    'wait_seconds': int(60 - time_diff.total_seconds())
-                }), 429
-
-        # Invalidate existing OTPs
-        existing_otps = OTP.query.filter_by(email=email, is_used=False).all()
-        for otp in existing_otps:
-            otp.is_used = True
-
-        # Create and send new OTP
-        new_otp = OTP(email=email)
-        db.session.add(new_otp)
-        db.session.commit()
+        # Issue a new OTP (replaces any earlier code for this email)
+        otp_code = otp_store.issue(email)
 
-        if send_otp_email(email, new_otp.otp_code):
+        if send_otp_email(email, otp_code):
             return jsonify({
                 'message': 'New OTP sent successfully',
                 'email': email
@@ -1150,6 +1247,8 @@ def resend_otp():
 
 # Passwordless Login OTP Routes
 @app.route('/api/send-login-otp', methods=['POST'])
+@rate_limiter.limit('otp-send', 20, 3600)
+@rate_limiter.limit('otp-send', 1, 60, by='email', message='Please wait before requesting another OTP')
 def send_login_otp():
     """Send OTP for passwordless email login"""
     try:
@@ -1164,27 +1263,10 @@ def send_login_otp():
         if not user:
             return jsonify({'error': 'No account found with this email'}), 404
 
-        # Check rate limiting
-        recent_otp = OTP.query.filter_by(email=email).order_by(OTP.created_at.desc()).first()
-        if recent_otp:
-            time_diff = datetime.now(timezone.utc) - recent_otp.created_at
-            if time_diff.total_seconds() < 60:
-                return jsonify({
-                    'error': 'Please wait before requesting another OTP',
-                    'wait_seconds': int(60 - time_diff.total_seconds())
-                }), 429
-
-        # Invalidate existing OTPs
-        existing_otps = OTP.query.filter_by(email=email, is_used=False).all()
-        for otp in existing_otps:
-            otp.is_used = True
-
-        # Create and send new OTP
-        new_otp = OTP(email=email)
-        db.session.add(new_otp)
-        db.session.commit()
+        # Issue a new OTP (replaces any earlier code for this email)
+        otp_code = otp_store.issue(email)
 
-        if send_otp_email(email, new_otp.otp_code):
+        if send_otp_email(email, otp_code):
             return jsonify({
                 'message': 'OTP sent successfully',
                 'email': email
@@ -1198,6 +1280,8 @@ def send_login_otp():
         return jsonify({'error': 'Failed to send OTP'}), 500
 
 @app.route('/api/verify-login-otp', methods=['POST'])
+@rate_limiter.limit('otp-verify', 30, 300)
+@rate_limiter.limit('otp-verify', 5, 300, by='email')
 def verify_login_otp():
     """Verify OTP and login user (passwordless)"""
     try:
@@ -1208,21 +1292,9 @@ def verify_login_otp():
         if not email or not otp_code:
             return jsonify({'error': 'Email and OTP code are required'}), 400
 
-        # Find valid OTP
-        otp_record = OTP.query.filter_by(
-            email=email,
-            otp_code=otp_code,
-            is_used=False
-        ).order_by(OTP.created_at.desc()).first()
-
-        if not otp_record:
-            return jsonify({'error': 'Invalid OTP code'}), 400
-
-        if not otp_record.is_valid():
-            return jsonify({'error': 'OTP has expired. Please request a new one.'}), 400
-
-        # Mark OTP as used
-        otp_record.mark_as_used()
+        # Check and consume the OTP in one step (expired codes are already gone)
+        if not otp_store.verify(email, otp_code):
+            return jsonify({'error': 'Invalid or expired OTP code. Please request a new one if needed.'}), 400
 
         # Get user and mark email as verified
         user = User.query.filter_by(email=email).first()
@@ -1266,6 +1338,7 @@ def google_login():
     return google.authorize_redirect(redirect_uri)
 
 @app.route('/auth/google/callback')
+@read_replicas.primary
 def google_callback():
     """Handle Google OAuth callback"""
     try:
@@ -1287,17 +1360,7 @@ def google_callback():
         
         if not user:
             # Create new user
-            # Generate username from email
-            username = email.split('@')[0]
-            # Ensure unique username
-            base_username = username
-            counter = 1
-            while User.query.filter_by(username=username).first():
-                username = f"{base_username}{counter}"
-                counter += 1
-            
             user = User(
-                username=username,
                 email=email,
                 full_name=name,
                 role='customer'
@@ -1306,7 +1369,8 @@ def google_callback():
             import secrets
             user.set_password(secrets.token_urlsafe(32))
             
-            db.session.add(user)
+            # Unique username generated from the email prefix
+            user.assign_username(email.split('@')[0])
             db.session.commit()
         
         # Generate JWT token
@@ -1357,7 +1421,18 @@ def oauth_complete():
 
 @app.route('/api/logout', methods=['POST'])
 def logout():
-    """Clear JWT cookies on logout"""
+    """Revoke the current JWT and clear JWT cookies on logout"""
+    auth_header = request.headers.get('Authorization', '')
+    token = auth_header[7:] if auth_header.startswith('Bearer ') else request.cookies.get(app.config['JWT_ACCESS_COOKIE_NAME'])
+    if token:
+        try:
+            # Decoded directly (no CSRF check) so a cookie-only logout still revokes
+            claims = decode_token(token, allow_expired=True)
+            if claims['exp'] > datetime.now(timezone.utc).timestamp():
+                token_revocation.revoke(claims['jti'], claims['exp'], user_id=int(claims['sub']))
+        except Exception as e:
+            app.logger.warning(f"Logout could not revoke token: {str(e)}")
+
     response = jsonify({'message': 'Logged out successfully'})
     unset_jwt_cookies(response)
     return response, 200
@@ -1367,22 +1442,33 @@ def logout():
 @jwt_required()
 def upload_image():
     """Secure image upload endpoint"""
-    if 'file' not in request.files:
-        return jsonify({"error": "No file part"}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
-    
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        return jsonify({
-            "url": url_for('static', filename=f'uploads/{filename}', _external=True)
-        }), 200
-    
-    return jsonify({"error": "Invalid file type"}), 400
+    # Streamed to disk and checked as it arrives: never buffered, bogus files stop at the first chunk
+    try:
+        upload = receive_file(max_size=app.config['UPLOAD_MAX_SIZE'],
+                              allowed=app.config['ALLOWED_EXTENSIONS'],
+                              directory=upload_storage.temp_dir)
+    except UploadRejected as e:
+        return jsonify({"error": e.message}), e.status
+
+    # Stored under its content hash, so re-uploads reuse the existing file
+    key, _ = upload_storage.store(upload.temp_path, upload.digest, upload.extension, upload.size)
+    if upload_storage.local_path(key):
+        image_variants.enqueue(f'uploads/{key}')
+    return jsonify({
+        "url": upload_storage.url(key) or url_for('static', filename=f'uploads/{key}', _external=True)
+    }), 200
+
+@app.route('/static/uploads/<path:key>')
+def uploaded_file(key):
+    """Uploaded files; content-addressed ones never change and are cached for a year"""
+    cache_control = IMMUTABLE_CACHE_CONTROL if is_content_key(key) else None
+    if upload_storage.local_path(key) is None and not os.path.isfile(os.path.join(app.config['UPLOAD_FOLDER'], key)):
+        response = redirect(upload_storage.url(key), 301)  # Served by the bucket
+    else:
+        response = send_from_directory(app.config['UPLOAD_FOLDER'], key)
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
 
 @app.route("/api/pandit-ji", methods=["GET"])
 @jwt_required()
@@ -1396,6 +1482,7 @@ def fetch_panditji():
 
 
 @app.route('/product/<int:product_id>')
+@catalog_version.conditional
 def product_detail(product_id):
     """Product detail page"""
     product = PujaMaterial.query.get_or_404(product_id)
@@ -1408,6 +1495,7 @@ def product_detail(product_id):
 
 
 @app.route('/bundle/<int:bundle_id>')
+@catalog_version.conditional
 def bundle_detail(bundle_id):
     """Bundle detail page"""
     bundle = Bundle.query.get_or_404(bundle_id)
@@ -1425,6 +1513,7 @@ def bundle_detail(bundle_id):
 
 
 @app.route('/temples')
+@catalog_version.conditional
 def temples():
     """Browse all temples page"""
     # Get filter parameters
@@ -1449,14 +1538,14 @@ def temples():
             )
         )
 
-    temples_list = query.order_by(Temple.is_featured.desc(), Temple.name).all()
+    temples_list = StreamedQuery(query.order_by(Temple.is_featured.desc(), Temple.name))
 
     # Get unique states and deities for filter dropdowns
-    all_temples = Temple.query.filter_by(is_active=True).all()
-    states = sorted(set(t.state for t in all_temples if t.state))
-    deities = sorted(set(t.deity for t in all_temples if t.deity))
+    active = Temple.query.filter_by(is_active=True)
+    states = sorted(state for (state,) in active.with_entities(Temple.state).distinct() if state)
+    deities = sorted(deity for (deity,) in active.with_entities(Temple.deity).distinct() if deity)
 
-    return render_template('temples.html',
+    return stream_page('temples.html',
                           temples=temples_list,
                           states=states,
                           deities=deities,
@@ -1466,6 +1555,7 @@ def temples():
 
 
 @app.route('/pandits')
+@catalog_version.conditional
 def pandits_list():
     """Browse all verified pandits page"""
     # Get filter parameters
@@ -1491,21 +1581,21 @@ def pandits_list():
             )
         )
 
-    pandits = query.order_by(Pandit.rating.desc(), Pandit.name).all()
+    pandits = StreamedQuery(query.order_by(Pandit.rating.desc(), Pandit.name))
 
     # Get unique locations and specialties for filter dropdowns
-    all_pandits = Pandit.query.filter_by(is_approved=True).all()
-    locations = sorted(set(p.location for p in all_pandits if p.location))
+    approved = Pandit.query.filter_by(is_approved=True)
+    locations = sorted(location for (location,) in approved.with_entities(Pandit.location).distinct() if location)
 
     # Extract unique specialties from comma-separated values
     all_specialties = set()
-    for p in all_pandits:
-        if p.specialties:
-            for s in p.specialties.split(','):
+    for (value,) in approved.with_entities(Pandit.specialties).distinct():
+        if value:
+            for s in value.split(','):
                 all_specialties.add(s.strip())
     specialties = sorted(all_specialties)
 
-    return render_template('pandits.html',
+    return stream_page('pandits.html',
                           pandits=pandits,
                           locations=locations,
                           specialties=specialties,
@@ -1515,6 +1605,7 @@ def pandits_list():
 
 
 @app.route('/pandits/<int:pandit_id>')
+@catalog_version.conditional
 def pandit_detail(pandit_id):
     """Individual pandit detail page"""
     pandit = Pandit.query.get_or_404(pandit_id)
@@ -1531,6 +1622,7 @@ def pandit_detail(pandit_id):
 
 
 @app.route('/temples/<int:temple_id>')
+@catalog_version.conditional
 def temple_detail(temple_id):
     """Temple detail page with available pujas"""
     temple = Temple.query.get_or_404(temple_id)
@@ -1651,6 +1743,7 @@ def pandit_signup():
 
 
 @app.route('/api/seed-data', methods=['GET'])
+@read_replicas.primary
 def seed_data():
     """Seed the database with sample data (development only)"""
     # SECURITY: Only allow in debug mode
@@ -1854,57 +1947,80 @@ def book_pandit():
 
 
 
+@app.route('/api/cart', methods=['GET'])
+def get_cart():
+    """The visitor's cart: priced lines, total and item count"""
+    return jsonify({"success": True, "cart": cart_store.get()}), 200
+
+
 @app.route('/api/cart/add', methods=['POST'])
 def add_to_cart():
-    """API endpoint for adding items to cart"""
+    """API endpoint for adding items to cart (``replace`` sets the quantity instead of adding to it)"""
     try:
-        data = request.get_json()
-        
-        if 'product_id' not in data:
+        data = request.get_json() or {}
+
+        if 'id' not in data and 'product_id' not in data and 'puja_id' not in data:
             return jsonify({"error": "Product ID required"}), 400
-        
-        product = PujaMaterial.query.get(data['product_id'])
-        if not product:
-            return jsonify({"error": "Product not found"}), 404
-        
+        if 'id' not in data:
+            data['id'] = data.get('product_id')
+
+        cart = cart_store.add(data, replace=bool(data.get('replace')))
         return jsonify({
             "success": True,
             "message": "Item added to cart",
-            "product": {
-                "id": product.id,
-                "name": product.name,
-                "price": product.price
-            }
+            "cart": cart
         }), 200
-        
+
+    except CartError:
+        raise
     except Exception as e:
         app.logger.error(f"Error adding to cart: {str(e)}")
         return jsonify({"error": "Failed to add to cart"}), 500
 
 
+@app.route('/api/cart/update', methods=['POST'])
+def update_cart_item():
+    """Set the quantity of a cart line (0 removes it)"""
+    data = request.get_json() or {}
+    if not data.get('key'):
+        return jsonify({"error": "Cart line key required"}), 400
+    return jsonify({"success": True, "cart": cart_store.update(data['key'], data.get('quantity'))}), 200
+
+
+@app.route('/api/cart/remove', methods=['POST'])
+def remove_cart_item():
+    """Remove a line from the cart"""
+    data = request.get_json() or {}
+    if not data.get('key'):
+        return jsonify({"error": "Cart line key required"}), 400
+    return jsonify({"success": True, "cart": cart_store.remove(data['key'])}), 200
+
+
+@app.route('/api/cart/sync', methods=['POST'])
+def sync_cart():
+    """Merge a cart the browser kept locally (before carts lived on the server) into this one"""
+    data = request.get_json() or {}
+    return jsonify({"success": True, "cart": cart_store.replace(data.get('items', []), merge=True)}), 200
+
+
 @app.route('/checkout', methods=['GET', 'POST'])
 def checkout_page():
     """Checkout page - display form and process order"""
     if request.method == 'GET':
-        # Get cart from session or request
+        # Old links carry the whole cart in ?cart=; price it into the server-side cart once
         cart_data = request.args.get('cart')
         if cart_data:
             try:
-                cart = json.loads(unquote(cart_data))
-            except (json.JSONDecodeError, ValueError):
-                cart = []
-        else:
-            cart = []
-        
-        if not cart:
+                cart_store.replace(json.loads(unquote(cart_data)))
+            except (json.JSONDecodeError, ValueError, CartError):
+                pass
+            return redirect(url_for('checkout_page'))
+
+        cart = cart_store.get()
+        if not cart['lines']:
             return redirect(url_for('home'))
-        
-        # Calculate totals
-        total = 0
-        for item in cart:
-            total += item.get('price', 0) * item.get('quantity', 1)
-        
-        return render_template('checkout.html', cart=cart, total=total)
+
+        return render_template('checkout.html', cart=cart['lines'], total=cart['total'])
     
     # POST - Process 
 
@@ -1916,61 +2032,32 @@ def checkout_page():
                           'shipping_address', 'city', 'state', 'pincode']
         for field in required_fields:
             if not data.get(field):
+                cart = cart_store.get()
                 return render_template('checkout.html', 
                                      error=f"Please fill in {field.replace('_', ' ')}",
-                                     cart=json.loads(data.get('cart_data', '[]')),
-                                     total=float(data.get('total', 0)))
+                                     cart=cart['lines'],
+                                     total=cart['total'])
         
-        # Get cart items
+        # A form that still posts its cart replaces the server-side one
         cart_data = data.get('cart_data')
-        if not cart_data:
-            return render_template('checkout.html', 
-                                 error="Cart is empty",
-                                 cart=[],
-                                 total=0)
+        if cart_data:
+            try:
+                cart_store.replace(json.loads(cart_data))
+            except (json.JSONDecodeError, ValueError, CartError):
+                return render_template('checkout.html',
+                                     error="Invalid cart data",
+                                     cart=[],
+                                     total=0)
         
-        try:
-            cart = json.loads(cart_data)
-        except (json.JSONDecodeError, ValueError):
-            return render_template('checkout.html',
-                                 error="Invalid cart data",
-                                 cart=[],
-                                 total=0)
+        # Lines were priced as they were added (and revalidated if the catalog changed since)
+        order_items_data, total_amount = cart_store.order_items()
         
-        if not cart:
+        if not order_items_data:
             return render_template('checkout.html', 
                                  error="Cart is empty",
                                  cart=[],
                                  total=0)
         
-        # Calculate total and validate products
-        total_amount = 0
-        order_items_data = []
-        
-        for item in cart:
-            product = PujaMaterial.query.get(item.get('id'))
-            if not product:
-                continue
-            
-            quantity = item.get('quantity', 1)
-            price = product.price
-            subtotal = price * quantity
-            total_amount += subtotal
-            
-            order_items_data.append({
-                'product': product,
-                'product_name': product.name,
-                'product_price': price,
-                'quantity': quantity,
-                'subtotal': subtotal
-            })
-        
-        if not order_items_data:
-            return render_template('checkout.html', 
-                                 error="No valid items in cart",
-                                 cart=cart,
-                                 total=0)
-        
         # Generate order number (UUID suffix prevents race condition)
         order_number = f"ORD{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:8].upper()}"
         
@@ -1995,17 +2082,10 @@ def checkout_page():
         
         # Create order items
         for item_data in order_items_data:
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=item_data['product'].id,
-                product_name=item_data['product_name'],
-                product_price=item_data['product_price'],
-                quantity=item_data['quantity'],
-                subtotal=item_data['subtotal']
-            )
-            db.session.add(order_item)
+            db.session.add(OrderItem(order_id=order.id, **item_data))
         
         db.session.commit()
+        cart_store.clear()
         
         # Redirect to order confirmation
         return redirect(url_for('payment_page', order_number=order.order_number))
@@ -2013,10 +2093,11 @@ def checkout_page():
     except Exception as e:
         db.session.rollback()
         app.logger.error(f"Error in checkout: {str(e)}")
+        cart = cart_store.get()
         return render_template('checkout.html', 
                              error=f"Checkout failed: {str(e)}",
-                             cart=json.loads(data.get('cart_data', '[]')) if 'data' in locals() else [],
-                             total=float(data.get('total', 0)) if 'data' in locals() else 0)
+                             cart=cart['lines'],
+                             total=cart['total'])
 
 
 @app.route('/order-confirmation/<order_number>')
@@ -2042,90 +2123,20 @@ def create_order():
         
         # Validate required fields
         required_fields = ['customer_name', 'customer_email', 'customer_phone', 
-                          'shipping_address', 'city', 'state', 'pincode', 'cart']
+                          'shipping_address', 'city', 'state', 'pincode']
         for field in required_fields:
             if not data.get(field):
                 return jsonify({"error": f"Missing required field: {field}"}), 400
         
-        cart = data.get('cart')
-        if not cart:
-            return jsonify({"error": "Cart is empty"}), 400
-            
-        # Calculate total and validate products
-        total_amount = 0
-        order_items_data = []
-        
-        for item in cart:
-            item_type = item.get('type', 'product')
-            quantity = int(item.get('quantity', 1))
-            schedule = item.get('schedule')
-            
-            if item_type == 'bundle':
-                bundle = Bundle.query.get(item.get('id'))
-                if not bundle:
-                    continue
-
-                price = bundle.discounted_price
-                subtotal = price * quantity
-                total_amount += subtotal
-
-                product_name = bundle.name
-                if schedule and schedule.get('date'):
-                     product_name += f" [Date: {schedule.get('date')}, Time: {schedule.get('time', 'Any')}]"
-
-                order_items_data.append({
-                    'bundle_id': bundle.id,
-                    'product_name': product_name,
-                    'product_price': price,
-                    'quantity': quantity,
-                    'subtotal': subtotal
-                })
-            elif item_type == 'temple_puja':
-                puja_id = item.get('puja_id')
-                if not puja_id:
-                    continue
-                puja = TemplePuja.query.get(int(puja_id))
-                if not puja:
-                    continue
-
-                price = float(puja.price)
-                subtotal = price * quantity
-                total_amount += subtotal
-
-                # Include booking details in product name
-                booking_details = item.get('booking_details', {})
-                product_name = f"{puja.name} at {puja.temple.name}"
-                if booking_details.get('date'):
-                    product_name += f" [Date: {booking_details.get('date')}"
-                    if booking_details.get('gotra'):
-                        product_name += f", Gotra: {booking_details.get('gotra')}"
-                    product_name += "]"
-
-                order_items_data.append({
-                    'product_name': product_name,
-                    'product_price': price,
-                    'quantity': quantity,
-                    'subtotal': subtotal
-                })
-            else:
-                product = PujaMaterial.query.get(item.get('id'))
-                if not product:
-                    continue
-                
-                price = product.price
-                subtotal = price * quantity
-                total_amount += subtotal
-                
-                order_items_data.append({
-                    'product_id': product.id,
-                    'product_name': product.name,
-                    'product_price': price,
-                    'quantity': quantity,
-                    'subtotal': subtotal
-                })
+        # API clients may still send the cart with the order; it replaces the server-side one
+        if data.get('cart'):
+            cart_store.replace(data['cart'])
+        
+        # Lines were priced as they were added (and revalidated if the catalog changed since)
+        order_items_data, total_amount = cart_store.order_items()
         
         if not order_items_data:
-            return jsonify({"error": "No valid items in cart"}), 400
+            return jsonify({"error": "Cart is empty"}), 400
         
         # Generate order number (UUID suffix prevents race condition)
         order_number = f"ORD{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:8].upper()}"
@@ -2154,18 +2165,10 @@ def create_order():
         
         # Create order items
         for item_data in order_items_data:
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=item_data.get('product_id'),
-                bundle_id=item_data.get('bundle_id'),
-                product_name=item_data['product_name'],
-                product_price=item_data['product_price'],
-                quantity=item_data['quantity'],
-                subtotal=item_data['subtotal']
-            )
-            db.session.add(order_item)
+            db.session.add(OrderItem(order_id=order.id, **item_data))
         
         db.session.commit()
+        cart_store.clear()
         
         return jsonify({
             "success": True, 
@@ -2192,10 +2195,10 @@ def create_razorpay_payment():
         if not order:
             return jsonify({"error": "Order not found"}), 404
 
-        # Create Razorpay Order (amount in paise)
+        # Reuse the Razorpay Order if one is still payable, else create one (amount in paise)
         amount_in_paise = int(order.total_amount * 100)
-        
-        razorpay_order = razorpay_client.order.create({
+
+        razorpay_order_id = payment_intents.get_or_create(order, order_number, amount_in_paise, {
             "amount": amount_in_paise,
             "currency": "INR",
             "receipt": order_number,
@@ -2206,13 +2209,9 @@ def create_razorpay_payment():
             }
         })
 
-        # Update order with Razorpay ID
-        order.razorpay_order_id = razorpay_order['id']
-        db.session.commit()
-
         return jsonify({
             "success": True,
-            "order_id": razorpay_order['id'],
+            "order_id": razorpay_order_id,
             "amount": amount_in_paise,
             "currency": "INR",
             "key": os.getenv('RAZORPAY_KEY_ID'),  # Frontend needs this
@@ -2273,19 +2272,26 @@ def verify_razorpay_payment():
                 "error": "Order not found"
             }), 404
 
-        # Update order status
-        order.payment_status = 'paid'
-        order.status = 'confirmed'
-        order.payment_reference = razorpay_payment_id
-        order.payment_date = datetime.now(timezone.utc)
+        if order.razorpay_order_id != razorpay_order_id:
+            return jsonify({
+                "success": False,
+                "error": "Payment does not belong to this order"
+            }), 400
+
+        # Same guarded transition as the webhook consumer: only one of them marks
+        # the order paid (and emails), whichever commits first
+        order_ids, _ = apply_captured_payments({
+            razorpay_order_id: (razorpay_payment_id, datetime.now(timezone.utc))
+        })
         db.session.commit()
 
         print(f"Payment verified for Order {order_number}. Sending email...")
 
         # Send Order Confirmation Email
         try:
-            print(f"Calling send_order_confirmation_email for order {order.id}")
-            send_order_confirmation_email(order)
+            if order.id in order_ids:
+                print(f"Calling send_order_confirmation_email for order {order.id}")
+                send_order_confirmation_email(order)
         except Exception as e:
             app.logger.error(f"Failed to trigger order email: {str(e)}")
             import traceback
@@ -2351,10 +2357,10 @@ def create_pandit_razorpay_payment():
         if not booking:
             return jsonify({"error": "Booking not found"}), 404
 
-        # Create Razorpay Order (amount in paise)
+        # Reuse the Razorpay Order if one is still payable, else create one (amount in paise)
         amount_in_paise = int(booking.amount * 100)
-        
-        razorpay_order = razorpay_client.order.create({
+
+        razorpay_order_id = payment_intents.get_or_create(booking, booking_number, amount_in_paise, {
             "amount": amount_in_paise,
             "currency": "INR",
             "receipt": booking_number,
@@ -2366,13 +2372,9 @@ def create_pandit_razorpay_payment():
             }
         })
 
-        # Update booking with Razorpay ID
-        booking.razorpay_order_id = razorpay_order['id']
-        db.session.commit()
-
         return jsonify({
             "success": True,
-            "order_id": razorpay_order['id'],
+            "order_id": razorpay_order_id,
             "amount": amount_in_paise,
             "currency": "INR",
             "key": os.getenv('RAZORPAY_KEY_ID'),
@@ -2416,16 +2418,23 @@ def verify_pandit_razorpay_payment():
                 "error": "Booking not found"
             }), 404
 
-        # Update booking status
-        booking.payment_status = 'paid'
-        booking.status = 'confirmed'
-        booking.payment_reference = razorpay_payment_id
-        booking.payment_date = datetime.now(timezone.utc)
+        if booking.razorpay_order_id != razorpay_order_id:
+            return jsonify({
+                "success": False,
+                "error": "Payment does not belong to this booking"
+            }), 400
+
+        # Same guarded transition as the webhook consumer: only one of them marks
+        # the booking paid (and emails), whichever commits first
+        _, booking_ids = apply_captured_payments({
+            razorpay_order_id: (razorpay_payment_id, datetime.now(timezone.utc))
+        })
         db.session.commit()
 
         # Send Confirmation Email with Calendar Invite
         try:
-            send_booking_confirmation_email(booking, booking.pandit)
+            if booking.id in booking_ids:
+                send_booking_confirmation_email(booking, booking.pandit)
         except Exception as e:
             app.logger.error(f"Failed to trigger email: {str(e)}")
 
@@ -2451,6 +2460,51 @@ def verify_pandit_razorpay_payment():
         }), 500
 
 
+# ==================== RAZORPAY WEBHOOKS ====================
+
+@app.route('/api/razorpay/webhook', methods=['POST'])
+def razorpay_webhook():
+    """Receive signed Razorpay webhooks (payment.captured, order.paid).
+
+    Only verifies and stores the raw event here; status transitions are
+    applied in batches by the payment_events background consumer.
+    """
+    if not RAZORPAY_WEBHOOK_SECRET:
+        return jsonify({"error": "Webhook not configured"}), 503
+
+    body = request.get_data(as_text=True)
+    signature = request.headers.get('X-Razorpay-Signature', '')
+
+    try:
+        razorpay_client.utility.verify_webhook_signature(body, signature, RAZORPAY_WEBHOOK_SECRET)
+    except razorpay.errors.SignatureVerificationError:
+        app.logger.warning("Razorpay webhook signature verification failed")
+        return jsonify({"error": "Invalid signature"}), 400
+
+    event = json.loads(body)
+    if event.get('event') not in payment_events.HANDLED_EVENTS:
+        return jsonify({"status": "ignored"}), 200
+
+    # Razorpay sends a unique id per event and re-sends it on retries
+    event_id = request.headers.get('X-Razorpay-Event-Id') or uuid.uuid5(uuid.NAMESPACE_URL, body).hex
+    if not payment_events.record(event_id, event, body):
+        return jsonify({"status": "duplicate"}), 200
+
+    return jsonify({"status": "queued"}), 200
+
+
+@payment_events.order_paid_handler
+def notify_webhook_order_paid(order):
+    """Send the confirmation email for orders confirmed via webhook"""
+    send_order_confirmation_email(order)
+
+
+@payment_events.booking_paid_handler
+def notify_webhook_booking_paid(booking):
+    """Send the confirmation email for bookings confirmed via webhook"""
+    send_booking_confirmation_email(booking, booking.pandit)
+
+
 @app.route('/pandit-booking-confirmation/<booking_number>')
 def pandit_booking_confirmation(booking_number):
     """Pandit booking confirmation page"""
@@ -2495,6 +2549,7 @@ def pandit_booking_confirmation(booking_number):
 # ==================== ADMIN PANEL ROUTES ====================
 
 @app.route('/admin/login', methods=['GET', 'POST'])
+@rate_limiter.limit('admin-login', 10, 300, methods=('POST',))
 def admin_login():
     """Admin login page"""
     if request.method == 'POST':
@@ -2504,6 +2559,8 @@ def admin_login():
         admin = Admin.query.filter_by(username=username).first()
         
         if admin and admin.check_password(password):
+            if db.session.is_modified(admin):
+                db.session.commit()  # Password hash upgraded to the current cost
             session['admin_id'] = admin.id
             session['admin_username'] = admin.username
             return redirect(url_for('admin_dashboard'))
@@ -2552,12 +2609,19 @@ def admin_dashboard():
         return f"Error loading dashboard: {str(e)}", 500
 
 
+@app.route('/admin/db-pool')
+@admin_required
+def admin_db_pool():
+    """Connection pool telemetry of every worker that published recently"""
+    return jsonify(pool_stats.collect())
+
+
 @app.route('/admin/pandits')
 @admin_required
 def admin_pandits():
     """Manage pandits"""
-    pandits = Pandit.query.order_by(Pandit.id.desc()).all()
-    return render_template('admin_pandits.html', pandits=pandits)
+    pandits = StreamedQuery(Pandit.query.order_by(Pandit.id.desc()))
+    return stream_page('admin_pandits.html', pandits=pandits)
 
 
 @app.route('/admin/pandit/approve/<int:pandit_id>', methods=['POST'])
@@ -2637,8 +2701,8 @@ def reject_pandit(pandit_id):
 @admin_required
 def admin_products():
     """Manage products"""
-    products = PujaMaterial.query.all()
-    return render_template('admin_products.html', products=products)
+    products = StreamedQuery(PujaMaterial.query.order_by(PujaMaterial.id))
+    return stream_page('admin_products.html', products=products)
 
 
 @app.route('/admin/product/add', methods=['POST'])
@@ -2713,36 +2777,37 @@ def edit_product(product_id):
 
 
 @app.route('/admin/product/upload-image', methods=['POST'])
+@csrf.exempt  # CSRFProtect would read request.form (buffering the file); the token comes in a header instead
 @admin_required
 def upload_product_image():
     """Upload product image"""
+    if app.config.get('WTF_CSRF_ENABLED', True):
+        try:
+            validate_csrf(request.headers.get('X-CSRFToken'))
+        except ValidationError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
     try:
-        if 'file' not in request.files:
-            return jsonify({"success": False, "error": "No file part"}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"success": False, "error": "No selected file"}), 400
-        
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # Add timestamp to avoid conflicts
-            from datetime import datetime
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-            filename = timestamp + filename
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
-            
-            # Return relative path for database storage
-            image_url = f'uploads/{filename}'
-            return jsonify({
-                "success": True,
-                "message": "Image uploaded successfully",
-                "image_url": image_url,
-                "url": url_for('static', filename=image_url)
-            }), 200
-        
-        return jsonify({"success": False, "error": "Invalid file type. Allowed: png, jpg, jpeg, gif"}), 400
+        upload = receive_file(max_size=app.config['ADMIN_UPLOAD_MAX_SIZE'],
+                              allowed=app.config['ALLOWED_EXTENSIONS'],
+                              directory=upload_storage.temp_dir)
+
+        # Stored under its content hash, so the same photo uploaded twice is kept once
+        key, _ = upload_storage.store(upload.temp_path, upload.digest, upload.extension, upload.size)
+
+        # Return relative path for database storage
+        image_url = f'uploads/{key}'
+        if upload_storage.local_path(key):
+            image_variants.enqueue(image_url)  # Resized AVIF/WebP copies for picture()
+        return jsonify({
+            "success": True,
+            "message": "Image uploaded successfully",
+            "image_url": image_url,
+            "url": upload_storage.url(key) or url_for('static', filename=image_url)
+        }), 200
+    except UploadRejected as e:
+        error = "Invalid file type. Allowed: png, jpg, jpeg, gif" if e.status == 415 else e.message
+        return jsonify({"success": False, "error": error}), e.status
     except Exception as e:
         app.logger.error(f"Error uploading image: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
@@ -2766,8 +2831,8 @@ def delete_product(product_id):
 @admin_required
 def admin_bookings():
     """View all bookings"""
-    bookings = Booking.query.order_by(Booking.created_at.desc()).all()
-    return render_template('admin_bookings.html', bookings=bookings)
+    bookings = StreamedQuery(Booking.query.order_by(Booking.created_at.desc()))
+    return stream_page('admin_bookings.html', bookings=bookings)
 
 
 @app.route('/admin/booking/update-status/<int:booking_id>', methods=['POST'])
@@ -2794,8 +2859,8 @@ def update_booking_status(booking_id):
 @admin_required
 def admin_orders():
     """View all orders"""
-    orders = Order.query.order_by(Order.id.desc()).all()
-    return render_template('admin_orders.html', orders=orders)
+    orders = StreamedQuery(Order.query.order_by(Order.id.desc()))
+    return stream_page('admin_orders.html', orders=orders)
 
 
 @app.route('/admin/order/<int:order_id>')
@@ -2829,6 +2894,7 @@ def update_order_status(order_id):
 
 
 @app.route('/api/clear-data', methods=['GET'])
+@read_replicas.primary
 def clear_data():
     """Clear all seed data (development only)"""
     # SECURITY: Only allow in debug mode
@@ -2848,6 +2914,7 @@ def clear_data():
 
 
 @app.route('/admin/init', methods=['GET'])
+@read_replicas.primary
 def init_admin():
     """Initialize admin user (development only)"""
     # SECURITY: Only allow in debug mode
@@ -2895,11 +2962,8 @@ def init_admin():
 def get_user_dashboard():
     """Get user dashboard summary"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
+        user_id = user.id
         
         # Get recent orders (limit to 5)
         recent_orders = Order.query.filter_by(user_id=user_id)\
@@ -2999,13 +3063,7 @@ def cancel_user_booking(booking_id):
 def get_user_profile():
     """Get user profile"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        return jsonify({'user': user.to_dict()}), 200
+        return jsonify({'user': current_user.to_dict()}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -3015,11 +3073,7 @@ def get_user_profile():
 def update_user_profile():
     """Update user profile"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         data = request.json
         
@@ -3027,10 +3081,10 @@ def update_user_profile():
         if 'full_name' in data:
             user.full_name = data['full_name']
         if 'phone' in data:
-            user.phone = data['phone']
+            user.phone = national_phone(data['phone'])
         if 'email' in data and data['email'] != user.email:
             # Check if new email is already taken
-            existing = User.query.filter_by(email=data['email']).first()
+            existing = login_identities.find_by_email(data['email'])
             if existing and existing.id != user.id:
                 return jsonify({'error': 'Email already in use'}), 400
             user.email = data['email']
@@ -3050,11 +3104,7 @@ def update_user_profile():
 def change_password():
     """Change user password"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         data = request.json
         current_password = data.get('current_password')
@@ -3070,6 +3120,9 @@ def change_password():
         
         return jsonify({'message': 'Password changed successfully'}), 200
         
+    except HashingOverloaded:
+        db.session.rollback()
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500    
 
@@ -0,0 +1,79 @@
+"""
+Login Identity Backfill Script
+Every login path resolves its user through the ``login_identities`` table
+(services/identities.py), which is kept current as users are created or
+edited. This script writes the rows for users that predate the table, in
+batches by user id. Re-running it is harmless: each batch replaces the
+rows of the users it touches.
+
+Run ``python sync_db.py --apply`` first so the table exists.
+
+Usage:
+    python backfill_login_identities.py                      # Dry run - shows how many users lack rows
+    python backfill_login_identities.py --apply              # Backfill users without rows
+    python backfill_login_identities.py --apply --all        # Rewrite rows for every user
+    python backfill_login_identities.py --apply --batch-size 5000
+"""
+
+import argparse
+
+from sqlalchemy import exists, func, select
+
+from app import app
+from database import db
+from models import User, LoginIdentity
+from services import login_identities
+
+
+def backfill_login_identities(batch_size=1000, rewrite_all=False, apply=False):
+    """Write login identity rows for users, batch by batch."""
+    with app.app_context():
+        query = select(User)
+        if not rewrite_all:
+            query = query.where(~exists().where(LoginIdentity.user_id == User.id))
+
+        total = db.session.scalar(select(func.count()).select_from(query.subquery()))
+        print(f'Users to backfill: {total}')
+        if not total:
+            print('\nNothing to backfill!')
+            return
+
+        if not apply:
+            print('\nRun with --apply to write their identities.')
+            return
+
+        done = 0
+        last_id = 0
+        while True:
+            users = db.session.scalars(
+                query.where(User.id > last_id).order_by(User.id).limit(batch_size)
+            ).all()
+            if not users:
+                break
+            try:
+                login_identities.write(db.session.connection(), users)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f'  FAILED after {done} users: {str(e)}')
+                raise
+            done += len(users)
+            last_id = users[-1].id
+            db.session.expunge_all()
+            print(f'  Backfilled {done}/{total}')
+
+        print('\nBackfill complete!')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fill the login_identities table for existing users')
+    parser.add_argument('--apply', action='store_true', help='Write the rows')
+    parser.add_argument('--all', action='store_true', help='Rewrite rows for every user, not just those without any')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Users per batch (default 1000)')
+    args = parser.parse_args()
+
+    if args.apply:
+        print('=== LOGIN IDENTITY BACKFILL (APPLYING CHANGES) ===\n')
+    else:
+        print('=== LOGIN IDENTITY BACKFILL (DRY RUN) ===\n')
+    backfill_login_identities(batch_size=args.batch_size, rewrite_all=args.all, apply=args.apply)
@@ -0,0 +1,89 @@
+"""
+Static Asset Build Script
+Copies every file under static/ (except uploads/, image variants and the
+build inputs in static/src/) to a content-hashed name in static/dist/,
+points stylesheets' url() references at the hashed copies, precompresses
+text assets to .br/.gz, and writes static/dist/manifest.json. With the
+manifest in place url_for('static', ...) links the hashed copies, which are
+served with a one-year immutable Cache-Control (services/assets.py). Copies
+from earlier builds that the new manifest no longer references are removed.
+
+Usage:
+    python build_assets.py            # Dry run - lists files that changed since the last build
+    python build_assets.py --apply    # Fingerprint, compress and write the manifest
+"""
+
+import argparse
+import os
+
+from app import app
+from services import static_assets
+from services.assets import ENCODINGS
+
+
+def build_assets(apply=False):
+    """Fingerprint all static files and write the manifest."""
+    with app.app_context():
+        static_assets.load()
+        sources = static_assets.sources()
+        changed = []
+        for path in sources:
+            target_path = static_assets.fingerprinted_path(path, static_assets.assets)
+            if static_assets.assets.get(path) != target_path:
+                changed.append(path)
+                print(f'  CHANGED: {path} -> {target_path}')
+
+        if not changed and len(static_assets.assets) == len(sources):
+            print('\nAll static files are fingerprinted!')
+            return True
+
+        print(f'\n--- {len(changed)} file(s) new or changed, {len(sources)} in total ---\n')
+        if not apply:
+            print('Run with --apply to rebuild the manifest.')
+            return True
+
+        assets, encodings = {}, {}
+        saved = 0
+        for path in sources:
+            target_path, written = static_assets.build(path, assets)
+            assets[path] = target_path
+            encodings[target_path] = written
+            if written:
+                size = os.path.getsize(os.path.join(static_assets.static_folder, path))
+                smallest = min(
+                    os.path.getsize(os.path.join(static_assets.static_folder, target_path + suffix))
+                    for encoding, suffix in ENCODINGS if encoding in written
+                )
+                saved += size - smallest
+                print(f'  COMPRESSED: {path} ({size // 1024} KB -> {smallest // 1024} KB {"/".join(written)})')
+        static_assets.write_manifest(assets, encodings)
+
+        keep = {static_assets.MANIFEST}
+        for target_path, written in encodings.items():
+            name = os.path.relpath(os.path.join(static_assets.static_folder, target_path), static_assets.folder)
+            keep.add(name)
+            keep.update(name + suffix for encoding, suffix in ENCODINGS if encoding in written)
+        removed = 0
+        for root, dirs, files in os.walk(static_assets.folder):
+            for name in files:
+                full_path = os.path.join(root, name)
+                if os.path.relpath(full_path, static_assets.folder) not in keep:
+                    os.remove(full_path)
+                    removed += 1
+
+        print(f'\nFingerprinted {len(assets)} file(s), compression saves {saved // 1024} KB per full download')
+        print(f'Removed {removed} stale file(s)')
+        return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fingerprint and precompress static files')
+    parser.add_argument('--apply', action='store_true', help='Write the fingerprinted copies and manifest')
+    args = parser.parse_args()
+
+    if args.apply:
+        print('=== STATIC ASSETS (APPLYING CHANGES) ===\n')
+    else:
+        print('=== STATIC ASSETS (DRY RUN) ===\n')
+    if not build_assets(apply=args.apply):
+        raise SystemExit(1)
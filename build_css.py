@@ -0,0 +1,177 @@
+"""
+Stylesheet Build Script
+Replaces the in-browser Tailwind Play CDN and the third-party CDN assets
+with files served from static/:
+
+  static/css/app.css            Tailwind v3, only the classes templates/ use, minified
+  static/vendor/fontawesome/    Font Awesome CSS and webfonts cut down to the icons templates/ use
+  static/vendor/swiper/         Swiper bundle (home page sliders), pinned version
+
+build_assets.py then fingerprints and precompresses them like any other
+static file. Run this before build_assets.py on deploy, and again after
+adding Tailwind classes or icons to templates (or keep --watch running).
+
+Usage:
+    python build_css.py                 # Build everything
+    python build_css.py --skip-vendor   # Only recompile the Tailwind stylesheet
+    python build_css.py --watch         # Recompile app.css whenever a template changes
+"""
+
+import argparse
+import os
+import re
+import shutil
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC = os.path.join(ROOT, 'static')
+TEMPLATES = os.path.join(ROOT, 'templates')
+
+TAILWIND_VERSION = os.getenv('TAILWINDCSS_VERSION', 'v3.4.17')  # v3, like the Play CDN it replaces
+TAILWIND_CONFIG = os.path.join(ROOT, 'tailwind.config.js')
+TAILWIND_INPUT = os.path.join(STATIC, 'src', 'tailwind.css')
+TAILWIND_OUTPUT = os.path.join(STATIC, 'css', 'app.css')
+
+FONTAWESOME_OUTPUT = os.path.join(STATIC, 'vendor', 'fontawesome')
+FONTAWESOME_FONTS = ('fa-solid-900', 'fa-regular-400', 'fa-brands-400')
+ICON_RULE = re.compile(r'\.fa-([a-z0-9-]+)::?before\s*\{\s*content:\s*"\\([0-9a-f]+)";\s*\}\s*')
+FONT_FACE = re.compile(r'@font-face\s*\{[^}]*\}\s*')
+ICON_CLASS = re.compile(r'\bfa-([a-z0-9-]+)')
+
+SWIPER_VERSION = '8.4.7'
+SWIPER_FILES = ('swiper-bundle.min.css', 'swiper-bundle.min.js')
+SWIPER_URL = 'https://cdn.jsdelivr.net/npm/swiper@{version}/{name}'
+SWIPER_OUTPUT = os.path.join(STATIC, 'vendor', 'swiper')
+
+
+def build_tailwind(watch=False):
+    """Compile static/css/app.css with the standalone Tailwind CLI."""
+    import pytailwindcss
+    from pytailwindcss.exceptions import PyTailwindCssException
+
+    args = ['-c', TAILWIND_CONFIG, '-i', TAILWIND_INPUT, '-o', TAILWIND_OUTPUT, '--minify']
+    if watch:
+        args.append('--watch')
+    print(f'Tailwind {TAILWIND_VERSION}: templates/ -> static/css/app.css')
+    try:
+        result = pytailwindcss.run(args, cwd=ROOT, version=TAILWIND_VERSION, auto_install=True, live_output=True)
+    except PyTailwindCssException as e:
+        print(f'  FAILED: {str(e)}')
+        return False
+    if result.returncode != 0:
+        print(f'  FAILED: tailwindcss exited with {result.returncode}')
+        return False
+    print(f'  DONE: app.css ({os.path.getsize(TAILWIND_OUTPUT) // 1024} KB)')
+    return True
+
+
+def used_icons():
+    """Every ``fa-*`` class name that appears in a template."""
+    names = set()
+    for root, dirs, files in os.walk(TEMPLATES):
+        for name in files:
+            if name.endswith('.html'):
+                with open(os.path.join(root, name), encoding='utf-8') as f:
+                    names.update(ICON_CLASS.findall(f.read()))
+    return names
+
+
+def build_fontawesome():
+    """Write Font Awesome CSS and woff2 fonts holding only the icons templates use."""
+    import fontawesomefree
+    from fontTools import subset
+
+    source = os.path.join(os.path.dirname(fontawesomefree.__file__), 'static', 'fontawesomefree')
+    with open(os.path.join(source, 'css', 'all.css'), encoding='utf-8') as f:
+        css = f.read()
+
+    icons = used_icons()
+    codepoints = set()
+
+    def keep_icon(match):
+        if match.group(1) not in icons:
+            return ''
+        codepoints.add(int(match.group(2), 16))
+        return match.group(0)
+
+    def keep_font_face(match):
+        rule = match.group(0)
+        for font in FONTAWESOME_FONTS:
+            if f'/{font}.' in rule and "'Font Awesome 6" in rule:
+                # woff2 only (every browser we support), pointing at the subset
+                return re.sub(r'src:[^;]*;', f'src: url("../webfonts/{font}.woff2") format("woff2");', rule)
+        return ''  # v4/v5 compatibility faces
+
+    css = ICON_RULE.sub(keep_icon, css)
+    css = FONT_FACE.sub(keep_font_face, css)
+    banner, _, body = css.partition('*/')
+    body = re.sub(r'/\*.*?\*/', '', body, flags=re.S)
+    body = re.sub(r'\s*([{};:,>])\s*', r'\1', re.sub(r'\s+', ' ', body)).replace(';}', '}')
+    css_path = os.path.join(FONTAWESOME_OUTPUT, 'css', 'fontawesome.min.css')
+    os.makedirs(os.path.dirname(css_path), exist_ok=True)
+    with open(css_path, 'w', encoding='utf-8') as f:
+        f.write(banner + '*/\n' + body.strip() + '\n')
+    shutil.copyfile(os.path.join(source, 'LICENSE.txt'), os.path.join(FONTAWESOME_OUTPUT, 'LICENSE.txt'))
+
+    os.makedirs(os.path.join(FONTAWESOME_OUTPUT, 'webfonts'), exist_ok=True)
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    total = 0
+    for font in FONTAWESOME_FONTS:
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=codepoints)
+        typeface = subset.load_font(os.path.join(source, 'webfonts', f'{font}.ttf'), options)
+        subsetter.subset(typeface)
+        target = os.path.join(FONTAWESOME_OUTPUT, 'webfonts', f'{font}.woff2')
+        subset.save_font(typeface, target, options)
+        total += os.path.getsize(target)
+
+    print(f'  DONE: Font Awesome {len(codepoints)} icon(s), css {os.path.getsize(css_path) // 1024} KB, '
+          f'fonts {total // 1024} KB')
+    missing = sorted(name for name in icons if not re.search(rf'\.fa-{re.escape(name)}(?![a-z0-9-])', css))
+    if missing:
+        print(f'  WARNING: unknown icon class(es): {", ".join(missing)}')
+    return True
+
+
+def vendor_swiper():
+    """Download the pinned Swiper bundle into static/vendor/swiper/ (kept if already there)."""
+    os.makedirs(SWIPER_OUTPUT, exist_ok=True)
+    version_file = os.path.join(SWIPER_OUTPUT, 'VERSION')
+    if os.path.exists(version_file):
+        with open(version_file) as f:
+            if f.read().strip() == SWIPER_VERSION and all(
+                    os.path.exists(os.path.join(SWIPER_OUTPUT, name)) for name in SWIPER_FILES):
+                print(f'  SKIPPED: Swiper {SWIPER_VERSION} already vendored')
+                return True
+
+    for name in SWIPER_FILES:
+        url = SWIPER_URL.format(version=SWIPER_VERSION, name=name)
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                data = response.read()
+        except OSError as e:
+            print(f'  FAILED: {url} - {str(e)}')
+            return False
+        with open(os.path.join(SWIPER_OUTPUT, name), 'wb') as f:
+            f.write(data)
+    with open(version_file, 'w') as f:
+        f.write(SWIPER_VERSION + '\n')
+    print(f'  DONE: Swiper {SWIPER_VERSION}')
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the Tailwind stylesheet and vendored CSS/JS assets')
+    parser.add_argument('--skip-vendor', action='store_true', help='Only recompile the Tailwind stylesheet')
+    parser.add_argument('--watch', action='store_true', help='Rebuild app.css on template changes (implies --skip-vendor)')
+    args = parser.parse_args()
+
+    print('=== STYLESHEET BUILD ===\n')
+    ok = True
+    if not (args.skip_vendor or args.watch):
+        ok = build_fontawesome() and vendor_swiper()
+    ok = build_tailwind(watch=args.watch) and ok
+    if not ok:
+        raise SystemExit(1)
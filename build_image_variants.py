@@ -0,0 +1,81 @@
+"""
+Image Variant Build Script
+Generates the resized AVIF/WebP variants (services/images.py) for every
+image under static/, so pages can serve them from the first request
+instead of waiting for the background thread. Variants are stored by
+content hash: unchanged images are skipped, and re-running is cheap.
+
+Usage:
+    python build_image_variants.py            # Dry run - lists images without variants
+    python build_image_variants.py --apply    # Generate the missing variants
+"""
+
+import argparse
+import os
+import time
+
+from app import app
+from services import image_variants
+from services.images import IMAGE_EXTENSIONS
+
+
+def find_images():
+    """Static-relative paths of all source images (skipping generated variants)."""
+    paths = []
+    for root, dirs, files in os.walk(image_variants.static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != image_variants.folder]
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                full_path = os.path.join(root, name)
+                paths.append(os.path.relpath(full_path, image_variants.static_folder).replace(os.sep, '/'))
+    return sorted(paths)
+
+
+def build_image_variants(apply=False):
+    """Generate variants for images that don't have them yet."""
+    with app.app_context():
+        missing = []
+        for path in find_images():
+            digest = image_variants.digest(os.path.join(image_variants.static_folder, path))
+            if not os.path.exists(image_variants.meta_path(digest)):
+                missing.append(path)
+                print(f'  MISSING: {path}')
+
+        if not missing:
+            print('\nAll images have variants!')
+            return True
+
+        print(f'\n--- {len(missing)} image(s) without variants ---\n')
+        if not apply:
+            print('Run with --apply to generate them.')
+            return True
+
+        failed = 0
+        for path in missing:
+            start = time.perf_counter()
+            try:
+                meta = image_variants.generate(path)
+            except Exception as e:
+                failed += 1
+                print(f'  FAILED: {path} - {str(e)}')
+                continue
+            source_kb = os.path.getsize(os.path.join(image_variants.static_folder, path)) // 1024
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f'  DONE: {path} ({source_kb} KB) -> {len(meta["widths"])} width(s) x '
+                  f'{"/".join(meta["formats"]) or "none (animated)"} in {elapsed:.0f} ms')
+
+        print(f'\nGenerated variants for {len(missing) - failed}/{len(missing)} image(s)')
+        return not failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate resized AVIF/WebP variants of static images')
+    parser.add_argument('--apply', action='store_true', help='Generate the missing variants')
+    args = parser.parse_args()
+
+    if args.apply:
+        print('=== IMAGE VARIANTS (APPLYING CHANGES) ===\n')
+    else:
+        print('=== IMAGE VARIANTS (DRY RUN) ===\n')
+    if not build_image_variants(apply=args.apply):
+        raise SystemExit(1)
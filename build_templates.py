@@ -0,0 +1,56 @@
+"""
+Template Precompile Script
+Compiles every template under templates/ and stores the generated code in
+the Jinja bytecode cache (JINJA_BYTECODE_CACHE_DIR, default .jinja_cache/),
+so workers load compiled templates instead of parsing them on their first
+request. Run it as a build step; the cache is keyed by each template's
+path and source, so it must be built at the same path the app runs from,
+and a changed template is simply recompiled on first use.
+
+Usage:
+    python build_templates.py            # Compile all templates into the cache
+    python build_templates.py --clear    # Empty the cache first
+"""
+
+import argparse
+import time
+
+from app import app
+
+
+def build_templates(clear=False):
+    """Compile every template into the bytecode cache."""
+    env = app.jinja_env
+    if env.bytecode_cache is None:
+        print('Bytecode cache is disabled (JINJA_BYTECODE_CACHE_DIR is empty)')
+        return False
+
+    print(f'Cache directory: {app.config["JINJA_BYTECODE_CACHE_DIR"]}\n')
+    if clear:
+        env.bytecode_cache.clear()
+        print('Cleared existing cache.\n')
+
+    failed = []
+    names = env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    start = time.perf_counter()
+    for name in names:
+        try:
+            env.get_template(name)
+            print(f'  COMPILED: {name}')
+        except Exception as e:
+            failed.append(name)
+            print(f'  FAILED: {name} - {str(e)}')
+
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f'\nCompiled {len(names) - len(failed)}/{len(names)} templates in {elapsed:.0f} ms')
+    return not failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompile Jinja templates into the bytecode cache')
+    parser.add_argument('--clear', action='store_true', help='Remove cached bytecode before compiling')
+    args = parser.parse_args()
+
+    print('=== TEMPLATE PRECOMPILE ===\n')
+    if not build_templates(clear=args.clear):
+        raise SystemExit(1)
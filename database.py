@@ -1,2 +1,18 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
-db = SQLAlchemy()
\ No newline at end of file
+from flask_sqlalchemy.session import Session
+
+
+class RoutingSession(Session):
+    """db.session, letting services/replicas.py send reads to a read replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context():
+            replicas = current_app.extensions.get('read_replicas')
+            engine = replicas.bind_for(clause) if replicas is not None else None
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
@@ -0,0 +1,154 @@
+import bcrypt
+import hashlib
+import hmac
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+
+class HashingOverloaded(Exception):
+    """Raised when the bcrypt queue is full; routes answer 503 instead of waiting"""
+
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(pw_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+
+
+_BCRYPT_COST = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+
+def hash_cost(pw_hash):
+    """Return the work factor stored in a bcrypt hash, or None if it isn't one"""
+    match = _BCRYPT_COST.match(pw_hash or '')
+    return int(match.group(1)) if match else None
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool instead of the request thread.
+
+    Hashes are compatible with the flask_bcrypt ones already stored. At most
+    HASHING_QUEUE_DEPTH hashes may be queued or running per app worker; past
+    that, callers get HashingOverloaded straight away so a login storm turns
+    into fast 503s instead of starving every worker of CPU.
+    Without init_app (scripts, shells) hashing runs inline.
+
+    BCRYPT_LOG_ROUNDS sets the cost of new hashes; ``needs_rehash`` tells
+    callers when a stored hash was made with a different cost so it can be
+    upgraded on the next successful login. With PASSWORD_VERIFY_CACHE_TTL
+    set, successful verifications are remembered in memory for that many
+    seconds, keyed by an HMAC of the stored hash and the password under a
+    per-process random key, so repeated API logins skip bcrypt.
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.timeout = None
+        self.max_workers = None
+        self._slots = None
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._verified = None
+        self._verify_key = os.urandom(32)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+        app.config.setdefault('HASHING_WORKERS', os.cpu_count() or 1)
+        app.config.setdefault('HASHING_QUEUE_DEPTH', app.config['HASHING_WORKERS'] * 4)
+        app.config.setdefault('HASHING_TIMEOUT', 10)  # seconds
+        app.config.setdefault('PASSWORD_VERIFY_CACHE_TTL', 0)  # seconds, 0 disables
+        app.config.setdefault('PASSWORD_VERIFY_CACHE_SIZE', 10000)
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.max_workers = app.config['HASHING_WORKERS']
+        self.timeout = app.config['HASHING_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(app.config['HASHING_QUEUE_DEPTH'])
+        if app.config['PASSWORD_VERIFY_CACHE_TTL']:
+            from services.cache import TTLCache
+            self._verified = TTLCache(
+                maxsize=app.config['PASSWORD_VERIFY_CACHE_SIZE'],
+                ttl=app.config['PASSWORD_VERIFY_CACHE_TTL']
+            )
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        """Return a bcrypt hash for ``password``"""
+        return self._run(_hash_password, password, self.rounds)
+
+    def check(self, pw_hash, password):
+        """Verify ``password`` against a stored bcrypt hash"""
+        if not pw_hash or password is None:
+            return False
+        if self._verified is None:
+            return self._run(_check_password, pw_hash, password)
+
+        key = self._cache_key(pw_hash, password)
+        if self._verified.get(key):
+            return True
+        ok = self._run(_check_password, pw_hash, password)
+        if ok:
+            self._verified.set(key, True)
+        return ok
+
+    def needs_rehash(self, pw_hash):
+        """True if ``pw_hash`` was not made with the configured cost"""
+        return hash_cost(pw_hash) != self.rounds
+
+    def rehash_if_needed(self, pw_hash, password):
+        """Return a new hash at the configured cost if ``pw_hash`` is outdated.
+
+        Only call this after ``password`` was verified. The upgrade is
+        skipped (None) when the pool is busy; the next login retries it.
+        """
+        if not self.needs_rehash(pw_hash):
+            return None
+        try:
+            return self.hash(password)
+        except HashingOverloaded:
+            return None
+
+    def _cache_key(self, pw_hash, password):
+        message = pw_hash.encode('utf-8') + b'\0' + password.encode('utf-8')
+        return hmac.new(self._verify_key, message, hashlib.sha256).hexdigest()
+
+    def _get_executor(self):
+        # gunicorn forks workers after import; each one needs its own pool
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if self._slots is None:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HashingOverloaded('Password hashing queue is full')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot stays taken until the pool has finished the work, not just
+        # until this request stops waiting, so a timeout can't overfill the queue
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()  # Only drops it if it hasn't started yet
+            raise HashingOverloaded('Password hashing timed out')
+
+
+password_hasher = PasswordHasher()
@@ -8,4 +8,7 @@ from .admin import Admin
 from .booking import Booking
 from .order import Order, OrderItem
 from .otp import OTP
-from .temple import Temple, TemplePuja
\ No newline at end of file
+from .temple import Temple, TemplePuja
+from .payment_event import PaymentEvent
+from .revoked_token import RevokedToken
+from .login_identity import LoginIdentity
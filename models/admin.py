@@ -1,5 +1,5 @@
 from database import db
-from flask_bcrypt import generate_password_hash, check_password_hash
+from hashing import password_hasher
 
 class Admin(db.Model):
     __tablename__ = 'admins'
@@ -15,10 +15,15 @@ class Admin(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.now())
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not password_hasher.check(self.password_hash, password):
+            return False
+        new_hash = password_hasher.rehash_if_needed(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash  # Committed by admin_login
+        return True
     
     def to_dict(self):
         return {
@@ -27,7 +27,7 @@ class Booking(db.Model):
     booking_number = db.Column(db.String(50), unique=True, nullable=True)
     amount = db.Column(db.Numeric(10, 2), default=999)  # Default booking fee
     payment_status = db.Column(db.String(50), default='pending')  # pending, paid, refunded
-    razorpay_order_id = db.Column(db.String(100), nullable=True)
+    razorpay_order_id = db.Column(db.String(100), nullable=True, index=True)
     payment_reference = db.Column(db.String(100), nullable=True)
     payment_date = db.Column(db.DateTime, nullable=True)
     
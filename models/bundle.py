@@ -1,4 +1,5 @@
 from database import db
+from datetime import datetime, timezone
 
 class Bundle(db.Model):
     __tablename__ = 'bundles'
@@ -12,4 +13,5 @@ class Bundle(db.Model):
     image_url = db.Column(db.String(200))
     original_price = db.Column(db.Numeric(10, 2), nullable=False)
     discounted_price = db.Column(db.Numeric(10, 2), nullable=False)
-    includes = db.Column(db.Text)
\ No newline at end of file
+    includes = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)  # Drives catalog page ETags
\ No newline at end of file
@@ -0,0 +1,29 @@
+# models/login_identity.py
+from database import db
+
+class LoginIdentity(db.Model):
+    """One normalized identifier a user can sign in with.
+
+    ``kind`` is 'email' (lowercased), 'username' (as stored) or 'phone'
+    (E.164). Rows are written by services/identities.py whenever a User's
+    email, username or phone changes, so every login path resolves its user
+    with a single probe on ``(value, kind)``.
+    """
+    __tablename__ = 'login_identities'
+    __table_args__ = (
+        db.Index('ix_login_identities_value_kind', 'value', 'kind'),
+        {'schema': 'public', 'extend_existing': True}
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)
+    value = db.Column(db.String(255), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'value': self.value,
+            'user_id': self.user_id
+        }
@@ -8,7 +8,7 @@ class Order(db.Model):
         {'schema': 'public', 'extend_existing': True}
     )
     
-    razorpay_order_id = db.Column(db.String(100), nullable=True)  # razorpay
+    razorpay_order_id = db.Column(db.String(100), nullable=True, index=True)  # razorpay
     payment_date = db.Column(db.DateTime, nullable=True)  # razorpay
     payment_reference = db.Column(db.String(100), nullable=True)  # razorpay payment ID
     id = db.Column(db.Integer, primary_key=True)
@@ -5,6 +5,7 @@ import random
 import string
 
 class OTP(db.Model):
+    """Legacy email OTP rows. Codes now live in services/otp.py; empty with purge_otps.py"""
     __tablename__ = "otps"
     __table_args__ = {'schema': 'public', 'extend_existing': True}
 
@@ -1,4 +1,5 @@
 from database import db
+from datetime import datetime, timezone
 
 class Pandit(db.Model):
     __tablename__ = "pandits"
@@ -24,6 +25,7 @@ class Pandit(db.Model):
     phone = db.Column(db.String(20))
     specialties = db.Column(db.Text)
     is_approved = db.Column(db.Boolean, default=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)  # Drives catalog page ETags
     
     def to_dict(self):
         return {
@@ -0,0 +1,37 @@
+# models/payment_event.py
+from database import db
+from datetime import datetime, timezone
+import json
+
+class PaymentEvent(db.Model):
+    """Raw Razorpay webhook event.
+
+    Rows are append-only: the payload is never rewritten, the background
+    consumer only stamps ``processed_at`` once the event has been applied.
+    """
+    __tablename__ = 'payment_events'
+    __table_args__ = {'schema': 'public', 'extend_existing': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(100), unique=True, nullable=False)  # X-Razorpay-Event-Id (dedupe key)
+    event_type = db.Column(db.String(50), nullable=False)  # payment.captured, order.paid
+    razorpay_order_id = db.Column(db.String(100), index=True)
+    razorpay_payment_id = db.Column(db.String(100))
+    payload = db.Column(db.Text, nullable=False)  # Raw JSON body as received
+    received_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    processed_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    def get_payload(self):
+        """Return the stored webhook body as a dict"""
+        return json.loads(self.payload)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'event_id': self.event_id,
+            'event_type': self.event_type,
+            'razorpay_order_id': self.razorpay_order_id,
+            'razorpay_payment_id': self.razorpay_payment_id,
+            'received_at': self.received_at.strftime('%Y-%m-%d %H:%M:%S') if self.received_at else None,
+            'processed_at': self.processed_at.strftime('%Y-%m-%d %H:%M:%S') if self.processed_at else None
+        }
@@ -1,4 +1,5 @@
 from database import db
+from datetime import datetime, timezone
 
 class PujaMaterial(db.Model):
     __tablename__ = 'puja_materials'
@@ -10,4 +11,5 @@ class PujaMaterial(db.Model):
     tagline = db.Column(db.String(100))  # Short benefit line for card display
     image_url = db.Column(db.String(200))
     description = db.Column(db.Text)
-    price = db.Column(db.Numeric(10, 2), nullable=False)
\ No newline at end of file
+    price = db.Column(db.Numeric(10, 2), nullable=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)  # Drives catalog page ETags
\ No newline at end of file
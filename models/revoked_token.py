@@ -0,0 +1,27 @@
+# models/revoked_token.py
+from database import db
+from datetime import datetime, timezone
+
+class RevokedToken(db.Model):
+    """JWT revoked before its expiry (logout).
+
+    Rows are only needed until the token would have expired anyway; the
+    revocation service prunes them after ``expires_at``.
+    """
+    __tablename__ = 'revoked_tokens'
+    __table_args__ = {'schema': 'public', 'extend_existing': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), unique=True, nullable=False)  # JWT ID claim
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    revoked_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'jti': self.jti,
+            'user_id': self.user_id,
+            'revoked_at': self.revoked_at.strftime('%Y-%m-%d %H:%M:%S') if self.revoked_at else None,
+            'expires_at': self.expires_at.strftime('%Y-%m-%d %H:%M:%S') if self.expires_at else None
+        }
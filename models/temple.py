@@ -1,4 +1,5 @@
 from database import db
+from datetime import datetime, timezone
 
 class Temple(db.Model):
     __tablename__ = 'temples'
@@ -16,6 +17,7 @@ class Temple(db.Model):
     starting_price = db.Column(db.Numeric(10, 2), default=999)
     is_featured = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)  # Drives catalog page ETags
 
     # Relationship to pujas - using 'selectin' for eager loading to avoid N+1 queries
     pujas = db.relationship('TemplePuja', backref='temple', lazy='selectin', cascade='all, delete-orphan')
@@ -40,6 +42,7 @@ class TemplePuja(db.Model):
     image_url = db.Column(db.String(200))
     is_popular = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)  # Drives catalog page ETags
 
     def __repr__(self):
         return f'<TemplePuja {self.name} at {self.temple.name if self.temple else "Unknown"}>'
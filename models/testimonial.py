@@ -1,4 +1,5 @@
 from database import db
+from datetime import datetime, timezone
 
 class Testimonial(db.Model):
     __tablename__ = 'testimonials'
@@ -10,4 +11,5 @@ class Testimonial(db.Model):
     author_image = db.Column(db.String(200))
     content = db.Column(db.Text, nullable=False)
     rating = db.Column(db.Integer, nullable=False)
-    location = db.Column(db.String(100))
\ No newline at end of file
+    location = db.Column(db.String(100))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)  # Drives catalog page ETags
\ No newline at end of file
@@ -1,13 +1,19 @@
 # models/user.py - FINAL VERSION
 from database import db
 from flask import current_app
-from flask_bcrypt import generate_password_hash, check_password_hash
+from hashing import password_hasher
 from itsdangerous import URLSafeTimedSerializer as Serializer
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timezone
+import re
 
 class User(db.Model):
     __tablename__ = "users"
-    __table_args__ = {'schema': 'public', 'extend_existing': True}
+    __table_args__ = (
+        # Lets "username LIKE 'prefix%'" use an index whatever the DB collation
+        db.Index('ix_users_username_pattern', 'username', postgresql_ops={'username': 'varchar_pattern_ops'}),
+        {'schema': 'public', 'extend_existing': True}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(100), unique=True, nullable=False)
@@ -42,12 +48,53 @@ class User(db.Model):
     
     # Password security methods
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = generate_password_hash(password).decode('utf-8')
+        """Hash and set password (bcrypt runs in the hashing process pool)"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Verify password against hash"""
-        return check_password_hash(self.password_hash, password)
+        """Verify password against hash, upgrading it if the bcrypt cost changed.
+        The caller commits the upgraded hash."""
+        if not password_hasher.check(self.password_hash, password):
+            return False
+        new_hash = password_hasher.rehash_if_needed(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return True
+
+    @staticmethod
+    def allocate_username(base, exclude=()):
+        """Return ``base`` if free, else ``base<N>`` with the lowest free N.
+        Takes one prefix-scan query however many suffixes are in use."""
+        escaped = base.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        taken = set(exclude)
+        taken.update(name for (name,) in db.session.query(User.username)
+                     .filter(User.username.like(f"{escaped}%", escape='\\')))
+
+        pattern = re.compile(re.escape(base) + r'(\d+)')
+        suffixes = {int(m.group(1)) for m in map(pattern.fullmatch, taken) if m}
+        if base not in taken:
+            return base
+        counter = 1
+        while counter in suffixes:
+            counter += 1
+        return f"{base}{counter}"
+
+    def assign_username(self, base, attempts=5):
+        """Give this new user a free username derived from ``base`` and insert it.
+        Picks another suffix if a concurrent registration claims the same name
+        first; the caller commits."""
+        tried = set()
+        for attempt in range(attempts):
+            self.username = User.allocate_username(base, tried)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(self)
+                return self.username
+            except IntegrityError:
+                tried.add(self.username)
+                clash = db.session.query(User.id).filter_by(username=self.username).first()
+                if clash is None or attempt == attempts - 1:
+                    raise  # Some other constraint (e.g. email), or out of retries
 
     def get_reset_token(self, expires_sec=1800):
         """Generate a password reset token"""
@@ -0,0 +1,66 @@
+"""
+Legacy OTP Purge Script
+Email OTPs now live in the key-value store (services/otp.py) and expire on
+their own. The old ``otps`` table is no longer read or written; this script
+empties it in small batches so the delete never holds long locks.
+
+Usage:
+    python purge_otps.py                       # Dry run - shows how many rows would go
+    python purge_otps.py --apply               # Delete every row
+    python purge_otps.py --apply --batch-size 5000
+"""
+
+import argparse
+
+from sqlalchemy import delete, func, select
+
+from app import app
+from database import db
+from models import OTP
+
+
+def purge_otps(batch_size=1000, apply=False):
+    """Delete legacy OTP rows batch by batch."""
+    with app.app_context():
+        total = db.session.scalar(select(func.count()).select_from(OTP))
+        print(f'Legacy OTP rows: {total}')
+        if not total:
+            print('\nNothing to purge!')
+            return
+
+        if not apply:
+            print('\nRun with --apply to delete them.')
+            return
+
+        deleted = 0
+        while True:
+            ids = db.session.scalars(select(OTP.id).order_by(OTP.id).limit(batch_size)).all()
+            if not ids:
+                break
+            try:
+                db.session.execute(
+                    delete(OTP).where(OTP.id.in_(ids)),
+                    execution_options={'synchronize_session': False}
+                )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f'  FAILED after {deleted} rows: {str(e)}')
+                raise
+            deleted += len(ids)
+            print(f'  Deleted {deleted}/{total}')
+
+        print('\nPurge complete!')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Empty the legacy otps table')
+    parser.add_argument('--apply', action='store_true', help='Delete the rows')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per DELETE (default 1000)')
+    args = parser.parse_args()
+
+    if args.apply:
+        print('=== LEGACY OTP PURGE (APPLYING CHANGES) ===\n')
+    else:
+        print('=== LEGACY OTP PURGE (DRY RUN) ===\n')
+    purge_otps(batch_size=args.batch_size, apply=args.apply)
@@ -0,0 +1,176 @@
+"""
+Payment Reconciliation Script
+Finds Orders and Bookings stuck in pending/initiated with a razorpay_order_id,
+pages through Razorpay's payments API for the same time window and marks
+every row that has a captured payment as paid.
+
+Pages are fetched concurrently by a bounded pool of workers, matched in
+memory against the razorpay_order_id index of stuck rows, and applied with
+one set-based UPDATE per table per batch.
+
+Webhook events already stored but not yet applied by the app's consumer
+(e.g. received just before a deploy) are applied first.
+
+Usage:
+    python reconcile_payments.py                  # Dry run - shows what would change
+    python reconcile_payments.py --apply          # Apply changes to the database
+    python reconcile_payments.py --days 3         # Look back 3 days (default 7)
+    python reconcile_payments.py --workers 8      # Concurrent page fetchers (default 4)
+    python reconcile_payments.py --batch-size 5000
+
+Scheduled: run with --apply from cron, e.g. hourly with --days 2.
+
+Set RAZORPAY_API_BASE to run against another API endpoint, e.g. the local
+fake server in scripts/fake_razorpay.py.
+
+Confirmation emails are not re-sent for reconciled payments.
+"""
+
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import razorpay
+
+from app import app, RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET
+from database import db
+from models import Order, Booking, PaymentEvent
+from services import apply_captured_payments, payment_events
+
+STUCK_STATUSES = ('pending', 'initiated')
+PAGE_SIZE = 100  # Razorpay's maximum "count" per request
+SLICE = timedelta(hours=6)  # Time window handed to each fetch task
+
+_local = threading.local()
+
+
+def get_client():
+    """One Razorpay client (and HTTP session) per fetcher thread."""
+    if not hasattr(_local, 'client'):
+        options = {}
+        if os.getenv('RAZORPAY_API_BASE'):
+            options['base_url'] = os.getenv('RAZORPAY_API_BASE')
+        _local.client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET), **options)
+    return _local.client
+
+
+def load_stuck_index(since):
+    """Map razorpay_order_id -> (model name, our reference) for unpaid rows."""
+    index = {}
+    for model, reference in ((Order, Order.order_number), (Booking, Booking.booking_number)):
+        rows = db.session.query(model.razorpay_order_id, reference)\
+            .filter(model.razorpay_order_id.isnot(None))\
+            .filter(model.payment_status.in_(STUCK_STATUSES))\
+            .filter(model.created_at >= since)\
+            .all()
+        for razorpay_order_id, ref in rows:
+            index[razorpay_order_id] = (model.__name__, ref)
+    return index
+
+
+def fetch_slice(start, end):
+    """Fetch every payment created in [start, end) (unix seconds), following skip pagination."""
+    payments = []
+    skip = 0
+    while True:
+        page = get_client().payment.all({
+            'from': start,
+            'to': end - 1,
+            'count': PAGE_SIZE,
+            'skip': skip
+        })
+        items = page.get('items', [])
+        payments.extend(items)
+        if len(items) < PAGE_SIZE:
+            return payments
+        skip += PAGE_SIZE
+
+
+def fetch_captured(since, until, index, workers):
+    """Fetch all slices with a bounded pool and keep captures for stuck rows."""
+    start, end = int(since.timestamp()), int(until.timestamp()) + 1
+    step = int(SLICE.total_seconds())
+    slices = [(s, min(s + step, end)) for s in range(start, end, step)]
+
+    captures = {}
+    fetched = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fetch_slice, s, e) for s, e in slices]
+        for future in as_completed(futures):
+            for payment in future.result():
+                fetched += 1
+                order_id = payment.get('order_id')
+                if payment.get('status') != 'captured' or order_id not in index:
+                    continue
+                paid_at = datetime.fromtimestamp(payment['created_at'], tz=timezone.utc)
+                captures[order_id] = (payment['id'], paid_at)
+    return captures, fetched
+
+
+def reconcile(days=7, workers=4, batch_size=1000, apply=False):
+    """Reconcile stuck payments against Razorpay."""
+    until = datetime.now(timezone.utc)
+    since = until - timedelta(days=days)
+
+    with app.app_context():
+        pending_events = PaymentEvent.query.filter(PaymentEvent.processed_at.is_(None)).count()
+        print(f'Stored webhook events not yet applied: {pending_events}')
+        if pending_events and apply:
+            applied = 0
+            while True:
+                claimed = payment_events.process_batch(batch_size)
+                applied += claimed
+                if claimed < batch_size:
+                    break
+            print(f'  Applied {applied} stored event(s)')
+
+        index = load_stuck_index(since.replace(tzinfo=None))
+        print(f'Stuck rows with a Razorpay order: {len(index)}')
+        if not index:
+            print('\nNothing to reconcile!')
+            return
+
+        captures, fetched = fetch_captured(since, until, index, workers)
+        print(f'Payments fetched from Razorpay: {fetched}')
+        print(f'Captured payments for stuck rows: {len(captures)}')
+
+        if not captures:
+            print('\nNo stuck payments were captured.')
+            return
+
+        if not apply:
+            print('\nRun with --apply to mark these as paid:')
+            for razorpay_order_id, (payment_id, paid_at) in sorted(captures.items()):
+                model_name, ref = index[razorpay_order_id]
+                print(f'  {model_name} {ref}: {razorpay_order_id} -> {payment_id} ({paid_at:%Y-%m-%d %H:%M})')
+            return
+
+        print('\nApplying changes...\n')
+        try:
+            order_ids, booking_ids = apply_captured_payments(captures, batch_size=batch_size)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f'  FAILED: {str(e)}')
+            raise
+
+        print(f'  Orders marked paid:   {len(order_ids)}')
+        print(f'  Bookings marked paid: {len(booking_ids)}')
+        print('\nReconciliation complete!')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reconcile stuck payments against Razorpay')
+    parser.add_argument('--apply', action='store_true', help='Write changes to the database')
+    parser.add_argument('--days', type=int, default=7, help='How far back to look (default 7)')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent page fetchers (default 4)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per UPDATE (default 1000)')
+    args = parser.parse_args()
+
+    if args.apply:
+        print('=== PAYMENT RECONCILIATION (APPLYING CHANGES) ===\n')
+    else:
+        print('=== PAYMENT RECONCILIATION (DRY RUN) ===\n')
+    reconcile(days=args.days, workers=args.workers, batch_size=args.batch_size, apply=args.apply)
@@ -0,0 +1,61 @@
+"""
+Bcrypt Cost Benchmark
+Times bcrypt verification on this machine for a range of work factors and
+recommends the highest cost whose median verification stays under a target.
+Run it on the production instance type, then set BCRYPT_LOG_ROUNDS; existing
+hashes are upgraded to the new cost as users log in.
+
+Usage:
+    python scripts/bench_bcrypt_cost.py                    # Target 250ms, costs 10-14
+    python scripts/bench_bcrypt_cost.py --target-ms 100
+    python scripts/bench_bcrypt_cost.py --min-cost 8 --max-cost 16 --samples 10
+"""
+
+import argparse
+import statistics
+import time
+
+import bcrypt
+
+
+def time_cost(cost, samples):
+    """Median and max verification time in ms for one work factor"""
+    password = b'benchmark-password'
+    pw_hash = bcrypt.hashpw(password, bcrypt.gensalt(cost))
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.checkpw(password, pw_hash)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def pick_cost(target_ms, min_cost, max_cost, samples):
+    """Return the highest cost whose median stays within target_ms"""
+    chosen = None
+    print(f'{"cost":>4}  {"median":>10}  {"max":>10}')
+    for cost in range(min_cost, max_cost + 1):
+        median, worst = time_cost(cost, samples)
+        marker = ''
+        if median <= target_ms:
+            chosen = cost
+            marker = '  <= target'
+        print(f'{cost:>4}  {median:>8.1f}ms  {worst:>8.1f}ms{marker}')
+        if median > target_ms * 2:
+            break  # Every further step doubles the time
+    return chosen
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pick a bcrypt cost for a target verification time')
+    parser.add_argument('--target-ms', type=float, default=250, help='Target verification time (default 250)')
+    parser.add_argument('--min-cost', type=int, default=10)
+    parser.add_argument('--max-cost', type=int, default=14)
+    parser.add_argument('--samples', type=int, default=5, help='Verifications per cost (default 5)')
+    args = parser.parse_args()
+
+    cost = pick_cost(args.target_ms, args.min_cost, args.max_cost, args.samples)
+    if cost is None:
+        print(f'\nNo cost in range meets {args.target_ms:.0f}ms; use BCRYPT_LOG_ROUNDS={args.min_cost} at most.')
+    else:
+        print(f'\nRecommended: BCRYPT_LOG_ROUNDS={cost}')
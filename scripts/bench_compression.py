@@ -0,0 +1,97 @@
+"""
+Response Compression Benchmark
+Fetches real responses from a running server and reports, per response
+class (HTML pages, JSON APIs, ...), how many bytes each brotli/gzip level
+saves and the CPU it costs per response, to choose COMPRESS_BROTLI_QUALITY
+and COMPRESS_GZIP_LEVEL (services/compression.py). It also shows what the
+server actually sent for each path with a browser-like Accept-Encoding.
+
+Usage:
+    gunicorn app:app --bind 127.0.0.1:5000   # in another shell
+    python scripts/bench_compression.py
+    python scripts/bench_compression.py --paths / /temples /api/pandit-ji --token <access token>
+    python scripts/bench_compression.py --repeat 50
+"""
+
+import argparse
+import gzip
+import statistics
+import time
+from collections import defaultdict
+
+import requests
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 11)
+
+
+def settings():
+    """(label, compress function) for every level worth comparing"""
+    options = [(f'gzip-{level}', lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0))
+               for level in GZIP_LEVELS]
+    if brotli is not None:
+        options += [(f'br-{quality}', lambda data, quality=quality: brotli.compress(data, quality=quality))
+                    for quality in BROTLI_QUALITIES]
+    return options
+
+
+def response_class(content_type):
+    mimetype = (content_type or '').split(';')[0].strip()
+    return {'text/html': 'html', 'application/json': 'json', 'text/css': 'css'}.get(mimetype, mimetype or 'other')
+
+
+def cpu_ms(compress, data, repeat):
+    """Median CPU milliseconds to compress ``data`` once"""
+    timings = []
+    for _ in range(repeat):
+        start = time.process_time()
+        compress(data)
+        timings.append((time.process_time() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(base_url, paths, token, repeat):
+    session = requests.Session()
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    bodies = defaultdict(list)
+
+    print(f'Target: {base_url}\n')
+    print(f'{"path":<28} {"class":<6} {"identity":>10} {"sent":>10}  encoding')
+    for path in paths:
+        raw = session.get(base_url + path, headers={**headers, 'Accept-Encoding': 'identity'}, timeout=30)
+        if raw.status_code != 200:
+            print(f'{path:<28} HTTP {raw.status_code}, skipped')
+            continue
+        sent = session.get(base_url + path, headers={**headers, 'Accept-Encoding': 'br, gzip'}, timeout=30, stream=True)
+        wire = len(sent.raw.read(decode_content=False))
+        kind = response_class(raw.headers.get('Content-Type'))
+        bodies[kind].append(raw.content)
+        print(f'{path:<28} {kind:<6} {len(raw.content):>9,}B {wire:>9,}B  {sent.headers.get("Content-Encoding", "-")}')
+
+    if brotli is None:
+        print('\n(brotli not installed: gzip levels only)')
+    for kind, samples in bodies.items():
+        total = sum(len(body) for body in samples)
+        print(f'\n{kind}: {len(samples)} response(s), {total / len(samples) / 1024:.1f} KB average')
+        print(f'  {"setting":<9} {"ratio":>6} {"saved/resp":>11} {"cpu/resp":>9} {"KB saved per cpu-ms":>20}')
+        for label, compress in settings():
+            compressed = sum(len(compress(body)) for body in samples)
+            cpu = sum(cpu_ms(compress, body, repeat) for body in samples) / len(samples)
+            saved = (total - compressed) / len(samples) / 1024
+            print(f'  {label:<9} {compressed / total:>6.2f} {saved:>9.1f}KB {cpu:>7.2f}ms {saved / max(cpu, 0.001):>20.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bytes saved and CPU cost of response compression levels')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--paths', nargs='+', default=['/', '/temples', '/pandits', '/api/user/orders'])
+    parser.add_argument('--token', help='JWT access token for authenticated API paths')
+    parser.add_argument('--repeat', type=int, default=20, help='Timing samples per response (default 20)')
+    args = parser.parse_args()
+
+    run(args.url.rstrip('/'), args.paths, args.token, args.repeat)
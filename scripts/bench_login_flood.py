@@ -0,0 +1,183 @@
+"""
+Login Flood Benchmark
+Measures catalog page latency against a running server, first on its own
+and then while a pool of threads hammers /api/login with bad passwords, to
+check that bcrypt work no longer starves cheap requests.
+
+The flood logs in to a real account (registered on startup, or passed with
+--email/--password), since logins to unknown emails answer 401 without
+hashing anything. Run the server with rate limiting off, or the login
+limits turn the flood into cheap 429s; the run fails if the answers show
+no bcrypt work happened.
+
+Usage:
+    RATELIMIT_ENABLED=false gunicorn app:app --bind 127.0.0.1:5000 --workers 2 --threads 4   # in another shell
+    python scripts/bench_login_flood.py
+    python scripts/bench_login_flood.py --url http://127.0.0.1:5000 --flood 64 --seconds 20
+    python scripts/bench_login_flood.py --paths /pandits /temples
+    python scripts/bench_login_flood.py --email someone@example.com --password their-password
+
+Lower HASHING_QUEUE_DEPTH / HASHING_WORKERS in the server environment to see
+the 503 load shedding kick in sooner.
+"""
+
+import argparse
+import secrets
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+MIN_HASH_MS = 5  # A wrong password answered faster than this never went through bcrypt
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure_catalog(base_url, paths, seconds):
+    """Fetch catalog pages back to back and return latencies in ms"""
+    session = requests.Session()
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = session.get(base_url + path, timeout=30)
+            if response.status_code != 200:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, errors
+
+
+def login(base_url, email, password):
+    """POST /api/login; returns (status, ms)"""
+    start = time.perf_counter()
+    response = requests.post(base_url + '/api/login', json={'email': email, 'password': password}, timeout=30)
+    return response.status_code, (time.perf_counter() - start) * 1000
+
+
+def prepare_account(base_url, email, password):
+    """Make sure the flood hits an account that exists, so every bad password costs a bcrypt check"""
+    if email is None:
+        email = f'flood-{secrets.token_hex(4)}@example.com'
+        password = secrets.token_urlsafe(12)
+        response = requests.post(base_url + '/api/register', json={
+            'email': email, 'password': password, 'full_name': 'Login Flood'
+        }, timeout=30)
+        if response.status_code != 201:
+            raise SystemExit(f'Could not register {email}: {response.status_code} {response.text[:200]}\n'
+                             'Pass an existing account with --email/--password.')
+        print(f'Registered {email} for the flood')
+
+    status, _ = login(base_url, email, password)
+    if status == 429:
+        raise SystemExit('Login is rate limited: start the server with RATELIMIT_ENABLED=false')
+    if status != 200:
+        raise SystemExit(f'Login as {email} failed ({status}): check --email/--password')
+    return email
+
+
+def flood_logins(base_url, email, stop, statuses, rejected_ms, lock):
+    """Post wrong passwords for ``email`` until told to stop"""
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = session.post(base_url + '/api/login', json={
+                'email': email,
+                'password': 'not-the-password'
+            }, timeout=30)
+            status = response.status_code
+        except requests.RequestException:
+            status = 'error'
+        with lock:
+            statuses[status] += 1
+            if status == 401:
+                rejected_ms.append((time.perf_counter() - start) * 1000)
+
+
+def report(label, latencies, errors):
+    if not latencies:
+        print(f'{label:>14}: no successful requests ({errors} errors)')
+        return
+    print(f'{label:>14}: n={len(latencies):<6} '
+          f'p50={percentile(latencies, 50):7.1f}ms  '
+          f'p95={percentile(latencies, 95):7.1f}ms  '
+          f'p99={percentile(latencies, 99):7.1f}ms  '
+          f'mean={statistics.mean(latencies):7.1f}ms  errors={errors}')
+
+
+def check_hashing(statuses, rejected_ms):
+    """Fail if the flood's answers show it never reached bcrypt"""
+    total = sum(statuses.values())
+    if statuses[429] > total * 0.05:
+        raise SystemExit(f'{statuses[429]} of {total} logins were rate limited (429), so the flood '
+                         'mostly skipped hashing: run the server with RATELIMIT_ENABLED=false')
+    if statuses[401] == 0 and statuses[503] == 0:
+        raise SystemExit('No login reached password checking (no 401/503 answers)')
+    if rejected_ms and percentile(rejected_ms, 50) < MIN_HASH_MS:
+        raise SystemExit(f'Wrong passwords were rejected in {percentile(rejected_ms, 50):.1f}ms (p50), '
+                         'too fast for bcrypt: the flood is not hashing')
+
+
+def run(base_url, paths, flood, seconds, email, password):
+    print(f'Target: {base_url}  catalog paths: {", ".join(paths)}\n')
+    email = prepare_account(base_url, email, password)
+
+    baseline, baseline_errors = measure_catalog(base_url, paths, seconds)
+    report('baseline', baseline, baseline_errors)
+
+    stop = threading.Event()
+    statuses = Counter()
+    rejected_ms = []
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=flood) as pool:
+        for _ in range(flood):
+            pool.submit(flood_logins, base_url, email, stop, statuses, rejected_ms, lock)
+        time.sleep(1)  # let the flood ramp up
+        flooded, flooded_errors = measure_catalog(base_url, paths, seconds)
+        stop.set()
+    report('during flood', flooded, flooded_errors)
+
+    total = sum(statuses.values())
+    print(f'\nLogin requests sent: {total} ({total / (seconds + 1):.0f}/s)')
+    for status, count in sorted(statuses.items(), key=lambda item: str(item[0])):
+        print(f'  {status}: {count} ({count * 100 / total:.1f}%)')
+    if rejected_ms:
+        print(f'  401 latency p50={percentile(rejected_ms, 50):.1f}ms')
+
+    if baseline and flooded:
+        ratio = percentile(flooded, 95) / max(percentile(baseline, 95), 0.001)
+        print(f'\nCatalog p95 during flood is {ratio:.2f}x baseline')
+
+    check_hashing(statuses, rejected_ms)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Catalog latency under a login flood')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--paths', nargs='+', default=['/pandits', '/temples', '/'])
+    parser.add_argument('--flood', type=int, default=32, help='Concurrent login threads (default 32)')
+    parser.add_argument('--seconds', type=int, default=15, help='Duration of each phase (default 15)')
+    parser.add_argument('--email', help='Existing account to flood (default: register a new one)')
+    parser.add_argument('--password', help='Its password')
+    args = parser.parse_args()
+    if bool(args.email) != bool(args.password):
+        parser.error('--email and --password go together')
+
+    run(args.url.rstrip('/'), args.paths, args.flood, args.seconds, args.email, args.password)
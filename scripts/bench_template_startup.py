@@ -0,0 +1,86 @@
+"""
+Template Startup Benchmark
+Times what a freshly booted worker spends loading each page template (the
+template plus everything it extends or includes) before its first render:
+once compiling from source, once loading from the bytecode cache that
+build_templates.py fills. Every measurement uses a new Jinja environment,
+so nothing is shared between templates or runs.
+
+Usage:
+    python build_templates.py                          # Fill the cache first
+    python scripts/bench_template_startup.py
+    python scripts/bench_template_startup.py --samples 10 --top 10
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jinja2 import FileSystemBytecodeCache, meta
+
+from app import app
+
+
+def dependencies(env, name, seen=None):
+    """``name`` and every template it extends, includes or imports"""
+    seen = seen if seen is not None else []
+    if name in seen:
+        return seen
+    seen.append(name)
+    source = env.loader.get_source(env, name)[0]
+    for ref in meta.find_referenced_templates(env.parse(source)):
+        if ref:  # None for names computed at runtime
+            dependencies(env, ref, seen)
+    return seen
+
+
+def time_load(names, bytecode_cache, samples):
+    """Median ms to load ``names`` into a fresh environment"""
+    timings = []
+    for _ in range(samples):
+        env = app.create_jinja_environment()
+        env.bytecode_cache = bytecode_cache
+        start = time.perf_counter()
+        for name in names:
+            env.get_template(name)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(samples, top):
+    cache_dir = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if not cache_dir or not os.listdir(cache_dir):
+        print('Bytecode cache is empty; run python build_templates.py first')
+        return
+    bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    env = app.jinja_env
+    pages = [name for name in env.list_templates(filter_func=lambda n: n.endswith('.html'))
+             if not name.startswith('partials/')]
+    results = []
+    for name in pages:
+        names = dependencies(env, name)
+        cold = time_load(names, None, samples)
+        warm = time_load(names, bytecode_cache, samples)
+        results.append((name, len(names), cold, warm))
+
+    results.sort(key=lambda r: r[2], reverse=True)
+    print(f'{"template":<40} {"files":>5}  {"source ms":>10}  {"cached ms":>10}  {"speedup":>8}')
+    for name, files, cold, warm in results[:top]:
+        print(f'{name:<40} {files:>5}  {cold:>10.2f}  {warm:>10.2f}  {cold / warm:>7.1f}x')
+
+    total_cold = sum(r[2] for r in results)
+    total_warm = sum(r[3] for r in results)
+    print(f'\nAll {len(results)} pages: {total_cold:.0f} ms from source, {total_warm:.0f} ms from the cache')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='First-request template load time, source vs bytecode cache')
+    parser.add_argument('--samples', type=int, default=5, help='Fresh environments per measurement (default 5)')
+    parser.add_argument('--top', type=int, default=50, help='Show the N slowest templates')
+    args = parser.parse_args()
+    run(args.samples, args.top)
@@ -0,0 +1,146 @@
+"""
+Fake Firebase Key Server
+A local stand-in for Google's securetoken certificate endpoint. It signs
+Firebase-style ID tokens with its own RSA key and serves the matching
+certificate with a Cache-Control max-age, for exercising the ID-token
+verifier (services/firebase_tokens.py) and the phone-auth routes offline.
+
+Usage:
+    python scripts/fake_firebase_keys.py --project pujapath-dev
+    python scripts/fake_firebase_keys.py --project pujapath-dev --max-age 30
+
+Then point the app at it:
+    FIREBASE_PROJECT_ID=pujapath-dev FIREBASE_CERTS_URL=http://127.0.0.1:8766/certs python app.py
+
+Endpoints:
+    GET  /certs            {kid: certificate PEM}, with Cache-Control max-age
+    POST /_fake/token      Mint an ID token: {"phone_number": "+919876543210", "expires_in": 3600}
+    POST /_fake/rotate     Switch to a fresh signing key (old certs stay published)
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+
+class FakeKeyServer:
+    """Signing keys and the certificates published for them"""
+
+    def __init__(self, project_id, max_age=3600):
+        self.project_id = project_id
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.certs = {}
+        self.signer = None
+        self.fetches = 0
+        self.rotate()
+
+    def rotate(self):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'securetoken.system.gserviceaccount.com')])
+        now = datetime.now(timezone.utc)
+        cert = x509.CertificateBuilder()\
+            .subject_name(name)\
+            .issuer_name(name)\
+            .public_key(key.public_key())\
+            .serial_number(x509.random_serial_number())\
+            .not_valid_before(now - timedelta(days=1))\
+            .not_valid_after(now + timedelta(days=7))\
+            .sign(key, hashes.SHA256())
+
+        kid = uuid.uuid4().hex
+        pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption()
+        )
+        with self.lock:
+            self.certs[kid] = cert.public_bytes(serialization.Encoding.PEM).decode('utf-8')
+            self.signer = crypt.RSASigner.from_string(pem, key_id=kid)
+        return kid
+
+    def mint(self, phone_number='+919876543210', uid=None, expires_in=3600, **extra):
+        """Return a signed ID token shaped like the ones Firebase Auth issues"""
+        now = int(time.time())
+        claims = {
+            'iss': f'https://securetoken.google.com/{self.project_id}',
+            'aud': self.project_id,
+            'auth_time': now,
+            'user_id': uid or uuid.uuid4().hex[:28],
+            'sub': uid or uuid.uuid4().hex[:28],
+            'iat': now,
+            'exp': now + expires_in,
+            'phone_number': phone_number,
+            'firebase': {'identities': {'phone': [phone_number]}, 'sign_in_provider': 'phone'},
+        }
+        claims.update(extra)
+        claims['user_id'] = claims['sub']
+        with self.lock:
+            return jwt.encode(self.signer, claims).decode('utf-8')
+
+
+SERVER = None
+
+
+class Handler(BaseHTTPRequestHandler):
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        with SERVER.lock:
+            SERVER.fetches += 1
+            certs = dict(SERVER.certs)
+        self._send(200, certs, {'Cache-Control': f'public, max-age={SERVER.max_age}, must-revalidate, no-transform'})
+
+    def do_POST(self):
+        if self.path == '/_fake/token':
+            return self._send(200, {'idToken': SERVER.mint(**self._body())})
+        if self.path == '/_fake/rotate':
+            return self._send(200, {'kid': SERVER.rotate()})
+        self._send(404, {'error': 'Not found'})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(project_id, host='127.0.0.1', port=8766, max_age=3600):
+    """Start the server on a daemon thread and return it (for tests and scripts)"""
+    global SERVER
+    SERVER = FakeKeyServer(project_id, max_age)
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local fake Firebase certificate server')
+    parser.add_argument('--project', default='pujapath-dev', help='Firebase project ID (token audience)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--max-age', type=int, default=3600, help='Cache-Control max-age for the certs')
+    args = parser.parse_args()
+
+    SERVER = FakeKeyServer(args.project, args.max_age)
+    print(f'Fake Firebase keys on http://{args.host}:{args.port}/certs (project {args.project})')
+    ThreadingHTTPServer((args.host, args.port), Handler).serve_forever()
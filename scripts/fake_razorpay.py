@@ -0,0 +1,176 @@
+"""
+Fake Razorpay API Server
+A small local stand-in for the parts of the Razorpay REST API we use
+(orders and payments), for exercising reconcile_payments.py and the payment
+routes without touching the real gateway. Authentication is not checked.
+
+Usage:
+    python scripts/fake_razorpay.py                        # Serve on 127.0.0.1:8765
+    python scripts/fake_razorpay.py --from-db              # Capture payments for stuck DB rows
+    python scripts/fake_razorpay.py --from-db --capture-ratio 0.5 --noise 5000
+
+Then point the app or the job at it:
+    RAZORPAY_API_BASE=http://127.0.0.1:8765 python reconcile_payments.py
+
+Endpoints:
+    POST /v1/orders              Create an order
+    GET  /v1/orders/<id>         Fetch an order
+    GET  /v1/payments            List payments (from, to, count, skip)
+    POST /_fake/payments         Append raw payment entities (JSON list)
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeRazorpay:
+    """In-memory order and payment store"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.orders = {}
+        self.payments = []
+
+    def create_order(self, data):
+        order = {
+            'id': f"order_{uuid.uuid4().hex[:14]}",
+            'entity': 'order',
+            'amount': data.get('amount'),
+            'amount_paid': 0,
+            'amount_due': data.get('amount'),
+            'currency': data.get('currency', 'INR'),
+            'receipt': data.get('receipt'),
+            'status': 'created',
+            'notes': data.get('notes', {}),
+            'created_at': int(time.time())
+        }
+        with self.lock:
+            self.orders[order['id']] = order
+        return order
+
+    def add_payment(self, order_id, amount=0, status='captured', created_at=None):
+        payment = {
+            'id': f"pay_{uuid.uuid4().hex[:14]}",
+            'entity': 'payment',
+            'order_id': order_id,
+            'amount': amount,
+            'currency': 'INR',
+            'status': status,
+            'created_at': created_at or int(time.time())
+        }
+        with self.lock:
+            self.payments.append(payment)
+            if order_id in self.orders and status == 'captured':
+                self.orders[order_id]['status'] = 'paid'
+        return payment
+
+    def list_payments(self, start, end, count, skip):
+        with self.lock:
+            matching = [p for p in self.payments if start <= p['created_at'] <= end]
+        matching.sort(key=lambda p: p['created_at'], reverse=True)
+        items = matching[skip:skip + count]
+        return {'entity': 'collection', 'count': len(items), 'items': items}
+
+
+STORE = FakeRazorpay()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == '/v1/payments':
+            return self._send(200, STORE.list_payments(
+                int(query.get('from', 0)),
+                int(query.get('to', time.time())),
+                min(int(query.get('count', 10)), 100),
+                int(query.get('skip', 0))
+            ))
+
+        if url.path.startswith('/v1/orders/'):
+            order = STORE.orders.get(url.path.rsplit('/', 1)[-1])
+            if order:
+                return self._send(200, order)
+
+        self._send(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Not found'}})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/v1/orders':
+            return self._send(200, STORE.create_order(self._body()))
+        if url.path == '/_fake/payments':
+            items = self._body()
+            with STORE.lock:
+                STORE.payments.extend(items)
+            return self._send(200, {'added': len(items)})
+        self._send(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Not found'}})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def seed_from_db(capture_ratio):
+    """Create captured payments for a share of the stuck rows in the app database"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import app
+    from database import db
+    from models import Order, Booking
+
+    with app.app_context():
+        for model, amount_col in ((Order, Order.total_amount), (Booking, Booking.amount)):
+            rows = db.session.query(model.razorpay_order_id, amount_col, model.created_at)\
+                .filter(model.razorpay_order_id.isnot(None))\
+                .filter(model.payment_status.in_(('pending', 'initiated')))\
+                .all()
+            for razorpay_order_id, amount, created_at in rows:
+                if random.random() < capture_ratio:
+                    created = int(created_at.replace(tzinfo=timezone.utc).timestamp()) if created_at else None
+                    STORE.add_payment(razorpay_order_id, int((amount or 0) * 100), created_at=created)
+
+
+def seed_noise(count):
+    """Add payments that belong to nobody, to exercise paging"""
+    now = int(time.time())
+    for _ in range(count):
+        STORE.add_payment(f"order_{uuid.uuid4().hex[:14]}", 10000,
+                          status=random.choice(['captured', 'failed']),
+                          created_at=now - random.randint(0, 7 * 86400))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local fake Razorpay API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--from-db', action='store_true', help='Capture payments for stuck DB rows')
+    parser.add_argument('--capture-ratio', type=float, default=1.0)
+    parser.add_argument('--noise', type=int, default=0, help='Unrelated payments to add')
+    args = parser.parse_args()
+
+    if args.from_db:
+        seed_from_db(args.capture_ratio)
+    seed_noise(args.noise)
+
+    print(f'Fake Razorpay listening on http://{args.host}:{args.port} ({len(STORE.payments)} payments)')
+    ThreadingHTTPServer((args.host, args.port), Handler).serve_forever()
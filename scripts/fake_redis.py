@@ -0,0 +1,256 @@
+"""
+Fake Redis Server
+A small local stand-in speaking the Redis protocol (RESP2/RESP3), covering the
+commands our key-value store uses, so the Redis backend can be exercised
+without installing a real server. Data lives in memory and is lost on exit.
+
+Usage:
+    python scripts/fake_redis.py                  # Serve on 127.0.0.1:6390
+    python scripts/fake_redis.py --port 6379
+
+Then point the app at it:
+    REDIS_URL=redis://127.0.0.1:6390/0 python app.py
+
+Commands:
+    PING ECHO HELLO SELECT CLIENT FLUSHALL FLUSHDB
+    GET SET (EX/PX/NX/XX) DEL EXISTS INCR INCRBY EXPIRE PEXPIRE TTL PTTL
+    WATCH UNWATCH MULTI EXEC DISCARD
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class Error(Exception):
+    """Sent back to the client as a RESP error"""
+
+
+ABORTED = object()  # EXEC reply when a watched key changed
+
+
+class FakeRedis:
+    """In-memory keyspace with expiry and per-key versions for WATCH"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = {}      # key -> (value, expires_at or None)
+        self.versions = {}  # key -> write counter
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            self._touch(key)
+            return None
+        return entry
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def version(self, key):
+        with self.lock:
+            self._live(key)
+            return self.versions.get(key, 0)
+
+    def execute(self, name, args):
+        handler = getattr(self, f'cmd_{name}', None)
+        if handler is None:
+            raise Error(f"ERR unknown command '{name}'")
+        with self.lock:
+            return handler(*args)
+
+    def cmd_ping(self, message=None):
+        return message if message is not None else 'PONG'
+
+    def cmd_echo(self, message):
+        return message
+
+    def cmd_hello(self, protover=b'2', *args):
+        # RESP3 clients get a map here and RESP3 nulls; other replies are the same in both
+        return {b'server': b'redis', b'version': b'7.0.0', b'proto': int(protover)}
+
+    def cmd_select(self, index):
+        return 'OK'
+
+    def cmd_client(self, *args):
+        return 'OK'
+
+    def cmd_flushall(self, *args):
+        for key in list(self.data):
+            self._touch(key)
+        self.data.clear()
+        return 'OK'
+
+    cmd_flushdb = cmd_flushall
+
+    def cmd_get(self, key):
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    def cmd_set(self, key, value, *options):
+        options = [o.decode().upper() for o in options]
+        expires_at = None
+        for flag, scale in (('EX', 1), ('PX', 1000)):
+            if flag in options:
+                expires_at = time.time() + int(options[options.index(flag) + 1]) / scale
+        exists = self._live(key) is not None
+        if ('NX' in options and exists) or ('XX' in options and not exists):
+            return None
+        self.data[key] = (value, expires_at)
+        self._touch(key)
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                del self.data[key]
+                self._touch(key)
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._live(key) is not None)
+
+    def cmd_incrby(self, key, amount):
+        entry = self._live(key)
+        try:
+            value = int(entry[0]) + int(amount) if entry else int(amount)
+        except ValueError:
+            raise Error('ERR value is not an integer or out of range')
+        self.data[key] = (str(value).encode(), entry[1] if entry else None)
+        self._touch(key)
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, 1)
+
+    def cmd_pexpire(self, key, ms):
+        entry = self._live(key)
+        if entry is None:
+            return 0
+        self.data[key] = (entry[0], time.time() + int(ms) / 1000)
+        self._touch(key)
+        return 1
+
+    def cmd_expire(self, key, seconds):
+        return self.cmd_pexpire(key, int(seconds) * 1000)
+
+    def cmd_pttl(self, key):
+        entry = self._live(key)
+        if entry is None:
+            return -2
+        if entry[1] is None:
+            return -1
+        return max(0, int((entry[1] - time.time()) * 1000))
+
+    def cmd_ttl(self, key):
+        remaining = self.cmd_pttl(key)
+        return remaining if remaining < 0 else (remaining + 999) // 1000
+
+
+STORE = FakeRedis()
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.watched = {}
+        self.queued = None  # list of commands while inside MULTI
+        self.protocol = 2
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.decode().split()  # inline command (e.g. from telnet)
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def encode(self, value):
+        if value is None or value is ABORTED:
+            if self.protocol == 3:
+                return b'_\r\n'
+            return b'$-1\r\n' if value is None else b'*-1\r\n'
+        if isinstance(value, Error):
+            return f'-{value}\r\n'.encode()
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, int):
+            return f':{value}\r\n'.encode()
+        if isinstance(value, dict):
+            header = f'%{len(value)}' if self.protocol == 3 else f'*{len(value) * 2}'
+            return f'{header}\r\n'.encode() + b''.join(
+                self.encode(k) + self.encode(v) for k, v in value.items())
+        if isinstance(value, list):
+            return f'*{len(value)}\r\n'.encode() + b''.join(self.encode(v) for v in value)
+        if isinstance(value, str):
+            return f'+{value}\r\n'.encode()
+        return f'${len(value)}\r\n'.encode() + value + b'\r\n'
+
+    def run(self, name, args):
+        try:
+            return STORE.execute(name, args)
+        except Error as e:
+            return e
+        except (TypeError, ValueError):
+            return Error(f"ERR wrong arguments for '{name}' command")
+
+    def dispatch(self, name, args):
+        if name == 'hello' and args:
+            self.protocol = int(args[0])
+        if name == 'watch':
+            for key in args:
+                self.watched[key] = STORE.version(key)
+            return 'OK'
+        if name == 'unwatch':
+            self.watched = {}
+            return 'OK'
+        if name == 'multi':
+            self.queued = []
+            return 'OK'
+        if name == 'discard':
+            self.queued, self.watched = None, {}
+            return 'OK'
+        if name == 'exec':
+            if self.queued is None:
+                return Error('ERR EXEC without MULTI')
+            queued, watched = self.queued, self.watched
+            self.queued, self.watched = None, {}
+            with STORE.lock:
+                if any(STORE.version(key) != v for key, v in watched.items()):
+                    return ABORTED
+                return [self.run(n, a) for n, a in queued]
+        if self.queued is not None:
+            self.queued.append((name, args))
+            return 'QUEUED'
+        return self.run(name, args)
+
+    def handle(self):
+        while True:
+            command = self.read_command()
+            if not command:
+                return
+            args = [a if isinstance(a, bytes) else a.encode() for a in command]
+            self.wfile.write(self.encode(self.dispatch(args[0].decode().lower(), args[1:])))
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local fake Redis server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+
+    print(f'Fake Redis listening on redis://{args.host}:{args.port}/0')
+    Server((args.host, args.port), Handler).serve_forever()
@@ -0,0 +1,120 @@
+"""
+Fake S3 Server
+A small local stand-in for the S3 object calls our upload storage makes
+(services/storage.py), for exercising the s3:// backend without AWS or
+MinIO. Path-style requests only; signatures are not checked and objects
+live in memory.
+
+Usage:
+    python scripts/fake_s3.py                  # Serve on 127.0.0.1:9010
+    python scripts/fake_s3.py --port 9000
+
+Then point the app at it:
+    UPLOAD_STORAGE_URL=s3://pujapath-uploads S3_ENDPOINT_URL=http://127.0.0.1:9010 \\
+        AWS_ACCESS_KEY_ID=fake AWS_SECRET_ACCESS_KEY=fake S3_REGION=us-east-1 python app.py
+
+Endpoints:
+    PUT    /<bucket>              Create a bucket (buckets are also created on first write)
+    PUT    /<bucket>/<key>        Store an object (Content-Type and Cache-Control are kept)
+    HEAD   /<bucket>/<key>        Object metadata
+    GET    /<bucket>/<key>        Object body, with the stored headers
+    DELETE /<bucket>/<key>        Remove an object
+"""
+
+import argparse
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+
+class FakeS3:
+    """In-memory buckets: {bucket: {key: (body, headers)}}"""
+
+    KEPT_HEADERS = ('Content-Type', 'Cache-Control')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.puts = 0
+
+
+SERVER = None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # boto3 sends Expect: 100-continue for larger bodies
+
+    def _target(self):
+        path = unquote(urlparse(self.path).path).lstrip('/')
+        bucket, _, key = path.partition('/')
+        return bucket, key
+
+    def _send(self, status, body=b'', headers=None, head=False):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _error(self, status, code, head=False):
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code></Error>'.encode('utf-8')
+        self._send(status, body, {'Content-Type': 'application/xml'}, head)
+
+    def _object(self, head=False):
+        bucket, key = self._target()
+        with SERVER.lock:
+            stored = SERVER.buckets.get(bucket, {}).get(key)
+        if stored is None:
+            return self._error(404, 'NoSuchKey', head)
+        body, headers = stored
+        self._send(200, body, headers, head)
+
+    def do_HEAD(self):
+        self._object(head=True)
+
+    def do_GET(self):
+        self._object()
+
+    def do_PUT(self):
+        bucket, key = self._target()
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with SERVER.lock:
+            objects = SERVER.buckets.setdefault(bucket, {})
+            if key:
+                headers = {name: self.headers[name] for name in FakeS3.KEPT_HEADERS if self.headers.get(name)}
+                headers['ETag'] = f'"{hashlib.md5(body).hexdigest()}"'
+                objects[key] = (body, headers)
+                SERVER.puts += 1
+        self._send(200, headers={'ETag': f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def do_DELETE(self):
+        bucket, key = self._target()
+        with SERVER.lock:
+            SERVER.buckets.get(bucket, {}).pop(key, None)
+        self._send(204)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host='127.0.0.1', port=9010):
+    """Start the server on a daemon thread and return it (for tests and scripts)"""
+    global SERVER
+    SERVER = FakeS3()
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local fake S3 object server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9010)
+    args = parser.parse_args()
+
+    SERVER = FakeS3()
+    print(f'Fake S3 on http://{args.host}:{args.port}')
+    ThreadingHTTPServer((args.host, args.port), Handler).serve_forever()
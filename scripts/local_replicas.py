@@ -0,0 +1,158 @@
+"""
+Local Primary + Read Replica
+Runs two PostgreSQL instances from the local PostgreSQL binaries: a primary
+on port 5433 and a streaming replica of it on 5434 (data in .pg_replicas/),
+for exercising the read-replica routing in services/replicas.py. ``check``
+pauses replay on the replica, writes a row on the primary and verifies that
+GET pages miss it, that a browser pinned by a recent write sees it, and that
+the replica catches up once replay resumes.
+
+Usage:
+    python scripts/local_replicas.py start              # initdb/basebackup on first run, then start both
+    python scripts/local_replicas.py check              # Routing and read-your-writes against both
+    python scripts/local_replicas.py stop
+    python scripts/local_replicas.py start --bin-dir /usr/lib/postgresql/16/bin
+
+Then point the app at them:
+    DATABASE_URL=postgresql://postgres@127.0.0.1:5433/pujapath \\
+    DATABASE_REPLICA_URLS=postgresql://postgres@127.0.0.1:5434/pujapath python app.py
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, '.pg_replicas')
+PRIMARY_PORT = 5433
+REPLICA_PORT = 5434
+DATABASE = 'pujapath'
+PRIMARY_URL = f'postgresql://postgres@127.0.0.1:{PRIMARY_PORT}/{DATABASE}'
+REPLICA_URL = f'postgresql://postgres@127.0.0.1:{REPLICA_PORT}/{DATABASE}'
+MARKER = 'Replica Check Temple'
+
+
+def tool(name, bin_dir):
+    path = os.path.join(bin_dir, name) if bin_dir else shutil.which(name)
+    if not path or not os.path.exists(path):
+        raise SystemExit(f'{name} not found: install PostgreSQL or pass --bin-dir')
+    return path
+
+
+def pg_ctl(bin_dir, action, name, port=None):
+    args = [tool('pg_ctl', bin_dir), action, '-D', os.path.join(DATA, name), '-w',
+            '-l', os.path.join(DATA, f'{name}.log')]
+    if port:
+        args += ['-o', f'-p {port} -c listen_addresses=127.0.0.1 -c unix_socket_directories={DATA}']
+    return subprocess.run(args).returncode == 0
+
+
+def start(bin_dir):
+    initdb, createdb, pg_basebackup = (tool(name, bin_dir) for name in ('initdb', 'createdb', 'pg_basebackup'))
+    os.makedirs(DATA, exist_ok=True)
+    primary = os.path.join(DATA, 'primary')
+    replica = os.path.join(DATA, 'replica')
+
+    if not os.path.exists(primary):
+        print('  initdb: primary')
+        subprocess.run([initdb, '-D', primary, '-U', 'postgres', '--auth=trust'],
+                       check=True, stdout=subprocess.DEVNULL)
+        with open(os.path.join(primary, 'postgresql.conf'), 'a') as f:
+            f.write('\nwal_level = replica\nmax_wal_senders = 5\nhot_standby = on\n')
+    if not pg_ctl(bin_dir, 'start', 'primary', PRIMARY_PORT):
+        raise SystemExit(f'  FAILED: primary did not start, see {DATA}/primary.log')
+    subprocess.run([createdb, '-h', '127.0.0.1', '-p', str(PRIMARY_PORT), '-U', 'postgres', DATABASE],
+                   stderr=subprocess.DEVNULL)  # exists after the first run
+
+    if not os.path.exists(replica):
+        print('  pg_basebackup: primary -> replica')
+        subprocess.run([pg_basebackup, '-D', replica, '-h', '127.0.0.1', '-p', str(PRIMARY_PORT),
+                        '-U', 'postgres', '-X', 'stream', '-R'], check=True)
+    if not pg_ctl(bin_dir, 'start', 'replica', REPLICA_PORT):
+        raise SystemExit(f'  FAILED: replica did not start, see {DATA}/replica.log')
+
+    print(f'\nPrimary {PRIMARY_URL}\nReplica {REPLICA_URL}\n')
+    print(f'DATABASE_URL={PRIMARY_URL} DATABASE_REPLICA_URLS={REPLICA_URL}')
+
+
+def stop(bin_dir):
+    for name in ('replica', 'primary'):
+        if os.path.exists(os.path.join(DATA, name, 'postmaster.pid')):
+            pg_ctl(bin_dir, 'stop', name)
+
+
+def check():
+    """Route real requests through the app against both instances"""
+    os.environ['DATABASE_URL'] = PRIMARY_URL
+    os.environ['DATABASE_REPLICA_URLS'] = REPLICA_URL
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import text
+    from app import app
+    from database import db
+    from models import Temple
+    from services import read_replicas
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    results = []
+
+    def expect(label, ok):
+        results.append(ok)
+        print(f'  {"PASS" if ok else "FAIL"}: {label}')
+
+    with app.app_context():
+        db.create_all()
+        replica = db.engines['replica_0']
+        Temple.query.filter_by(name=MARKER).delete()
+        db.session.commit()
+        time.sleep(1)
+
+        with replica.connect() as conn:
+            conn.execute(text('SELECT pg_wal_replay_pause()'))
+        try:
+            db.session.add(Temple(name=MARKER, location='Localhost', state='Test', deity='Test', is_active=True))
+            db.session.commit()
+
+            page = client.get('/temples?search=Replica+Check').get_data(as_text=True)
+            expect('GET /temples reads the replica (paused, row missing)', MARKER not in page)
+
+            client.set_cookie(read_replicas.COOKIE, str(int(time.time()) + read_replicas.window))
+            page = client.get('/temples?search=Replica+Check').get_data(as_text=True)
+            expect('pinned browser reads the primary (row present)', MARKER in page)
+            client.delete_cookie(read_replicas.COOKIE)
+        finally:
+            with replica.connect() as conn:
+                conn.execute(text('SELECT pg_wal_replay_resume()'))
+
+        for _ in range(50):
+            page = client.get('/temples?search=Replica+Check').get_data(as_text=True)
+            if MARKER in page:
+                break
+            time.sleep(0.1)
+        expect('replica catches up after replay resumes', MARKER in page)
+
+        with replica.connect() as conn:
+            lag = conn.execute(text('SELECT now() - pg_last_xact_replay_timestamp()')).scalar()
+        print(f'\n  Replica lag: {lag}')
+
+        Temple.query.filter_by(name=MARKER).delete()
+        db.session.commit()
+    return all(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local PostgreSQL primary and streaming replica')
+    parser.add_argument('command', choices=('start', 'stop', 'check'))
+    parser.add_argument('--bin-dir', default=os.getenv('PG_BIN'), help='Directory with pg_ctl, initdb, ...')
+    args = parser.parse_args()
+
+    print(f'=== READ REPLICAS ({args.command.upper()}) ===\n')
+    if args.command == 'start':
+        start(args.bin_dir)
+    elif args.command == 'stop':
+        stop(args.bin_dir)
+    elif not check():
+        raise SystemExit(1)
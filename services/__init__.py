@@ -0,0 +1,22 @@
+# services/__init__.py
+from .payments import apply_captured_payments
+from .payment_events import payment_events
+from .payment_intents import payment_intents, TimeoutSession
+from .kv import create_kv
+from .otp import otp_store
+from .rate_limit import rate_limiter, RateLimitExceeded
+from .firebase_tokens import firebase_tokens
+from .users import user_loader
+from .revocation import token_revocation
+from .identities import login_identities, normalize_phone, national_phone
+from .fragment_cache import fragment_cache
+from .catalog import catalog_version
+from .images import image_variants
+from .storage import create_storage, is_content_key, IMMUTABLE_CACHE_CONTROL
+from .uploads import receive_file, UploadRejected
+from .assets import static_assets
+from .compression import response_compression
+from .streaming import StreamedQuery, stream_page
+from .replicas import read_replicas
+from .db_pool import engine_options, pool_stats
+from .carts import cart_store, CartError
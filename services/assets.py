@@ -0,0 +1,199 @@
+# services/assets.py
+from flask import request, send_from_directory
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from .storage import IMMUTABLE_CACHE_CONTROL
+
+# Text formats worth storing precompressed (images and woff2 are compressed already)
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.xml', '.ico', '.ttf', '.otf', '.eot')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # preferred first
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+?)\1\s*\)""")
+
+
+class StaticAssets:
+    """Fingerprinted, precompressed copies of static/ and the URLs that point at them.
+
+    build_assets.py copies every static file to
+    ``static/<ASSET_DIR>/<path>.<content hash>.<ext>`` (plus ``.br``/``.gz``
+    siblings for text formats) and records them in ``manifest.json``. With a
+    manifest loaded, ``url_for('static', filename=...)`` emits the
+    fingerprinted path and the static view serves it with an immutable
+    one-year Cache-Control, picking the brotli or gzip copy the client
+    accepts. Relative ``url()`` references in stylesheets are rewritten to
+    the fingerprinted copies, so the fonts and images a stylesheet loads are
+    immutable too. Files missing from the manifest (uploads, image variants, or
+    everything when no build has run) are served as before.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, app=None):
+        self.app = None
+        self.static_folder = None
+        self.folder = None
+        self.exclude = ()
+        self.assets = {}  # static path -> fingerprinted static path
+        self.encodings = {}  # fingerprinted static path -> encodings stored next to it
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSET_DIR', 'dist')  # under static/
+        app.config.setdefault('ASSET_EXCLUDE_DIRS', ('uploads', 'variants', 'src'))  # content-addressed already / build inputs
+        app.config.setdefault('ASSETS_ENABLED', not app.debug)
+        self.app = app
+        self.static_folder = app.static_folder
+        self.folder = os.path.join(app.static_folder, app.config['ASSET_DIR'])
+        self.exclude = tuple(app.config['ASSET_EXCLUDE_DIRS']) + (app.config['ASSET_DIR'],)
+        self.enabled = app.config['ASSETS_ENABLED']
+        if self.enabled:
+            self.load()
+        app.url_defaults(self._url_defaults)
+        app.view_functions['static'] = self.send_static
+        app.extensions['static_assets'] = self
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.folder, self.MANIFEST)
+
+    def load(self):
+        """Read the manifest written by build_assets.py (no manifest: plain static URLs)"""
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        except (OSError, ValueError) as e:
+            self.app.logger.warning(f"Asset manifest unreadable, serving plain static files: {str(e)}")
+            manifest = {}
+        self.assets = manifest.get('assets', {})
+        self.encodings = manifest.get('encodings', {})
+
+    def sources(self):
+        """Static-relative paths of every file that gets fingerprinted (stylesheets
+        last, so the files they reference are fingerprinted before them)"""
+        paths = []
+        for root, dirs, files in os.walk(self.static_folder):
+            if root == self.static_folder:
+                dirs[:] = [d for d in dirs if d not in self.exclude]
+            for name in files:
+                if not name.startswith('.'):
+                    full_path = os.path.join(root, name)
+                    paths.append(os.path.relpath(full_path, self.static_folder).replace(os.sep, '/'))
+        return sorted(paths, key=lambda path: (path.endswith('.css'), path))
+
+    def content(self, path, assets):
+        """Bytes of static file ``path`` as published: stylesheets get their
+        relative ``url()`` references pointed at the fingerprinted ``assets``"""
+        with open(os.path.join(self.static_folder, path), 'rb') as f:
+            data = f.read()
+        if not path.endswith('.css'):
+            return data
+
+        base = posixpath.dirname(path)
+        target_base = posixpath.dirname(self._target_name(path, ''))
+
+        def rewrite(match):
+            quote, url = match.groups()
+            reference, hash_sep, fragment = url.partition('#')
+            reference, query_sep, query = reference.partition('?')
+            if not reference or reference.startswith(('/', 'data:', 'http:', 'https:')):
+                return match.group(0)
+            dependency = assets.get(posixpath.normpath(posixpath.join(base, reference)))
+            if dependency is None:
+                return match.group(0)
+            url = posixpath.relpath(dependency, target_base) + query_sep + query + hash_sep + fragment
+            return f"url({quote}{url}{quote})"
+
+        return CSS_URL.sub(rewrite, data.decode('utf-8')).encode('utf-8')
+
+    def _target_name(self, path, digest):
+        stem, dot, extension = path.rpartition('.')
+        if not dot or '/' in extension:
+            stem, extension = path, ''
+        name = f"{stem}.{digest}" + (f".{extension}" if extension else '')
+        return f"{self.app.config['ASSET_DIR']}/{name}"
+
+    def fingerprinted_path(self, path, assets=None):
+        """Where ``path`` is copied to, named after its published content"""
+        data = self.content(path, assets or {})
+        return self._target_name(path, hashlib.sha256(data).hexdigest()[:12])
+
+    def build(self, path, assets=None):
+        """Copy static file ``path`` to its fingerprinted name and precompress it.
+        ``assets`` maps the files a stylesheet references (see ``sources`` for
+        the order). Returns (fingerprinted path, encodings written)."""
+        data = self.content(path, assets or {})
+        target_path = self._target_name(path, hashlib.sha256(data).hexdigest()[:12])
+        target = os.path.join(self.static_folder, *target_path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        self._write(target, data)
+
+        encodings = []
+        if path.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            for encoding, suffix in ENCODINGS:
+                compressed = self._compress(encoding, data)
+                if compressed is not None and len(compressed) < len(data) * 0.95:
+                    self._write(target + suffix, compressed)
+                    encodings.append(encoding)
+        return target_path, encodings
+
+    def write_manifest(self, assets, encodings):
+        os.makedirs(self.folder, exist_ok=True)
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'assets': assets, 'encodings': encodings}, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+        self.assets = assets
+        self.encodings = encodings
+
+    @staticmethod
+    def _compress(encoding, data):
+        if encoding == 'gzip':
+            return gzip.compress(data, compresslevel=9, mtime=0)
+        try:
+            import brotli
+        except ImportError:
+            return None  # gzip only
+        return brotli.compress(data, quality=11)
+
+    @staticmethod
+    def _write(path, data):
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def _url_defaults(self, endpoint, values):
+        if endpoint == 'static' and self.enabled:
+            filename = values.get('filename')
+            if filename in self.assets:
+                values['filename'] = self.assets[filename]
+
+    def send_static(self, filename):
+        """The app's static view, serving fingerprinted files immutably and precompressed"""
+        encodings = self.encodings.get(filename)
+        if encodings is None:
+            return self.app.send_static_file(filename)
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        for encoding, suffix in ENCODINGS:
+            if encoding in encodings and request.accept_encodings[encoding] > 0:
+                response = send_from_directory(self.static_folder, filename + suffix, mimetype=mimetype)
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(self.static_folder, filename, mimetype=mimetype)
+        if encodings:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+static_assets = StaticAssets()
@@ -0,0 +1,336 @@
+# services/carts.py
+from flask import current_app, g, request
+from models import Bundle, PujaMaterial, TemplePuja
+from sqlalchemy.orm import joinedload
+import hashlib
+import json
+import secrets
+
+from .catalog import catalog_version
+from .kv import MemoryKV
+
+ITEM_TYPES = ('product', 'bundle', 'temple_puja')
+
+
+class CartError(Exception):
+    """A cart change the API refuses; ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _load_prices(kind, ids):
+    """{id: (name, unit price)} for catalog items of one kind, in one query"""
+    if kind == 'product':
+        return {p.id: (p.name, float(p.price)) for p in PujaMaterial.query.filter(PujaMaterial.id.in_(ids))}
+    if kind == 'bundle':
+        return {b.id: (b.name, float(b.discounted_price)) for b in Bundle.query.filter(Bundle.id.in_(ids))}
+    pujas = TemplePuja.query.options(joinedload(TemplePuja.temple)).filter(TemplePuja.id.in_(ids))
+    return {p.id: (f"{p.name} at {p.temple.name}", float(p.price)) for p in pujas}
+
+
+class CartStore:
+    """Server-side carts kept in the shared key-value store.
+
+    A cart is found through a random ``cart_id`` cookie and holds priced
+    snapshots of its lines (name, unit price, subtotal) together with the
+    catalog generation they were priced at (services/catalog.py). A change
+    prices only the line it touches; the other lines are repriced, in one
+    query per item type, only when the catalog changed since. Prices come
+    through a cache keyed by the generation, so a catalog edit invalidates
+    it and repeated adds don't query at all. Checkout turns the snapshot into
+    order items as is, without the per-item price lookups.
+    Carts expire CART_TTL seconds after their last change. With the
+    in-memory store carts are per worker and lost on restart; the browser
+    keeps a copy and merges it back when the server has none (base.html),
+    but deploys with several workers should set REDIS_URL.
+    """
+
+    KEY_PREFIX = 'cart:'
+    PRICE_PREFIX = 'cart_price:'
+    COOKIE = 'cart_id'
+
+    def __init__(self, app=None, kv=None):
+        self.kv = None
+        self.ttl = 7 * 24 * 3600
+        self.price_ttl = 600
+        self.max_lines = 50
+        self.max_quantity = 20
+        if app is not None:
+            self.init_app(app, kv)
+
+    def init_app(self, app, kv):
+        app.config.setdefault('CART_TTL', 7 * 24 * 3600)  # seconds since the last change
+        app.config.setdefault('CART_PRICE_TTL', 600)
+        app.config.setdefault('CART_MAX_LINES', 50)
+        app.config.setdefault('CART_MAX_QUANTITY', 20)
+        self.kv = kv
+        self.ttl = app.config['CART_TTL']
+        self.price_ttl = app.config['CART_PRICE_TTL']
+        self.max_lines = app.config['CART_MAX_LINES']
+        self.max_quantity = app.config['CART_MAX_QUANTITY']
+        if isinstance(kv, MemoryKV) and not app.debug:
+            app.logger.warning("Carts are kept in process memory (REDIS_URL=memory://): each worker has its "
+                               "own and restarts empty them; set REDIS_URL to share them")
+        app.after_request(self._set_cookie)
+        app.extensions['cart_store'] = self
+
+    # Reading and changing the current visitor's cart
+
+    def get(self):
+        """The visitor's cart"""
+        return self._public(self._current())
+
+    def add(self, item, replace=False):
+        """Add ``item`` (``type``, ``id`` or ``puja_id``, ``quantity`` and the
+        booking details the frontend sends); an existing line gets the quantity
+        added, or set with ``replace``"""
+        key, kind, item_id, quantity, extras = self._parse(item)
+
+        def change(cart, prices):
+            self._put(cart, prices, key, kind, item_id, quantity, extras, replace)
+
+        return self._public(self._change(change, {kind: {item_id}}, require=(kind, item_id)))
+
+    def update(self, line_key, quantity):
+        """Set the quantity of a line; 0 removes it"""
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise CartError("Invalid quantity")
+        if quantity <= 0:
+            return self.remove(line_key)
+
+        def change(cart, prices):
+            line = self._find(cart, line_key)
+            if line is None:
+                raise CartError("Item not in cart", 404)
+            line['quantity'] = min(quantity, self.max_quantity)
+            line['subtotal'] = round(line['price'] * line['quantity'], 2)
+
+        return self._public(self._change(change))
+
+    def remove(self, line_key):
+        def change(cart, prices):
+            cart['lines'] = [line for line in cart['lines'] if line['key'] != line_key]
+
+        return self._public(self._change(change))
+
+    def replace(self, items, merge=False):
+        """Price a whole list of items in one go (a cart the browser kept, or an
+        API client's order) and make it the cart, or merge it in"""
+        if not isinstance(items, list):
+            raise CartError("Cart must be a list of items")
+        parsed, wanted = [], {}
+        for item in items[:self.max_lines]:
+            try:
+                entry = self._parse(item)
+            except CartError:
+                continue  # One bad item doesn't lose the rest
+            parsed.append(entry)
+            wanted.setdefault(entry[1], set()).add(entry[2])
+
+        def change(cart, prices):
+            if not merge:
+                cart['lines'] = []
+            for key, kind, item_id, quantity, extras in parsed:
+                if item_id in prices.get(kind, {}):
+                    self._put(cart, prices, key, kind, item_id, quantity, extras, replace=True)
+
+        return self._public(self._change(change, wanted))
+
+    def clear(self):
+        key = self._cart_key()
+        if key is not None:
+            self.kv.delete(key)
+
+    def order_items(self):
+        """(order item fields, total) from the cart's priced lines, e.g. for
+        OrderItem(**fields); empty when there is no cart"""
+        cart = self._current()
+        if cart is None:
+            return [], 0
+        items = [{
+            'product_id': line['id'] if line['type'] == 'product' else None,
+            'bundle_id': line['id'] if line['type'] == 'bundle' else None,
+            'product_name': self._order_name(line),
+            'product_price': line['price'],
+            'quantity': line['quantity'],
+            'subtotal': line['subtotal'],
+        } for line in cart['lines']]
+        return items, cart['total']
+
+    # Pricing
+
+    def prices(self, kind, ids, generation):
+        """{id: (name, unit price)} through the pricing cache; unknown ids are left out"""
+        found, missing = {}, []
+        for item_id in ids:
+            try:
+                cached = self.kv.get(f"{self.PRICE_PREFIX}{generation}:{kind}:{item_id}")
+            except Exception:
+                cached = None  # Store unavailable: price from the database
+            if cached is not None:
+                found[item_id] = tuple(json.loads(cached))
+            else:
+                missing.append(item_id)
+        if missing:
+            loaded = _load_prices(kind, missing)
+            for item_id, value in loaded.items():
+                try:
+                    self.kv.set(f"{self.PRICE_PREFIX}{generation}:{kind}:{item_id}", json.dumps(value), ttl=self.price_ttl)
+                except Exception as e:
+                    current_app.logger.warning(f"Cart price cache write failed: {str(e)}")
+            found.update(loaded)
+        return found
+
+    def _current(self):
+        """The stored cart, revalidated first only if the catalog changed since it was priced"""
+        key = self._cart_key()
+        value = self.kv.get(key) if key is not None else None
+        if value is None:
+            return None
+        cart = json.loads(value)
+        if cart['generation'] != catalog_version.current()[0]:
+            cart = self._change(lambda cart, prices: None)
+        return cart
+
+    def _change(self, change, wanted=None, require=None):
+        """Apply ``change(cart, prices)`` atomically. Prices for ``wanted`` ({kind: ids})
+        are looked up first, plus every line's if the catalog changed since
+        the cart was priced, so the store is never locked during a query."""
+        key = self._cart_key(create=True)
+        generation = catalog_version.current()[0]
+        wanted = {kind: set(ids) for kind, ids in (wanted or {}).items()}
+        stored = self._load(self.kv.get(key), generation)
+        if stored['generation'] != generation:
+            for line in stored['lines']:
+                wanted.setdefault(line['type'], set()).add(line['id'])
+        prices = {kind: self.prices(kind, ids, generation) for kind, ids in wanted.items()}
+        if require is not None and require[1] not in prices[require[0]]:
+            raise CartError("Item not found", 404)
+
+        def apply(value):
+            cart = self._load(value, generation)
+            if cart['generation'] != generation:
+                self._reprice(cart, prices, wanted, generation)
+            change(cart, prices)
+            cart['total'] = round(sum(line['subtotal'] for line in cart['lines']), 2)
+            return json.dumps(cart), cart
+
+        cart = self.kv.update(key, apply, ttl=self.ttl)
+        g.cart_changed = True
+        return cart
+
+    @staticmethod
+    def _reprice(cart, prices, wanted, generation):
+        lines, complete = [], True
+        for line in cart['lines']:
+            if line['id'] not in wanted.get(line['type'], ()):
+                lines.append(line)  # Added concurrently; repriced by the next change
+                complete = False
+            elif line['id'] in prices[line['type']]:
+                line['name'], line['price'] = prices[line['type']][line['id']]
+                line['subtotal'] = round(line['price'] * line['quantity'], 2)
+                lines.append(line)
+            # else: the item left the catalog
+        cart['lines'] = lines
+        if complete:
+            cart['generation'] = generation
+
+    def _put(self, cart, prices, key, kind, item_id, quantity, extras, replace):
+        name, price = prices[kind][item_id]
+        line = self._find(cart, key)
+        if line is None:
+            if len(cart['lines']) >= self.max_lines:
+                raise CartError(f"A cart holds at most {self.max_lines} items")
+            line = {'key': key, 'type': kind, 'id': item_id, 'quantity': 0}
+            cart['lines'].append(line)
+        line['quantity'] = min(quantity if replace else line['quantity'] + quantity, self.max_quantity)
+        line['name'], line['price'] = name, price
+        line['subtotal'] = round(price * line['quantity'], 2)
+        line.update(extras)
+
+    # Helpers
+
+    def _parse(self, item):
+        """(line key, type, catalog id, quantity, extra fields) of an item from the client"""
+        if not isinstance(item, dict):
+            raise CartError("Invalid item")
+        kind = item.get('type') or 'product'
+        if kind not in ITEM_TYPES:
+            raise CartError(f"Unknown item type: {kind}")
+        try:
+            item_id = int(item.get('puja_id') if kind == 'temple_puja' else item.get('id'))
+            quantity = int(item.get('quantity', 1))
+        except (TypeError, ValueError):
+            raise CartError("Invalid item id or quantity")
+        if quantity < 1:
+            raise CartError("Invalid quantity")
+
+        key = f"{kind}:{item_id}"
+        extras = {}
+        if kind == 'bundle' and isinstance(item.get('schedule'), dict):
+            extras['schedule'] = item['schedule']
+            key += ':' + hashlib.sha1(json.dumps(item['schedule'], sort_keys=True).encode('utf-8')).hexdigest()[:10]
+        if kind == 'temple_puja' and isinstance(item.get('booking_details'), dict):
+            extras['booking_details'] = item['booking_details']
+        instructions = item.get('special_instructions') or item.get('specialInstructions')
+        if instructions:
+            extras['special_instructions'] = str(instructions)[:1000]
+        return key, kind, item_id, quantity, extras
+
+    @staticmethod
+    def _find(cart, line_key):
+        return next((line for line in cart['lines'] if line['key'] == line_key), None)
+
+    @staticmethod
+    def _load(value, generation):
+        if value is None:
+            return {'lines': [], 'total': 0, 'generation': generation}
+        return json.loads(value)
+
+    @staticmethod
+    def _order_name(line):
+        """Line name with the booking date the order needs (as create_order always recorded it)"""
+        name = line['name']
+        schedule = line.get('schedule') or {}
+        details = line.get('booking_details') or {}
+        if line['type'] == 'bundle' and schedule.get('date'):
+            name += f" [Date: {schedule.get('date')}, Time: {schedule.get('time', 'Any')}]"
+        elif line['type'] == 'temple_puja' and details.get('date'):
+            name += f" [Date: {details.get('date')}"
+            if details.get('gotra'):
+                name += f", Gotra: {details.get('gotra')}"
+            name += "]"
+        return name
+
+    @staticmethod
+    def _public(cart):
+        lines = cart['lines'] if cart else []
+        return {
+            'lines': lines,
+            'total': cart['total'] if cart else 0,
+            'count': sum(line['quantity'] for line in lines),
+        }
+
+    def _cart_key(self, create=False):
+        cart_id = g.get('cart_id') or request.cookies.get(self.COOKIE)
+        if not cart_id or len(cart_id) > 64:
+            if not create:
+                return None
+            cart_id = secrets.token_urlsafe(16)
+        g.cart_id = cart_id
+        return self.KEY_PREFIX + cart_id
+
+    def _set_cookie(self, response):
+        # Refreshed on every change, so the cookie lives as long as the cart
+        if g.get('cart_changed'):
+            response.set_cookie(self.COOKIE, g.cart_id, max_age=self.ttl, secure=request.is_secure,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+cart_store = CartStore()
@@ -0,0 +1,106 @@
+# services/catalog.py
+from database import db
+from models import PujaMaterial, Bundle, Pandit, Temple, TemplePuja, Testimonial
+from flask import make_response, request
+from sqlalchemy import event, func, select
+from werkzeug.http import is_resource_modified
+from functools import wraps
+import hashlib
+import threading
+import time
+
+from .compression import NOT_MODIFIED_TYPE
+from .fragment_cache import fragment_cache
+
+
+class CatalogVersion:
+    """Conditional GET for pages built only from catalog tables.
+
+    The catalog generation is the row count and latest ``updated_at`` of
+    every catalog table, read in one query and memoized per worker for
+    CATALOG_VERSION_TTL seconds (a commit in this worker that touches the
+    catalog drops the memo at once). A view wrapped with ``conditional``
+    derives its ETag from that generation, the deploy's template version and
+    the request URL, so a matching If-None-Match gets a 304 before the view
+    queries or renders anything. Last-Modified carries the newest
+    ``updated_at``; deletions only show up in the ETag.
+    """
+
+    MODELS = (PujaMaterial, Bundle, Pandit, Temple, TemplePuja, Testimonial)
+
+    def __init__(self, app=None):
+        self.ttl = 5
+        self._current = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CATALOG_VERSION_TTL', 5)  # seconds
+        self.ttl = app.config['CATALOG_VERSION_TTL']
+        event.listen(db.session, 'after_flush', self._after_flush)
+        event.listen(db.session, 'after_commit', self._after_commit)
+        app.extensions['catalog_version'] = self
+
+    def current(self):
+        """(generation digest, newest updated_at) of the catalog tables"""
+        with self._lock:
+            if self._current is not None and time.monotonic() < self._expires_at:
+                return self._current
+
+        columns = []
+        for model in self.MODELS:
+            columns.append(select(func.count()).select_from(model).scalar_subquery())
+            columns.append(select(func.max(model.updated_at)).scalar_subquery())
+        row = tuple(db.session.execute(select(*columns)).one())
+
+        digest = hashlib.sha1(repr(row).encode('utf-8')).hexdigest()[:16]
+        timestamps = [value for value in row[1::2] if value is not None]
+        current = (digest, max(timestamps) if timestamps else None)
+        with self._lock:
+            self._current = current
+            self._expires_at = time.monotonic() + self.ttl
+        return current
+
+    def invalidate(self):
+        with self._lock:
+            self._current = None
+
+    def conditional(self, view):
+        """Answer GET/HEAD for ``view`` with 304 when the client's copy is current"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            generation, last_modified = self.current()
+            key = f"{generation}:{fragment_cache.version}:{request.full_path}"
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()[:32]
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response('', 304)
+                request.environ[NOT_MODIFIED_TYPE] = 'text/html'  # ETag weakened like the compressed page's
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True  # Always revalidate, cheaply
+            return response
+        return wrapper
+
+    def _after_flush(self, session, flush_context):
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, self.MODELS):
+                session.info['catalog_changed'] = True
+                return
+
+    def _after_commit(self, session):
+        if session.info.pop('catalog_changed', False):
+            self.invalidate()
+
+
+catalog_version = CatalogVersion()
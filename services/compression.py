@@ -0,0 +1,187 @@
+# services/compression.py
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+import zlib
+
+# Types worth compressing; images, fonts and archives are compressed already
+COMPRESSIBLE_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'text/xml', 'text/csv',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+# WSGI environ key a view sets to the Content-Type of the page its 304 stands for
+# (Werkzeug strips Content-Type from 304s, so the middleware can't see it)
+NOT_MODIFIED_TYPE = 'compression.not_modified_type'
+
+
+class Compressor:
+    """One response's brotli or gzip stream"""
+
+    def __init__(self, encoding, level):
+        if encoding == 'br':
+            import brotli
+            self._stream = brotli.Compressor(quality=level)
+            self._compress = self._stream.process
+            self._flush = self._stream.flush
+            self._finish = self._stream.finish
+        else:
+            self._stream = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+            self._compress = self._stream.compress
+            self._flush = lambda: self._stream.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._stream.flush
+
+    def compress(self, data, flush=False):
+        out = self._compress(data) if data else b''
+        return out + self._flush() if flush else out
+
+    def finish(self):
+        return self._finish()
+
+
+def _vary_on_encoding(headers):
+    vary = headers.get('Vary')
+    if not vary:
+        headers['Vary'] = 'Accept-Encoding'
+    elif 'accept-encoding' not in vary.lower():
+        headers['Vary'] = f'{vary}, Accept-Encoding'
+
+
+def _weaken_etag(headers):
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = 'W/' + etag
+
+
+class ResponseCompression:
+    """WSGI middleware compressing dynamic responses with brotli or gzip.
+
+    The encoding follows the client's Accept-Encoding (brotli preferred, if
+    the module is installed). Only COMPRESSIBLE_MIMETYPES are touched, and
+    responses that are already encoded (the precompressed static files),
+    partial, or smaller than COMPRESS_MIN_SIZE go out unchanged. A body with
+    a Content-Length (up to BUFFER_LIMIT) is compressed in one go and keeps
+    one; a streamed body (e.g. stream_template) is compressed chunk by chunk
+    and, with COMPRESS_STREAM_FLUSH, flushed after every chunk so the
+    browser still gets HTML as soon as it is rendered. ETags of compressed
+    responses are made weak, since the bytes differ per encoding, and so
+    are those of 304s to clients that accept compression, so revalidation
+    answers with the same validator as the 200 it revalidates.
+    """
+
+    BUFFER_LIMIT = 1024 * 1024
+
+    def __init__(self, app=None):
+        self.wsgi_app = None
+        self.min_size = 500
+        self.levels = {'br': 4, 'gzip': 6}
+        self.stream_flush = True
+        self.encodings = ('gzip',)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)  # bytes; smaller bodies don't shrink enough to pay
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)  # 0-11; above ~5 costs far more CPU per byte saved
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)  # 1-9
+        app.config.setdefault('COMPRESS_STREAM_FLUSH', True)
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.levels = {'br': app.config['COMPRESS_BROTLI_QUALITY'], 'gzip': app.config['COMPRESS_GZIP_LEVEL']}
+        self.stream_flush = app.config['COMPRESS_STREAM_FLUSH']
+        try:
+            import brotli  # noqa: F401
+            self.encodings = ('br', 'gzip')
+        except ImportError:
+            self.encodings = ('gzip',)
+        if app.config['COMPRESS_ENABLED']:
+            self.wsgi_app = app.wsgi_app
+            app.wsgi_app = self
+        app.extensions['response_compression'] = self
+
+    def negotiate(self, accept_encoding):
+        """The encoding to use for an Accept-Encoding header value, or None"""
+        if not accept_encoding:
+            return None
+        accepted = parse_accept_header(accept_encoding)
+        for encoding in self.encodings:
+            if accepted[encoding] > 0:
+                return encoding
+        return None
+
+    @staticmethod
+    def compressible_type(headers):
+        mimetype = (headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        return mimetype in COMPRESSIBLE_MIMETYPES
+
+    def compressible(self, status, headers):
+        if not self.compressible_type(headers):
+            return False
+        code = int(status.split(' ', 1)[0])
+        if code < 200 or code in (204, 206, 304) or 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        if 'no-transform' in (headers.get('Cache-Control') or ''):
+            return False
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+        encoding = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        state = {}
+
+        def capture(status, headers, exc_info=None):
+            if state.get('returned'):  # start_response called lazily, while iterating: too late to rewrite
+                return start_response(status, headers, exc_info)
+            headers = Headers(headers)
+            if encoding and status.startswith('304') and \
+                    (self.compressible_type(headers) or environ.get(NOT_MODIFIED_TYPE) in COMPRESSIBLE_MIMETYPES):
+                _vary_on_encoding(headers)
+                _weaken_etag(headers)
+            elif self.compressible(status, headers):
+                _vary_on_encoding(headers)
+                state['encoding'] = encoding
+            if exc_info is not None or not state.get('encoding'):
+                state.pop('encoding', None)
+                return start_response(status, headers.to_wsgi_list(), exc_info)
+            state['status'], state['headers'] = status, headers
+            return None  # write() isn't supported for compressed responses
+
+        body = self.wsgi_app(environ, capture)
+        state['returned'] = True
+        if 'status' not in state:
+            return body
+        status, headers = state['status'], state['headers']
+        compressor = Compressor(state['encoding'], self.levels[state['encoding']])
+        headers['Content-Encoding'] = state['encoding']
+        headers.remove('Accept-Ranges')
+        _weaken_etag(headers)
+
+        length = headers.get('Content-Length', type=int)
+        if length is not None and length <= self.BUFFER_LIMIT:
+            try:
+                data = compressor.compress(b''.join(body)) + compressor.finish()
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+            headers['Content-Length'] = str(len(data))
+            start_response(status, headers.to_wsgi_list())
+            return [data]
+
+        headers.remove('Content-Length')
+        start_response(status, headers.to_wsgi_list())
+        # Flush per chunk only for bodies produced as they are sent (not large files)
+        return self._stream(body, compressor, flush=self.stream_flush and length is None)
+
+    def _stream(self, body, compressor, flush):
+        try:
+            for chunk in body:
+                data = compressor.compress(chunk, flush=flush)
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+
+response_compression = ResponseCompression()
@@ -0,0 +1,234 @@
+# services/db_pool.py
+from database import db
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool, QueuePool
+import json
+import os
+import socket
+import threading
+import time
+
+POOL_STRATEGIES = ('queue', 'null')
+
+
+class _TimedPool:
+    """Pool mixin reporting how long each checkout waited (see PoolStats)"""
+
+    on_wait = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeout:
+            if self.on_wait is not None:
+                self.on_wait(self, time.perf_counter() - start, timed_out=True)
+            raise
+        if self.on_wait is not None:
+            self.on_wait(self, time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()  # engine.dispose() swaps in the copy
+        pool.on_wait = self.on_wait
+        return pool
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPool, NullPool):
+    pass
+
+
+def engine_options(database_url, strategy='queue', size=5, max_overflow=5, timeout=30, recycle=300):
+    """SQLALCHEMY_ENGINE_OPTIONS for a pool strategy.
+
+    ``queue`` keeps up to ``size`` connections open per worker and opens up to
+    ``max_overflow`` more under load, so a deploy can hold
+    (size + max_overflow) x workers x instances connections; size it against
+    the server's max_connections. ``null`` opens a connection per checkout
+    and closes it on return, for running behind PgBouncer in transaction
+    mode, which then owns the real pool. Nothing may outlive a transaction
+    there, so server-side prepared statements are turned off for psycopg 3
+    (psycopg2 never prepares); yield_per cursors live inside the
+    transaction and are fine.
+    """
+    if strategy == 'null':
+        options = {'poolclass': TimedNullPool}
+        if database_url.startswith('postgresql+psycopg:'):
+            options['connect_args'] = {'prepare_threshold': None}
+        return options
+    if strategy != 'queue':
+        raise ValueError(f"Unknown DB_POOL strategy: {strategy} (expected one of {', '.join(POOL_STRATEGIES)})")
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_pre_ping': True,
+        'pool_recycle': recycle,
+        'pool_size': size,
+        'max_overflow': max_overflow,
+        'pool_timeout': timeout,
+    }
+
+
+class PoolStats:
+    """Per-worker connection pool telemetry, for sizing workers against the
+    database's connection limit.
+
+    For every engine (the primary and each read replica) it counts
+    checkouts, time spent waiting for a connection, waits slower than
+    DB_POOL_SLOW_WAIT_MS, pool timeouts, checkouts served from overflow
+    connections, new connections and the peak number in use. Every
+    DB_POOL_STATS_INTERVAL seconds a worker that is serving requests
+    publishes its numbers to the shared store, so ``collect`` (behind
+    /admin/db-pool) shows all workers, not just the one answering.
+    """
+
+    KEY_PREFIX = 'db_pool:'
+    WORKERS_KEY = 'db_pool:workers'
+
+    def __init__(self, app=None, kv=None):
+        self.kv = None
+        self.strategy = 'queue'
+        self.interval = 30
+        self.slow_wait = 0.05
+        self.max_overflow = 10
+        self.binds = {}
+        self.started_at = time.time()
+        self._next_publish = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, kv)
+
+    def init_app(self, app, kv):
+        app.config.setdefault('DB_POOL', 'queue')
+        app.config.setdefault('DB_POOL_STATS_INTERVAL', 30)  # seconds
+        app.config.setdefault('DB_POOL_SLOW_WAIT_MS', 50)
+        self.kv = kv
+        self.strategy = app.config['DB_POOL']
+        self.interval = app.config['DB_POOL_STATS_INTERVAL']
+        self.slow_wait = app.config['DB_POOL_SLOW_WAIT_MS'] / 1000
+        self.max_overflow = (app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}).get('max_overflow', 10)
+        with app.app_context():
+            for key, engine in db.engines.items():
+                self.watch(key or 'primary', engine)
+        app.after_request(self._publish_due)
+        app.extensions['pool_stats'] = self
+
+    def watch(self, name, engine):
+        """Start counting for ``engine`` under ``name``"""
+        counters = self.binds[name] = {
+            'checkouts': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0, 'slow_waits': 0,
+            'timeouts': 0, 'overflow_checkouts': 0, 'connects': 0, 'invalidated': 0,
+            'in_use': 0, 'peak_in_use': 0,
+        }
+
+        def on_wait(pool, waited, timed_out=False):
+            with self._lock:
+                if timed_out:
+                    counters['timeouts'] += 1
+                    return
+                counters['checkouts'] += 1
+                counters['wait_ms_total'] += waited * 1000
+                counters['wait_ms_max'] = max(counters['wait_ms_max'], waited * 1000)
+                if waited >= self.slow_wait:
+                    counters['slow_waits'] += 1
+                if isinstance(pool, QueuePool) and pool.overflow() > 0:
+                    counters['overflow_checkouts'] += 1
+
+        def count(counter, delta=1):
+            def listener(*args):
+                with self._lock:
+                    counters[counter] += delta
+                    if counter == 'in_use':
+                        counters['peak_in_use'] = max(counters['peak_in_use'], counters['in_use'])
+            return listener
+
+        if isinstance(engine.pool, _TimedPool):
+            engine.pool.on_wait = on_wait
+        event.listen(engine, 'connect', count('connects'))
+        event.listen(engine, 'invalidate', count('invalidated'))
+        event.listen(engine, 'checkout', count('in_use'))
+        event.listen(engine, 'checkin', count('in_use', -1))
+        counters['_engine'] = engine
+
+    @property
+    def worker(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def snapshot(self):
+        """This worker's numbers"""
+        binds = {}
+        with self._lock:
+            for name, counters in self.binds.items():
+                stats = {key: value for key, value in counters.items() if not key.startswith('_')}
+                stats['wait_ms_total'] = round(stats['wait_ms_total'], 2)
+                stats['wait_ms_max'] = round(stats['wait_ms_max'], 2)
+                stats['wait_ms_avg'] = round(stats['wait_ms_total'] / stats['checkouts'], 3) if stats['checkouts'] else 0
+                pool = counters['_engine'].pool
+                if isinstance(pool, QueuePool):
+                    stats['pool_size'] = pool.size()
+                    stats['max_connections'] = pool.size() + self.max_overflow
+                stats['status'] = pool.status()
+                binds[name] = stats
+        return {
+            'worker': self.worker,
+            'strategy': self.strategy,
+            'uptime_seconds': int(time.time() - self.started_at),
+            'published_at': int(time.time()),
+            'binds': binds,
+        }
+
+    def publish(self):
+        """Share this worker's snapshot through the store"""
+        snapshot = self.snapshot()
+        ttl = self.interval * 3
+        self.kv.set(self.KEY_PREFIX + snapshot['worker'], json.dumps(snapshot), ttl=ttl)
+
+        def register(value):
+            workers = json.loads(value) if value else {}
+            now = time.time()
+            workers = {worker: seen for worker, seen in workers.items() if now - seen < ttl}
+            workers[snapshot['worker']] = now
+            return json.dumps(workers), None
+
+        self.kv.update(self.WORKERS_KEY, register, ttl=ttl)
+
+    def collect(self):
+        """Snapshots of every worker that published recently, with totals per bind"""
+        workers = {self.worker: self.snapshot()}
+        try:
+            registered = json.loads(self.kv.get(self.WORKERS_KEY) or '{}')
+            for worker in registered:
+                if worker not in workers:
+                    value = self.kv.get(self.KEY_PREFIX + worker)
+                    if value:
+                        workers[worker] = json.loads(value)
+        except Exception as e:
+            current_app.logger.warning(f"Pool stats of other workers unavailable: {str(e)}")
+
+        totals = {}
+        for snapshot in workers.values():
+            for name, stats in snapshot['binds'].items():
+                total = totals.setdefault(name, {'workers': 0, 'in_use': 0, 'peak_in_use': 0, 'max_connections': 0,
+                                                 'checkouts': 0, 'slow_waits': 0, 'timeouts': 0, 'overflow_checkouts': 0})
+                total['workers'] += 1
+                for key in ('in_use', 'peak_in_use', 'max_connections', 'checkouts', 'slow_waits', 'timeouts', 'overflow_checkouts'):
+                    total[key] += stats.get(key, 0)
+        return {'totals': totals, 'workers': sorted(workers.values(), key=lambda snapshot: snapshot['worker'])}
+
+    def _publish_due(self, response):
+        now = time.monotonic()
+        if now >= self._next_publish:
+            self._next_publish = now + self.interval
+            try:
+                self.publish()
+            except Exception as e:
+                current_app.logger.warning(f"Pool stats not published: {str(e)}")
+        return response
+
+
+pool_stats = PoolStats()
@@ -0,0 +1,166 @@
+# services/firebase_tokens.py
+from firebase_admin import auth as firebase_auth
+from google.auth import exceptions as google_exceptions
+from google.auth import jwt as google_jwt
+import hashlib
+import re
+import requests
+import threading
+import time
+
+from .cache import TTLCache
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+ISSUER_PREFIX = 'https://securetoken.google.com/'
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+class FirebaseTokenVerifier:
+    """Verifies Firebase ID tokens against locally cached signing keys.
+
+    Drop-in for ``firebase_auth.verify_id_token``: same checks (RS256
+    signature, audience, issuer, subject, expiry) and the same error types,
+    but Google's certificates are kept in memory for as long as their
+    Cache-Control max-age allows and refreshed by a background thread before
+    they expire, so logins never wait on the fetch. Verified claims are
+    memoized until the token's own ``exp``.
+    """
+
+    MIN_REFETCH_INTERVAL = 5  # seconds between fetches triggered by an unknown key id
+
+    def __init__(self, app=None):
+        self.project_id = None
+        self.certs_url = GOOGLE_CERTS_URL
+        self.refresh_margin = 60
+        self.clock_skew = 0
+        self._certs = {}
+        self._certs_expire_at = 0
+        self._refresh_at = 0
+        self._last_fetch = 0
+        self._fetch_lock = threading.Lock()
+        self._claims = TTLCache(maxsize=10000, ttl=3600)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FIREBASE_CERTS_URL', GOOGLE_CERTS_URL)
+        app.config.setdefault('FIREBASE_CERTS_REFRESH_MARGIN', 60)  # seconds before expiry
+        app.config.setdefault('FIREBASE_TOKEN_CACHE_SIZE', 10000)
+        app.config.setdefault('FIREBASE_CLOCK_SKEW', 0)  # seconds, up to 60
+        self.project_id = app.config.get('FIREBASE_PROJECT_ID')
+        self.certs_url = app.config['FIREBASE_CERTS_URL']
+        self.refresh_margin = app.config['FIREBASE_CERTS_REFRESH_MARGIN']
+        self.clock_skew = app.config['FIREBASE_CLOCK_SKEW']
+        self._claims = TTLCache(maxsize=app.config['FIREBASE_TOKEN_CACHE_SIZE'], ttl=3600)
+        app.extensions['firebase_tokens'] = self
+
+    def verify_id_token(self, id_token):
+        """Return the decoded claims of a valid Firebase ID token"""
+        if not isinstance(id_token, str) or not id_token:
+            raise firebase_auth.InvalidIdTokenError('ID token must be a non-empty string')
+        if not self.project_id:
+            raise ValueError('FIREBASE_PROJECT_ID is not configured')
+
+        key = hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+        claims = self._claims.get(key)
+        if claims is not None:
+            if claims['exp'] + self.clock_skew < time.time():
+                raise firebase_auth.ExpiredIdTokenError('Token expired', None)
+            return dict(claims)
+
+        claims = self._decode(id_token)
+        ttl = claims['exp'] + self.clock_skew - time.time()
+        if ttl > 0:
+            self._claims.set(key, claims, ttl=ttl)
+        return dict(claims)
+
+    def _decode(self, id_token):
+        try:
+            header = google_jwt.decode_header(id_token)
+        except (ValueError, google_exceptions.GoogleAuthError) as e:
+            raise firebase_auth.InvalidIdTokenError(f'Malformed ID token: {str(e)}', cause=e)
+        if header.get('alg') != 'RS256':
+            raise firebase_auth.InvalidIdTokenError('ID token must be signed with RS256')
+
+        certs = self._get_certs(header.get('kid'))
+        try:
+            claims = google_jwt.decode(
+                id_token,
+                certs=certs,
+                audience=self.project_id,
+                clock_skew_in_seconds=self.clock_skew
+            )
+        except (ValueError, google_exceptions.GoogleAuthError) as e:
+            if 'Token expired' in str(e):
+                raise firebase_auth.ExpiredIdTokenError('Token expired', cause=e)
+            raise firebase_auth.InvalidIdTokenError(f'Invalid ID token: {str(e)}', cause=e)
+
+        if claims.get('iss') != ISSUER_PREFIX + self.project_id:
+            raise firebase_auth.InvalidIdTokenError('ID token has an incorrect "iss" claim')
+        subject = claims.get('sub')
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise firebase_auth.InvalidIdTokenError('ID token has an invalid "sub" claim')
+        if claims.get('auth_time', 0) > time.time() + self.clock_skew:
+            raise firebase_auth.InvalidIdTokenError('ID token has an "auth_time" in the future')
+        claims['uid'] = subject
+        return claims
+
+    def _get_certs(self, kid):
+        self._start_refresher()
+        if time.time() >= self._certs_expire_at:
+            self.refresh()
+        elif kid not in self._certs and time.time() - self._last_fetch > self.MIN_REFETCH_INTERVAL:
+            try:
+                self.refresh()  # Keys may have rotated early
+            except firebase_auth.CertificateFetchError:
+                pass
+        if kid not in self._certs:
+            raise firebase_auth.InvalidIdTokenError('ID token has a "kid" claim which does not correspond to a known public key')
+        return self._certs
+
+    def refresh(self):
+        """Fetch the signing certificates now and remember them for their max-age"""
+        requested = time.time()
+        with self._fetch_lock:
+            if self._last_fetch >= requested:
+                return  # Another thread fetched them while we waited
+            try:
+                response = requests.get(self.certs_url, timeout=10)
+                response.raise_for_status()
+                certs = response.json()
+            except (requests.RequestException, ValueError) as e:
+                raise firebase_auth.CertificateFetchError(f'Failed to fetch public key certificates: {str(e)}', e)
+
+            match = _MAX_AGE.search(response.headers.get('Cache-Control', ''))
+            max_age = int(match.group(1)) if match else 0
+            self._certs = certs
+            self._last_fetch = time.time()
+            self._certs_expire_at = self._last_fetch + max_age
+            # Refresh refresh_margin seconds early, but never before half the max-age
+            self._refresh_at = self._last_fetch + max(max_age - self.refresh_margin, max_age / 2)
+
+    def _start_refresher(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='firebase-certs')
+                    self._thread.daemon = True
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            delay = self._refresh_at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.refresh()
+            except Exception:
+                time.sleep(30)  # Keep serving the cached keys; try again shortly
+                continue
+            if self._refresh_at <= time.time():
+                time.sleep(self.refresh_margin)  # No usable max-age; don't spin
+
+
+firebase_tokens = FirebaseTokenVerifier()
@@ -0,0 +1,103 @@
+# services/fragment_cache.py
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+import hashlib
+
+
+class FragmentCacheExtension(Extension):
+    """Adds ``{% cache key[, ttl] %}...{% endcache %}`` to templates.
+
+    The body is rendered once and its HTML kept under ``key`` for ``ttl``
+    seconds (FRAGMENT_CACHE_TTL if omitted). Only wrap markup that is the
+    same for every visitor; anything the body reads from the context is
+    frozen into the cached copy. Without a configured cache (or with
+    FRAGMENT_CACHE_ENABLED off) the body is just rendered every time.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, ttl, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        return cache.fetch(key, ttl, caller)
+
+
+class FragmentCache:
+    """Rendered template fragments kept in the shared key-value store.
+
+    Keys are prefixed with a deploy version (FRAGMENT_CACHE_VERSION, e.g. the
+    release's git SHA, or else a digest of every template's source), so a
+    deploy that changes templates never serves fragments rendered by the
+    previous one. Store errors fall back to rendering the fragment.
+    """
+
+    KEY_PREFIX = 'fragment:'
+
+    def __init__(self, app=None, kv=None):
+        self.app = None
+        self.kv = None
+        self.ttl = 300
+        self.version = ''
+        if app is not None:
+            self.init_app(app, kv)
+
+    def init_app(self, app, kv):
+        app.config.setdefault('FRAGMENT_CACHE_ENABLED', not app.debug)
+        app.config.setdefault('FRAGMENT_CACHE_TTL', 300)  # seconds
+        app.config.setdefault('FRAGMENT_CACHE_VERSION', '')
+        self.app = app
+        self.kv = kv
+        self.ttl = app.config['FRAGMENT_CACHE_TTL']
+        self.version = app.config['FRAGMENT_CACHE_VERSION'] or self._templates_digest(app.jinja_env)
+
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self if app.config['FRAGMENT_CACHE_ENABLED'] else None
+        app.extensions['fragment_cache'] = self
+
+    @staticmethod
+    def _templates_digest(env):
+        digest = hashlib.sha1()
+        for name in sorted(env.list_templates()):
+            digest.update(name.encode('utf-8'))
+            digest.update(env.loader.get_source(env, name)[0].encode('utf-8'))
+        return digest.hexdigest()[:12]
+
+    def _key(self, key):
+        return f"{self.KEY_PREFIX}{self.version}:{key}"
+
+    def fetch(self, key, ttl, render):
+        """Cached HTML for ``key``, rendering and storing it with ``render`` on a miss"""
+        full_key = self._key(key)
+        try:
+            html = self.kv.get(full_key)
+        except Exception as e:
+            self.app.logger.warning(f"Fragment cache read failed for {key}: {str(e)}")
+            return render()
+        if html is not None:
+            return Markup(html)
+
+        html = render()
+        try:
+            self.kv.set(full_key, str(html), ttl=ttl or self.ttl)
+        except Exception as e:
+            self.app.logger.warning(f"Fragment cache write failed for {key}: {str(e)}")
+        return html
+
+
+fragment_cache = FragmentCache()
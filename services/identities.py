@@ -0,0 +1,170 @@
+# services/identities.py
+from database import db
+from models import User, LoginIdentity
+from sqlalchemy import and_, delete, event, exists, insert, inspect, or_, select
+import re
+import time
+
+DEFAULT_COUNTRY_CODE = '91'
+_NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_phone(phone, country_code=DEFAULT_COUNTRY_CODE):
+    """Return ``phone`` in E.164 form ('+919876543210'), or None if it has no digits.
+
+    Numbers without a leading '+' or '00' are taken to be in ``country_code``;
+    a trunk '0' before a 10-digit number is dropped.
+    """
+    if not phone:
+        return None
+    digits = _NON_DIGITS.sub('', phone)
+    if not digits:
+        return None
+    if phone.strip().startswith('+'):
+        return '+' + digits
+    if digits.startswith('00'):
+        return '+' + digits[2:]
+    if len(digits) == 11 and digits.startswith('0'):
+        digits = digits[1:]
+    if len(digits) == 10:
+        return '+' + country_code + digits
+    return '+' + digits
+
+
+def national_phone(phone, country_code=DEFAULT_COUNTRY_CODE):
+    """Return ``phone`` as stored in ``users.phone``: 10 digits for home-country
+    numbers, all digits (no '+') otherwise, '' if there are none."""
+    e164 = normalize_phone(phone, country_code)
+    if e164 is None:
+        return ''
+    if e164.startswith('+' + country_code) and len(e164) == len(country_code) + 11:
+        return e164[len(country_code) + 1:]
+    return e164[1:]
+
+
+def user_identities(user):
+    """The (kind, value) pairs ``user`` can sign in with"""
+    identities = []
+    if user.email:
+        identities.append(('email', user.email.strip().lower()))
+    if user.username:
+        identities.append(('username', user.username))
+    phone = normalize_phone(user.phone)
+    if phone:
+        identities.append(('phone', phone))
+    return identities
+
+
+class LoginIdentities:
+    """Resolves the user behind an email, username or phone in one indexed probe.
+
+    ``login_identities`` holds every normalized identifier (lowercased email,
+    username, E.164 phone) of every user. It is kept current from the
+    session: whenever a flush inserts a User or changes one's email,
+    username or phone, that user's rows are rewritten on the same
+    connection, so they commit or roll back together with the User.
+    backfill_login_identities.py fills the table for users created before
+    it existed; until then a miss falls back to querying the users table
+    directly. Each worker checks for users without identity rows once it
+    starts and then at most every LOGIN_IDENTITIES_RECHECK_SECONDS until the
+    backfill is seen, so failed logins don't repeat the check.
+    """
+
+    WATCHED = ('email', 'username', 'phone')
+
+    def __init__(self, app=None):
+        self._complete = None
+        self._recheck_at = 0
+        self.recheck_seconds = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LOGIN_IDENTITIES_RECHECK_SECONDS', 60)
+        self.recheck_seconds = app.config['LOGIN_IDENTITIES_RECHECK_SECONDS']
+        event.listen(db.session, 'after_flush', self._after_flush)
+        app.extensions['login_identities'] = self
+
+    def find_by_login(self, identifier):
+        """User whose email (any case) or username is ``identifier``"""
+        if not identifier:
+            return None
+        identifier = identifier.strip()
+        user = self._find([('email', identifier.lower()), ('username', identifier)])
+        if user is None and not self.is_complete():
+            user = User.query.filter(
+                (User.email == identifier) | (User.username == identifier)
+            ).first()
+        return user
+
+    def find_by_email(self, email):
+        """User whose email is ``email`` in any case"""
+        if not email:
+            return None
+        user = self._find([('email', email.strip().lower())])
+        if user is None and not self.is_complete():
+            user = User.query.filter_by(email=email).first()
+        return user
+
+    def find_by_phone(self, phone):
+        """User with ``phone`` (any formatting the app accepts)"""
+        e164 = normalize_phone(phone)
+        if e164 is None:
+            return None
+        user = self._find([('phone', e164)])
+        if user is None and not self.is_complete():
+            user = User.query.filter_by(phone=national_phone(phone)).first()
+        return user
+
+    def _find(self, identities):
+        match = or_(*[and_(LoginIdentity.kind == kind, LoginIdentity.value == value)
+                      for kind, value in identities])
+        return db.session.scalars(
+            select(User)
+            .join(LoginIdentity, LoginIdentity.user_id == User.id)
+            .where(match)
+            .order_by(LoginIdentity.kind, User.id)  # an email match wins over a username
+            .limit(1)
+        ).first()
+
+    def is_complete(self):
+        """True once every user has identity rows (the backfill has run).
+        A False answer is kept for LOGIN_IDENTITIES_RECHECK_SECONDS."""
+        if not self._complete and time.monotonic() >= self._recheck_at:
+            missing = db.session.execute(
+                select(User.id)
+                .where(~exists().where(LoginIdentity.user_id == User.id))
+                .limit(1)
+            ).first()
+            self._complete = missing is None
+            self._recheck_at = time.monotonic() + self.recheck_seconds
+        return bool(self._complete)
+
+    def write(self, connection, users):
+        """Replace the identity rows of ``users`` (already flushed) on ``connection``"""
+        ids = [user.id for user in users]
+        if not ids:
+            return
+        connection.execute(delete(LoginIdentity).where(LoginIdentity.user_id.in_(ids)))
+        rows = [{'user_id': user.id, 'kind': kind, 'value': value[:255]}
+                for user in users for kind, value in user_identities(user)]
+        if rows:
+            connection.execute(insert(LoginIdentity), rows)
+
+    def _after_flush(self, session, flush_context):
+        changed = [obj for obj in session.new if isinstance(obj, User)]
+        for obj in session.dirty:
+            if isinstance(obj, User):
+                state = inspect(obj)
+                if any(state.attrs[key].history.has_changes() for key in self.WATCHED):
+                    changed.append(obj)
+        removed = [obj.id for obj in session.deleted if isinstance(obj, User)]
+
+        if changed or removed:
+            connection = session.connection()
+            self.write(connection, changed)
+            if removed:
+                connection.execute(delete(LoginIdentity).where(LoginIdentity.user_id.in_(removed)))
+
+
+login_identities = LoginIdentities()
@@ -0,0 +1,178 @@
+# services/images.py
+from flask import url_for
+from markupsafe import Markup, escape
+import hashlib
+import json
+import os
+import queue
+import threading
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif')
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+
+class ImageVariants:
+    """Resized WebP/AVIF copies of static images, and the markup that uses them.
+
+    Variants live in ``static/<IMAGE_VARIANT_DIR>/<content hash>/<width>.<format>``
+    next to a ``meta.json`` written last, so a directory with ``meta.json``
+    is complete and identical sources share one set of files. Uploads are
+    queued for a background thread as they are saved; other images are
+    queued the first time a page asks for them (build_image_variants.py
+    does all of static/ up front). ``picture()`` emits a plain ``<img>``
+    until an image's variants exist.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.static_folder = None
+        self.folder = None
+        self.widths = (320, 640, 960, 1280)
+        self.formats = ('avif', 'webp')
+        self.quality = {'avif': 50, 'webp': 80}
+        self._info = {}
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IMAGE_VARIANT_DIR', 'variants')  # under static/
+        app.config.setdefault('IMAGE_VARIANT_WIDTHS', (320, 640, 960, 1280))
+        app.config.setdefault('IMAGE_VARIANT_FORMATS', ('avif', 'webp'))  # preferred first
+        app.config.setdefault('IMAGE_VARIANT_QUALITY', {'avif': 50, 'webp': 80})
+        self.app = app
+        self.static_folder = app.static_folder
+        self.folder = os.path.join(app.static_folder, app.config['IMAGE_VARIANT_DIR'])
+        self.widths = tuple(sorted(app.config['IMAGE_VARIANT_WIDTHS']))
+        self.formats = tuple(app.config['IMAGE_VARIANT_FORMATS'])
+        self.quality = app.config['IMAGE_VARIANT_QUALITY']
+        app.add_template_global(self.picture, 'picture')
+        app.extensions['image_variants'] = self
+
+    @staticmethod
+    def digest(file_path):
+        """Content hash naming the variant directory of ``file_path``"""
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        return sha.hexdigest()[:20]
+
+    def meta_path(self, digest):
+        return os.path.join(self.folder, digest, 'meta.json')
+
+    def generate(self, path):
+        """Write the variants of static file ``path`` (if missing) and return their metadata"""
+        from PIL import Image, ImageOps, features
+
+        source = os.path.join(self.static_folder, path)
+        digest = self.digest(source)
+        meta_path = self.meta_path(digest)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                return json.load(f)
+
+        out_dir = os.path.dirname(meta_path)
+        os.makedirs(out_dir, exist_ok=True)
+        with Image.open(source) as image:
+            meta = {'digest': digest, 'width': image.width, 'height': image.height, 'widths': [], 'formats': []}
+            if not getattr(image, 'is_animated', False):
+                image = ImageOps.exif_transpose(image)
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+                meta['width'], meta['height'] = image.size
+                meta['widths'] = sorted({min(width, image.width) for width in self.widths})
+                meta['formats'] = [fmt for fmt in self.formats if features.check(fmt)]
+
+                for width in meta['widths']:
+                    height = max(1, round(image.height * width / image.width))
+                    resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                    for fmt in meta['formats']:
+                        target = os.path.join(out_dir, f'{width}.{fmt}')
+                        resized.save(target + '.tmp', format=fmt.upper(), quality=self.quality.get(fmt, 80))
+                        os.replace(target + '.tmp', target)
+
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)  # Marks the directory complete
+        return meta
+
+    def lookup(self, path):
+        """Variant metadata for static file ``path``, or None if not generated yet"""
+        try:
+            stat = os.stat(os.path.join(self.static_folder, path))
+        except OSError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._info.get(path)
+        if cached and cached[0] == signature and cached[1] is not None:
+            return cached[1]
+
+        digest = cached[2] if cached and cached[0] == signature else None
+        if digest is None:
+            digest = self.digest(os.path.join(self.static_folder, path))
+        meta = None
+        if os.path.exists(self.meta_path(digest)):
+            with open(self.meta_path(digest)) as f:
+                meta = json.load(f)
+        with self._lock:
+            self._info[path] = (signature, meta, digest)
+        if meta is None:
+            self.enqueue(path)
+        return meta
+
+    def enqueue(self, path):
+        """Generate the variants of static file ``path`` on the background thread"""
+        if not path.lower().endswith(IMAGE_EXTENSIONS):
+            return
+        with self._lock:
+            if path in self._queued:
+                return
+            self._queued.add(path)
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='image-variants')
+                    self._thread.daemon = True
+                    self._thread.start()
+        self._queue.put(path)
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                self.generate(path)
+            except Exception as e:
+                self.app.logger.error(f"Image variant error for {path}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._queued.discard(path)
+                    self._info.pop(path, None)
+
+    def picture(self, path, alt='', sizes='100vw', **attrs):
+        """``<picture>`` with AVIF/WebP srcsets for static file ``path`` (template global)"""
+        meta = self.lookup(path) if path else None
+        img_attrs = {'src': url_for('static', filename=path), 'alt': alt}
+        if meta:
+            img_attrs.update(width=meta['width'], height=meta['height'])
+        img_attrs.update(attrs)
+        img = '<img ' + ' '.join(f'{name}="{escape(value)}"' for name, value in img_attrs.items()) + '>'
+        if not meta or not meta['formats']:
+            return Markup(img)
+
+        sources = []
+        base = f"{self.app.config['IMAGE_VARIANT_DIR']}/{meta['digest']}"
+        for fmt in meta['formats']:
+            srcset = ', '.join(
+                f"{url_for('static', filename=f'{base}/{width}.{fmt}')} {width}w" for width in meta['widths']
+            )
+            sources.append(f'<source type="{MIME_TYPES[fmt]}" srcset="{escape(srcset)}" sizes="{escape(sizes)}">')
+        return Markup('<picture>' + ''.join(sources) + img + '</picture>')
+
+
+image_variants = ImageVariants()
@@ -0,0 +1,144 @@
+# services/kv.py
+import threading
+import time
+
+
+class MemoryKV:
+    """In-process key-value store with per-key expiry.
+
+    Only shared by the threads of one worker, so it suits local development
+    and single-worker deploys. Expired keys are dropped when read and swept
+    periodically on write.
+    """
+
+    SWEEP_EVERY = 256  # writes between full expiry sweeps
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def _wrote(self, now):
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            self._sweep(now)
+
+    def _sweep(self, now):
+        expired = [key for key, (_, expires_at) in self._data.items()
+                   if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._data[key]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None):
+        """Store ``value``, replacing any previous value and expiry"""
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (value, now + ttl if ttl else None)
+            self._wrote(now)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def update(self, key, fn, ttl=None):
+        """Atomically replace the value of ``key`` with ``fn(old)``.
+
+        ``fn`` gets the current value (or None) and returns ``(new_value, result)``;
+        ``result`` is returned to the caller.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            value, result = fn(entry[0] if entry else None)
+            self._data[key] = (value, now + ttl if ttl else None)
+            self._wrote(now)
+            return result
+
+    def pop_if_equal(self, key, expected):
+        """Atomically delete ``key`` if it holds ``expected``; True if it did"""
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is None or entry[0] != expected:
+                return False
+            del self._data[key]
+            return True
+
+
+class RedisKV:
+    """Key-value store backed by any server speaking the Redis protocol.
+
+    Shared across workers and instances. Needs the ``redis`` package; for
+    local runs, scripts/fake_redis.py serves the subset of commands used here.
+    """
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        """Store ``value``, replacing any previous value and expiry"""
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key):
+        return bool(self.client.delete(key))
+
+    def update(self, key, fn, ttl=None):
+        """Atomically replace the value of ``key`` with ``fn(old)``.
+
+        ``fn`` gets the current value (or None) and returns ``(new_value, result)``;
+        ``result`` is returned to the caller. ``fn`` may run more than once if
+        another client changes the key concurrently.
+        """
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    value, result = fn(pipe.get(key))
+                    pipe.multi()
+                    pipe.set(key, value, px=int(ttl * 1000) if ttl else None)
+                    pipe.execute()
+                    return result
+                except self._redis.WatchError:
+                    continue
+
+    def pop_if_equal(self, key, expected):
+        """Atomically delete ``key`` if it holds ``expected``; True if it did"""
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    if pipe.get(key) != expected:
+                        pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    pipe.delete(key)
+                    return bool(pipe.execute()[0])
+                except self._redis.WatchError:
+                    continue  # Key changed between GET and DEL; look again
+
+
+def create_kv(url=None):
+    """Build a store from a URL: memory:// (default) or redis://, rediss://, unix://"""
+    if not url or url.startswith('memory://'):
+        return MemoryKV()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisKV(url)
+    raise ValueError(f"Unsupported key-value store URL: {url}")
@@ -0,0 +1,51 @@
+# services/otp.py
+import secrets
+import string
+
+
+class OTPStore:
+    """Email OTP codes kept in a key-value store with native expiry.
+
+    There is at most one live code per email: issuing a new one overwrites
+    the previous code in a single write, and verification deletes the code
+    only if it matches, so a code can be consumed once. Codes simply expire
+    after OTP_TTL seconds; nothing accumulates in the database.
+
+    With the in-process memory backend every worker has its own codes, so
+    deployments running more than one worker must set REDIS_URL.
+    """
+
+    KEY_PREFIX = 'otp:'
+
+    def __init__(self, app=None, kv=None):
+        self.kv = None
+        self.ttl = 300
+        self.length = 6
+        if app is not None:
+            self.init_app(app, kv)
+
+    def init_app(self, app, kv):
+        app.config.setdefault('OTP_TTL', 300)  # seconds
+        app.config.setdefault('OTP_LENGTH', 6)
+        self.kv = kv
+        self.ttl = app.config['OTP_TTL']
+        self.length = app.config['OTP_LENGTH']
+        app.extensions['otp_store'] = self
+
+    def _key(self, email):
+        return f"{self.KEY_PREFIX}{email}"
+
+    def issue(self, email):
+        """Create a new code for ``email``, invalidating any earlier one"""
+        code = ''.join(secrets.choice(string.digits) for _ in range(self.length))
+        self.kv.set(self._key(email), code, ttl=self.ttl)
+        return code
+
+    def verify(self, email, code):
+        """Consume the code for ``email`` if it matches. Returns True at most once per code."""
+        if not email or not code:
+            return False
+        return self.kv.pop_if_equal(self._key(email), str(code).strip())
+
+
+otp_store = OTPStore()
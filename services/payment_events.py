@@ -0,0 +1,164 @@
+# services/payment_events.py
+from database import db
+from models import Order, Booking, PaymentEvent
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timezone
+import threading
+
+from .payments import apply_captured_payments
+
+
+class PaymentEventConsumer:
+    """Stores Razorpay webhook events and applies them from a background thread.
+
+    The webhook request only verifies the signature and inserts the raw
+    event (deduplicated on the Razorpay event id), so it returns in a single
+    INSERT. A daemon thread per worker drains unprocessed events in batches
+    and applies the Order/Booking status transitions with set-based UPDATEs.
+    Workers claim batches with SKIP LOCKED, so several gunicorn workers can
+    run consumers side by side without applying an event twice. The thread
+    starts with a worker's first request, so events stored before a restart
+    are applied on the next poll rather than after the next webhook.
+    """
+
+    HANDLED_EVENTS = ('payment.captured', 'order.paid')
+
+    def __init__(self, app=None):
+        self.app = None
+        self._order_paid_handler = None
+        self._booking_paid_handler = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PAYMENT_EVENT_BATCH_SIZE', 200)
+        app.config.setdefault('PAYMENT_EVENT_POLL_SECONDS', 5)
+        app.before_request(self._ensure_started)
+        app.extensions['payment_events'] = self
+        self.app = app
+
+    def order_paid_handler(self, callback):
+        """Register a callback run for every Order the consumer marks paid"""
+        self._order_paid_handler = callback
+        return callback
+
+    def booking_paid_handler(self, callback):
+        """Register a callback run for every Booking the consumer marks paid"""
+        self._booking_paid_handler = callback
+        return callback
+
+    @staticmethod
+    def parse(event):
+        """Extract (razorpay_order_id, razorpay_payment_id, paid_at) from a webhook body"""
+        payload = event.get('payload', {})
+        payment = payload.get('payment', {}).get('entity', {})
+        order = payload.get('order', {}).get('entity', {})
+
+        razorpay_order_id = order.get('id') or payment.get('order_id')
+        paid_at = payment.get('created_at') or event.get('created_at')
+        if paid_at:
+            paid_at = datetime.fromtimestamp(int(paid_at), tz=timezone.utc)
+        return razorpay_order_id, payment.get('id'), paid_at
+
+    def record(self, event_id, event, raw_body):
+        """Append a verified webhook event. Returns False if it was already stored."""
+        razorpay_order_id, payment_id, _ = self.parse(event)
+        db.session.add(PaymentEvent(
+            event_id=event_id,
+            event_type=event.get('event', ''),
+            razorpay_order_id=razorpay_order_id,
+            razorpay_payment_id=payment_id,
+            payload=raw_body
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Razorpay retries deliveries; the unique event_id makes them no-ops
+            db.session.rollback()
+            return False
+
+        self.wake()
+        return True
+
+    def wake(self):
+        """Start the consumer thread if needed and signal it that work is waiting"""
+        self._ensure_started()
+        self._wakeup.set()
+
+    def _ensure_started(self):
+        # Per worker: gunicorn forks after import, so not from init_app
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='payment-events')
+                    self._thread.daemon = True
+                    self._thread.start()
+
+    def _run(self):
+        poll_seconds = self.app.config['PAYMENT_EVENT_POLL_SECONDS']
+        batch_size = self.app.config['PAYMENT_EVENT_BATCH_SIZE']
+        while True:
+            self._wakeup.wait(timeout=poll_seconds)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    while self.process_batch(batch_size) == batch_size:
+                        pass
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Payment event consumer error: {str(e)}")
+
+    def process_batch(self, batch_size=None):
+        """Apply one batch of unprocessed events and return how many were claimed"""
+        batch_size = batch_size or self.app.config['PAYMENT_EVENT_BATCH_SIZE']
+        events = PaymentEvent.query.filter(PaymentEvent.processed_at.is_(None))\
+            .order_by(PaymentEvent.id)\
+            .limit(batch_size)\
+            .with_for_update(skip_locked=True)\
+            .all()
+        if not events:
+            return 0
+
+        # Several events usually describe the same payment (payment.captured
+        # followed by order.paid); one capture per Razorpay order is enough
+        captures = {}
+        for event in events:
+            if event.event_type not in self.HANDLED_EVENTS:
+                continue
+            razorpay_order_id, payment_id, paid_at = self.parse(event.get_payload())
+            if razorpay_order_id and payment_id:
+                captures[razorpay_order_id] = (payment_id, paid_at or event.received_at)
+
+        order_ids, booking_ids = apply_captured_payments(captures)
+
+        db.session.execute(
+            update(PaymentEvent)
+            .where(PaymentEvent.id.in_([event.id for event in events]))
+            .values(processed_at=datetime.now(timezone.utc)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+
+        self.app.logger.info(
+            f"Applied {len(events)} payment event(s): "
+            f"{len(order_ids)} order(s), {len(booking_ids)} booking(s) marked paid"
+        )
+        self._notify(Order, order_ids, self._order_paid_handler)
+        self._notify(Booking, booking_ids, self._booking_paid_handler)
+        return len(events)
+
+    def _notify(self, model, ids, handler):
+        if not ids or handler is None:
+            return
+        for record in model.query.filter(model.id.in_(ids)).all():
+            try:
+                handler(record)
+            except Exception as e:
+                self.app.logger.error(f"Payment notification failed for {model.__name__} {record.id}: {str(e)}")
+
+
+payment_events = PaymentEventConsumer()
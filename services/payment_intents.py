@@ -0,0 +1,108 @@
+# services/payment_intents.py
+from database import db
+from flask import current_app
+from sqlalchemy import or_, select, update
+import requests
+
+from .cache import TTLCache, KeyedLocks
+
+
+class TimeoutSession(requests.Session):
+    """requests session applying ``timeout`` to every call that sets none
+    (the Razorpay client never passes one)"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class PaymentIntents:
+    """Idempotent Razorpay order creation for Orders and Bookings.
+
+    Retries and double-clicks on the payment page reuse the Razorpay order
+    already attached to the record while it is still payable and was created
+    for the same amount. Concurrent requests for the same order/booking
+    number are collapsed by a per-key lock in this worker; across workers a
+    new Razorpay order is only attached if the record still holds the one
+    it replaces (compare-and-set), so no row lock or database connection is
+    held while Razorpay answers. Known-good intents are cached so repeat
+    calls skip the Razorpay API entirely.
+    """
+
+    PAYABLE_STATUSES = ('created', 'attempted')
+
+    def __init__(self, app=None, client=None):
+        self.client = None
+        self._cache = None
+        self._locks = KeyedLocks()
+        if app is not None:
+            self.init_app(app, client)
+
+    def init_app(self, app, client):
+        app.config.setdefault('PAYMENT_INTENT_TTL', 900)  # seconds
+        self.client = client
+        self._cache = TTLCache(maxsize=10000, ttl=app.config['PAYMENT_INTENT_TTL'])
+        app.extensions['payment_intents'] = self
+
+    def get_or_create(self, record, reference, amount_in_paise, order_payload):
+        """Return the Razorpay order id to pay ``record`` with.
+
+        ``reference`` is the order_number/booking_number and ``order_payload``
+        the body for ``order.create``; it is only sent when no reusable
+        Razorpay order exists.
+        """
+        intent = (record.razorpay_order_id, amount_in_paise)
+        if record.razorpay_order_id and self._cache.get(reference) == intent:
+            return record.razorpay_order_id
+
+        model = type(record)
+        with self._locks(reference):
+            # Re-read: another worker may have just created it
+            razorpay_order_id = self._current(model, record.id)
+            db.session.commit()  # Hold no connection while Razorpay answers
+
+            reusable = razorpay_order_id and (
+                self._cache.get(reference) == (razorpay_order_id, amount_in_paise)
+                or self._is_reusable(razorpay_order_id, amount_in_paise)
+            )
+            if not reusable:
+                created = self.client.order.create(order_payload)['id']
+                attached = db.session.execute(
+                    update(model)
+                    .where(model.id == record.id)
+                    .where(or_(model.razorpay_order_id.is_(None), model.razorpay_order_id == razorpay_order_id))
+                    .values(razorpay_order_id=created),
+                    execution_options={'synchronize_session': False}
+                ).rowcount
+                if attached:
+                    razorpay_order_id = created
+                else:
+                    # Another worker attached its own order meanwhile; ours is left unpaid and expires
+                    razorpay_order_id = self._current(model, record.id)
+                db.session.commit()
+
+            self._cache.set(reference, (razorpay_order_id, amount_in_paise))
+            return razorpay_order_id
+
+    @staticmethod
+    def _current(model, record_id):
+        return db.session.execute(
+            select(model.razorpay_order_id).where(model.id == record_id)
+        ).scalar_one()
+
+    def _is_reusable(self, razorpay_order_id, amount_in_paise):
+        """Check an existing Razorpay order is unpaid and for the current amount"""
+        try:
+            razorpay_order = self.client.order.fetch(razorpay_order_id)
+        except Exception as e:
+            current_app.logger.warning(f"Could not fetch Razorpay order {razorpay_order_id}: {str(e)}")
+            return False
+        return (razorpay_order.get('amount') == amount_in_paise
+                and razorpay_order.get('status') in self.PAYABLE_STATUSES)
+
+
+payment_intents = PaymentIntents()
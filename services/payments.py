@@ -0,0 +1,48 @@
+# services/payments.py
+from database import db
+from models import Order, Booking
+from sqlalchemy import update, case
+
+
+def apply_captured_payments(captures, batch_size=1000):
+    """Mark Orders and Bookings paid for a set of captured Razorpay payments.
+
+    ``captures`` maps razorpay_order_id -> (razorpay_payment_id, paid_at).
+    Every chunk is applied with a single UPDATE per table (the per-row
+    payment id and date are picked with CASE on razorpay_order_id) instead
+    of one UPDATE per row, and rows that are already paid are left alone,
+    so replaying the same captures is harmless.
+
+    The caller owns the transaction. Returns the ids of the Orders and
+    Bookings that transitioned to paid.
+    """
+    rows = [(razorpay_order_id, payment_id, paid_at)
+            for razorpay_order_id, (payment_id, paid_at) in captures.items()]
+
+    order_ids, booking_ids = [], []
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        order_ids.extend(_mark_paid(Order, chunk))
+        booking_ids.extend(_mark_paid(Booking, chunk))
+    return order_ids, booking_ids
+
+
+def _mark_paid(model, rows):
+    """Run one set-based paid transition for ``model`` and return changed ids"""
+    payment_ids = {razorpay_order_id: payment_id for razorpay_order_id, payment_id, _ in rows}
+    paid_dates = {razorpay_order_id: paid_at for razorpay_order_id, _, paid_at in rows}
+
+    stmt = (
+        update(model)
+        .where(model.razorpay_order_id.in_(list(payment_ids)))
+        .where(db.func.coalesce(model.payment_status, '') != 'paid')
+        .values(
+            payment_status='paid',
+            status='confirmed',
+            payment_reference=case(payment_ids, value=model.razorpay_order_id),
+            payment_date=case(paid_dates, value=model.razorpay_order_id)
+        )
+        .returning(model.id)
+    )
+    result = db.session.execute(stmt, execution_options={'synchronize_session': False})
+    return list(result.scalars())
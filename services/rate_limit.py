@@ -0,0 +1,106 @@
+# services/rate_limit.py
+from flask import request
+from functools import wraps
+import math
+import time
+
+
+class RateLimitExceeded(Exception):
+    """Raised by a rate-limited route; the app answers 429 with Retry-After"""
+
+    def __init__(self, retry_after, message=None):
+        super().__init__(message or 'Too many requests')
+        self.retry_after = retry_after
+        self.message = message
+
+
+def _client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def _json_field(name):
+    data = request.get_json(silent=True) or {}
+    return data.get(name)
+
+
+def _email():
+    email = _json_field('email')
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def _phone():
+    phone = _json_field('phone')
+    if not isinstance(phone, str):
+        return None
+    phone = phone.replace('+91', '').strip().lstrip('+')
+    return phone or None
+
+
+class RateLimiter:
+    """Token-bucket rate limits kept in the shared key-value store.
+
+    Each (limit, identity) pair owns a bucket holding up to ``limit``
+    tokens that refills evenly over ``per`` seconds; a request takes one
+    token or is refused with the exact time until the next one. Buckets live
+    in the app's key-value store: per worker with memory://, shared across
+    workers and instances with Redis. Refused requests cost nothing, so a
+    client that waits out Retry-After gets through.
+    """
+
+    KEY_PREFIX = 'rl:'
+    KEY_FUNCS = {
+        'ip': _client_ip,
+        'email': _email,
+        'phone': _phone,
+    }
+
+    def __init__(self, app=None, kv=None):
+        self.kv = None
+        self.enabled = True
+        if app is not None:
+            self.init_app(app, kv)
+
+    def init_app(self, app, kv):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        self.kv = kv
+        self.enabled = app.config['RATELIMIT_ENABLED']
+        app.extensions['rate_limiter'] = self
+
+    def hit(self, name, identity, limit, per, message=None):
+        """Take a token for ``identity``; raise RateLimitExceeded if the bucket is empty"""
+        rate = limit / per  # tokens per second
+
+        def take(state):
+            now = time.time()
+            tokens, updated = (float(x) for x in state.split(':')) if state else (limit, now)
+            tokens = min(limit, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                return f"{tokens - 1}:{now}", 0
+            return f"{tokens}:{now}", (1 - tokens) / rate
+
+        retry_after = self.kv.update(f"{self.KEY_PREFIX}{name}:{identity}", take, ttl=per)
+        if retry_after:
+            raise RateLimitExceeded(max(1, math.ceil(retry_after)), message)
+
+    def limit(self, name, limit, per, by='ip', methods=None, message=None):
+        """Decorator limiting a route to ``limit`` requests per ``per`` seconds.
+
+        ``by`` is 'ip', 'email' or 'phone' (the latter two read the JSON body);
+        requests without that field are not counted against this limit.
+        Stack several decorators to limit by more than one key.
+        """
+        key_func = self.KEY_FUNCS[by]
+
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                if self.enabled and (methods is None or request.method in methods):
+                    identity = key_func()
+                    if identity:
+                        self.hit(f"{name}:{by}", identity, limit, per, message)
+                return f(*args, **kwargs)
+            return decorated_function
+        return decorator
+
+
+rate_limiter = RateLimiter()
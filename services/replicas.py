@@ -0,0 +1,91 @@
+# services/replicas.py
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+from functools import wraps
+import random
+import time
+
+from database import db
+
+REPLICA_BIND_PREFIX = 'replica_'  # SQLALCHEMY_BINDS keys that are read replicas
+
+
+class ReadReplicas:
+    """Sends the reads of GET and HEAD requests to a read replica.
+
+    Replicas are the ``replica_*`` entries of SQLALCHEMY_BINDS (built from
+    DATABASE_REPLICA_URLS); without any, everything uses the primary. A
+    GET/HEAD request picks one replica and reads from it until the request
+    flushes a change, after which it stays on the primary. Flushes,
+    INSERT/UPDATE/DELETE statements and ``with_for_update`` reads always use
+    the primary, as does all work outside a request (payment consumer,
+    scripts). GET views that write must be marked ``@read_replicas.primary``.
+
+    Read-your-writes: a request that wrote sets a cookie keeping that browser
+    on the primary for READ_YOUR_WRITES_SECONDS, so e.g. the payment page
+    after create_order never reads from a replica that hasn't caught up.
+    Pick the window above the replicas' worst replay lag.
+    """
+
+    COOKIE = 'db_primary_until'
+
+    def __init__(self, app=None):
+        self.keys = ()
+        self.window = 10
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('READ_YOUR_WRITES_SECONDS', 10)
+        self.window = app.config['READ_YOUR_WRITES_SECONDS']
+        binds = app.config.get('SQLALCHEMY_BINDS') or {}
+        self.keys = tuple(sorted(key for key in binds if key.startswith(REPLICA_BIND_PREFIX)))
+        if self.keys:
+            event.listen(db.session, 'after_flush', self._after_flush)
+            app.before_request(self._choose_replica)
+            app.after_request(self._pin_writer)
+        app.extensions['read_replicas'] = self
+
+    def primary(self, view):
+        """Keep ``view`` on the primary even for GET (views that read and then write)"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.pop('db_replica', None)
+            return view(*args, **kwargs)
+        return wrapper
+
+    def bind_for(self, clause=None):
+        """The replica engine for a read in the current request, or None for the primary"""
+        if not self.keys or not has_request_context():
+            return None
+        key = g.get('db_replica')
+        if key is None:
+            return None
+        if isinstance(clause, UpdateBase) or getattr(clause, '_for_update_arg', None) is not None:
+            return None
+        return db.engines[key]
+
+    def _choose_replica(self):
+        if request.method not in ('GET', 'HEAD'):
+            return
+        try:
+            pinned = float(request.cookies.get(self.COOKIE, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        if not pinned:
+            g.db_replica = random.choice(self.keys)
+
+    def _after_flush(self, session, flush_context):
+        if has_request_context():
+            g.db_wrote = True
+            g.pop('db_replica', None)  # the rest of the request reads its own writes
+
+    def _pin_writer(self, response):
+        if g.get('db_wrote'):
+            response.set_cookie(self.COOKIE, str(int(time.time()) + self.window), max_age=self.window,
+                                secure=request.is_secure, httponly=True, samesite='Lax')
+        return response
+
+
+read_replicas = ReadReplicas()
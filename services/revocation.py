@@ -0,0 +1,168 @@
+# services/revocation.py
+from database import db
+from models import RevokedToken
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timezone
+import hashlib
+import math
+import threading
+import time
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings.
+
+    ``in`` may return a false positive (about ``error_rate`` once
+    ``capacity`` items were added) but never a false negative.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        with self._lock:
+            for pos in positions:
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def __contains__(self, item):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class TokenRevocation:
+    """Revoked JWT IDs, checked on every protected request without a query.
+
+    Revocations are rows in ``revoked_tokens``. Each worker mirrors their
+    JTIs into an in-memory bloom filter and pulls newly added rows every
+    JWT_REVOCATION_SYNC_SECONDS from a background thread, so a token
+    revoked on one worker is refused by the others within that interval.
+    Concurrent logouts can commit out of id order, so each sync re-reads the
+    last JWT_REVOCATION_SYNC_OVERLAP ids as well; a row that became visible
+    after a higher id was synced is still picked up (re-adding is harmless).
+    A lookup that misses the filter is definitely not revoked; only filter
+    hits (revoked tokens and rare false positives) are confirmed in the
+    database. Expired rows are pruned and the filter rebuilt every
+    JWT_REVOCATION_REBUILD_SECONDS (sooner if the filter passes its
+    capacity), which keeps the false-positive rate near its target.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._filter = BloomFilter()
+        self._last_id = 0
+        self._last_rebuild = 0
+        self._sync_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JWT_REVOCATION_SYNC_SECONDS', 5)
+        app.config.setdefault('JWT_REVOCATION_SYNC_OVERLAP', 500)  # ids re-read for late commits
+        app.config.setdefault('JWT_REVOCATION_REBUILD_SECONDS', 3600)
+        app.config.setdefault('JWT_REVOCATION_CAPACITY', 100000)
+        app.config.setdefault('JWT_REVOCATION_ERROR_RATE', 0.001)
+        app.extensions['token_revocation'] = self
+        self.app = app
+
+    def revoke(self, jti, expires_at, user_id=None):
+        """Record ``jti`` as revoked until ``expires_at`` (a unix timestamp)"""
+        db.session.add(RevokedToken(
+            jti=jti,
+            user_id=user_id,
+            expires_at=datetime.fromtimestamp(expires_at, tz=timezone.utc)
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Already revoked
+        self._filter.add(jti)
+
+    def is_revoked(self, jti):
+        """True if ``jti`` has been revoked"""
+        self._ensure_started()
+        if jti not in self._filter:
+            return False
+        return db.session.execute(
+            select(RevokedToken.id).where(RevokedToken.jti == jti)
+        ).first() is not None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self.rebuild()  # First request in this worker fills the filter
+                    self._thread = threading.Thread(target=self._run, name='jwt-revocation')
+                    self._thread.daemon = True
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.app.config['JWT_REVOCATION_SYNC_SECONDS'])
+            with self.app.app_context():
+                try:
+                    due = time.time() - self._last_rebuild >= self.app.config['JWT_REVOCATION_REBUILD_SECONDS']
+                    if due or self._filter.count > self._filter.capacity:
+                        self.prune()
+                        self.rebuild()
+                    else:
+                        self.sync()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"JWT revocation sync error: {str(e)}")
+
+    def sync(self):
+        """Add revocations recorded (by any worker) since the last sync, plus
+        the recent ones again in case a lower id committed late"""
+        with self._sync_lock:
+            rows = db.session.execute(
+                select(RevokedToken.id, RevokedToken.jti)
+                .where(RevokedToken.id > self._last_id - self.app.config['JWT_REVOCATION_SYNC_OVERLAP'])
+                .order_by(RevokedToken.id)
+            ).all()
+            for row_id, jti in rows:
+                if jti not in self._filter:  # Re-read rows would inflate the count that triggers rebuilds
+                    self._filter.add(jti)
+                self._last_id = max(self._last_id, row_id)
+
+    def rebuild(self):
+        """Replace the filter with one holding only unexpired revocations"""
+        with self._sync_lock:
+            now = datetime.now(timezone.utc)
+            rows = db.session.execute(
+                select(RevokedToken.id, RevokedToken.jti).where(RevokedToken.expires_at > now)
+            ).all()
+            capacity = max(self.app.config['JWT_REVOCATION_CAPACITY'], len(rows) * 2)
+            bloom = BloomFilter(capacity, self.app.config['JWT_REVOCATION_ERROR_RATE'])
+            for _, jti in rows:
+                bloom.add(jti)
+            self._filter = bloom
+            self._last_id = max([row_id for row_id, _ in rows] + [self._last_id])
+            self._last_rebuild = time.time()
+
+    def prune(self):
+        """Delete revocations whose tokens have expired anyway"""
+        db.session.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at <= datetime.now(timezone.utc)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+
+
+token_revocation = TokenRevocation()
@@ -0,0 +1,172 @@
+# services/storage.py
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+_CONTENT_KEY = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$')
+
+
+def is_content_key(key):
+    """True for keys made by ``save`` (their bytes can never change)"""
+    return bool(_CONTENT_KEY.match(key))
+
+
+def _spool(stream, directory=None):
+    """Copy ``stream`` to a temp file chunk by chunk, hashing as it goes.
+    Returns (temp path, sha256 hex digest, size)."""
+    sha = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                sha.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, sha.hexdigest(), size
+
+
+class LocalStorage:
+    """Content-addressed files under a local directory (static/uploads by default)"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def local_path(self, key):
+        """Filesystem path of ``key`` (local backends only)"""
+        return self.path(key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    @property
+    def temp_dir(self):
+        """Where uploads are spooled, so ``store`` can move them into place"""
+        os.makedirs(self.root, exist_ok=True)
+        return self.root
+
+    def save(self, stream, extension):
+        """Store the bytes of ``stream`` and return (key, created).
+
+        The key is ``<2 hex>/<sha256>.<extension>``: uploading the same bytes
+        twice returns the existing key and writes nothing.
+        """
+        temp_path, digest, _ = _spool(stream, self.temp_dir)
+        return self.store(temp_path, digest, extension)
+
+    def store(self, temp_path, digest, extension, size=None):
+        """Move a spooled file with sha256 ``digest`` into place; returns (key, created)"""
+        key = f"{digest[:2]}/{digest}.{extension.lower()}"
+        target = self.path(key)
+        if os.path.exists(target):
+            os.unlink(temp_path)
+            return key, False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, target)
+        return key, True
+
+    def url(self, key):
+        """Public URL of ``key``, or None to serve it from this app"""
+        return None
+
+
+class S3Storage:
+    """Content-addressed objects in an S3-compatible bucket.
+
+    Objects are written with an immutable far-future Cache-Control, so the
+    bucket (or a CDN in front of it) can serve them directly. For MinIO or
+    scripts/fake_s3.py set S3_ENDPOINT_URL; S3_PUBLIC_URL is the base URL
+    objects are read from (default: the endpoint's path-style bucket URL).
+    """
+
+    def __init__(self, url, endpoint_url=None, public_url=None, region=None):
+        import boto3
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+        self._client_error = ClientError
+
+        location = url[len('s3://'):]
+        self.bucket, _, self.prefix = location.partition('/')
+        self.prefix = self.prefix.strip('/')
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            config=Config(
+                s3={'addressing_style': 'path' if endpoint_url else 'auto'},
+                request_checksum_calculation='when_required',
+                response_checksum_validation='when_required'
+            )
+        )
+        if public_url:
+            self.public_url = public_url.rstrip('/')
+        elif endpoint_url:
+            self.public_url = f"{endpoint_url.rstrip('/')}/{self.bucket}"
+        else:
+            self.public_url = f"https://{self.bucket}.s3.amazonaws.com"
+
+    def _object_key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def local_path(self, key):
+        return None
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except self._client_error as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    temp_dir = None  # system default
+
+    def save(self, stream, extension):
+        """Store the bytes of ``stream`` and return (key, created); see LocalStorage.save"""
+        temp_path, digest, size = _spool(stream)
+        return self.store(temp_path, digest, extension, size)
+
+    def store(self, temp_path, digest, extension, size=None):
+        """Upload a spooled file with sha256 ``digest`` (then delete it); returns (key, created)"""
+        if size is None:
+            size = os.path.getsize(temp_path)
+        try:
+            key = f"{digest[:2]}/{digest}.{extension.lower()}"
+            if self.exists(key):
+                return key, False
+            with open(temp_path, 'rb') as f:
+                self.client.put_object(
+                    Bucket=self.bucket,
+                    Key=self._object_key(key),
+                    Body=f,
+                    ContentLength=size,
+                    ContentType=mimetypes.guess_type(key)[0] or 'application/octet-stream',
+                    CacheControl=IMMUTABLE_CACHE_CONTROL
+                )
+            return key, True
+        finally:
+            os.unlink(temp_path)
+
+    def url(self, key):
+        return f"{self.public_url}/{self._object_key(key)}"
+
+
+def create_storage(url, local_root, endpoint_url=None, public_url=None, region=None):
+    """Build upload storage from a URL: local:// (default, files under ``local_root``) or s3://bucket[/prefix]"""
+    if not url or url.startswith('local://'):
+        return LocalStorage(local_root)
+    if url.startswith('s3://'):
+        return S3Storage(url, endpoint_url, public_url, region)
+    raise ValueError(f"Unsupported upload storage URL: {url}")
@@ -0,0 +1,64 @@
+# services/streaming.py
+from flask import Response, current_app, stream_template
+from flask_wtf.csrf import generate_csrf
+
+STREAM_BATCH_SIZE = 100  # rows fetched per round trip while a listing streams
+STREAM_BUFFER_SIZE = 8 * 1024  # bytes of HTML gathered before a write
+FLUSH_AFTER = '</head>'  # sent at once, so the browser starts on CSS/fonts
+
+
+class StreamedQuery:
+    """A query handed to a template in place of ``query.all()``.
+
+    Iterating it fetches STREAM_BATCH_SIZE rows at a time with ``yield_per``
+    (a server-side cursor on PostgreSQL), so a streamed page holds one batch
+    of rows in memory rather than the whole result set. ``|length`` and
+    ``{% if rows %}`` run a COUNT instead, once.
+    """
+
+    def __init__(self, query, batch_size=STREAM_BATCH_SIZE):
+        self.query = query
+        self.batch_size = batch_size
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.query.order_by(None).count()
+        return self._count
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return iter(self.query.yield_per(self.batch_size))
+
+
+def _buffered(chunks, size):
+    buffer, buffered = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size or FLUSH_AFTER in chunk:
+            yield ''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_page(template_name, buffer_size=STREAM_BUFFER_SIZE, **context):
+    """Render ``template_name`` as the response is sent.
+
+    ``stream_template`` keeps the request context (and the database session)
+    alive with ``stream_with_context`` until the last chunk is written. The
+    template's small chunks are joined into writes of about ``buffer_size``
+    bytes, except that everything up to ``</head>`` goes out as soon as it is
+    rendered. Errors raised mid-page can no longer become an error response,
+    so load anything that may fail (or 404) before calling this.
+
+    The session cookie goes out with the headers, before the template runs,
+    so the CSRF token is created here; ``csrf_token()`` in the template then
+    returns it instead of storing a new one in a session that is never saved.
+    """
+    if 'csrf' in current_app.extensions:
+        generate_csrf()  # Cached for the request; csrf_token() in the template reuses it
+    return Response(_buffered(stream_template(template_name, **context), buffer_size), mimetype='text/html')
@@ -0,0 +1,158 @@
+# services/uploads.py
+from flask import request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import NEED_DATA, Data, Epilogue, Field, File, MultipartDecoder
+import hashlib
+import os
+import tempfile
+
+from .storage import CHUNK_SIZE
+
+# Leading bytes of each image type we accept, keyed by the extension it is stored under
+SIGNATURES = {
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'jpg': (b'\xff\xd8\xff',),
+    'gif': (b'GIF87a', b'GIF89a'),
+    'webp': (b'RIFF',),  # ...followed by WEBP at offset 8
+}
+SNIFF_SIZE = 12
+FORM_OVERHEAD = 64 * 1024  # other fields and part headers allowed on top of the file
+EXTENSION_ALIASES = {'jpeg': 'jpg'}
+
+
+def sniff_image_type(head):
+    """Image type of a file from its first bytes, or None if it isn't one we accept"""
+    for kind, prefixes in SIGNATURES.items():
+        if head.startswith(prefixes):
+            if kind == 'webp' and head[8:12] != b'WEBP':
+                continue
+            return kind
+    return None
+
+
+def _format_size(size):
+    if size >= 1024 * 1024:
+        return f'{size / (1024 * 1024):g} MB'
+    return f'{size // 1024} KB'
+
+
+class UploadRejected(Exception):
+    """The upload was refused, usually before all of it was read"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class ReceivedFile:
+    """An upload spooled to a temp file; hand it to ``storage.store`` or ``discard`` it"""
+
+    def __init__(self, temp_path, digest, size, extension, filename):
+        self.temp_path = temp_path
+        self.digest = digest
+        self.size = size
+        self.extension = extension
+        self.filename = filename
+
+    def discard(self):
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)
+
+
+def receive_file(field='file', max_size=5 * 1024 * 1024, allowed=('png', 'jpg', 'gif'), directory=None):
+    """Stream the ``field`` file of a multipart request to a temp file.
+
+    The body is read CHUNK_SIZE bytes at a time straight from the WSGI
+    input and each chunk is written out as soon as it is parsed, so memory
+    stays around one chunk however big the upload is. A Content-Length over
+    ``max_size`` is refused before reading anything, the first bytes of the
+    file must match an ``allowed`` image signature (the extension of the
+    client's filename is checked too), and reading stops as soon as the
+    body passes ``max_size`` (chunked requests included). Raises
+    UploadRejected; the caller must not touch ``request.form`` or
+    ``request.files`` afterwards.
+    """
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    boundary = options.get('boundary')
+    if mimetype != 'multipart/form-data' or not boundary:
+        raise UploadRejected('No file part')
+    too_large = f'File too large (max {_format_size(max_size)})'
+    if request.content_length is not None and request.content_length > max_size + FORM_OVERHEAD:
+        raise UploadRejected(too_large, 413)
+
+    allowed = {EXTENSION_ALIASES.get(extension, extension) for extension in allowed}
+    decoder = MultipartDecoder(boundary.encode('latin-1'))
+    stream = request.stream
+    read = 0
+    finished = False  # whole body handed to the decoder
+    received = None
+    current = None  # name of the part being read
+    head = b''
+    output = None
+    sha = None
+
+    def fail(message, status=400):
+        if output is not None:
+            output.close()
+        if received is not None:
+            received.discard()
+        raise UploadRejected(message, status)
+
+    try:
+        while True:
+            event = decoder.next_event()
+            if event is NEED_DATA:
+                if finished:
+                    break
+                chunk = stream.read(CHUNK_SIZE)
+                read += len(chunk)
+                if read > max_size + FORM_OVERHEAD:
+                    fail(too_large, 413)
+                finished = not chunk
+                decoder.receive_data(chunk or None)
+                continue
+            if isinstance(event, Epilogue):
+                break
+            if isinstance(event, (Field, File)):
+                current = event.name
+                if isinstance(event, File) and event.name == field and received is None:
+                    filename = event.filename or ''
+                    if not filename:
+                        fail('No selected file')
+                    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+                    if EXTENSION_ALIASES.get(extension, extension) not in allowed:
+                        fail('Invalid file type', 415)
+                    fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=directory)
+                    output = os.fdopen(fd, 'wb')
+                    sha = hashlib.sha256()
+                    received = ReceivedFile(temp_path, None, 0, None, filename)
+                continue
+            if isinstance(event, Data) and output is not None and current == field:
+                data = event.data
+                if received.extension is None:
+                    head += data
+                    if len(head) < SNIFF_SIZE and event.more_data:
+                        continue
+                    kind = sniff_image_type(head)
+                    if kind not in allowed:
+                        fail('Invalid file type', 415)
+                    received.extension = kind
+                    data, head = head, b''
+                received.size += len(data)
+                if received.size > max_size:
+                    fail(too_large, 413)
+                sha.update(data)
+                output.write(data)
+                if not event.more_data:
+                    output.close()
+                    output = None
+                    received.digest = sha.hexdigest()
+                    return received
+    except RequestEntityTooLarge:
+        fail(too_large, 413)
+    except ValueError:
+        fail('Malformed upload')
+
+    fail('No file part')
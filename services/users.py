@@ -0,0 +1,62 @@
+# services/users.py
+from database import db
+from models import User
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from .cache import TTLCache
+
+
+class UserLoader:
+    """Loads the user behind a JWT without a query on every request.
+
+    flask_jwt_extended already keeps the loaded user for the rest of the
+    request; across requests the user's column values are kept for
+    USER_CACHE_TTL seconds and re-attached to the session without SQL. A
+    User updated or deleted in a flush is dropped from the cache then and
+    again on commit (so a read racing the commit can't re-cache old values);
+    the TTL bounds how long other workers can see stale values.
+    """
+
+    def __init__(self, app=None):
+        self._cache = TTLCache(maxsize=10000, ttl=30)
+        self._columns = [column.key for column in inspect(User).column_attrs]
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_CACHE_TTL', 30)  # seconds
+        app.config.setdefault('USER_CACHE_SIZE', 10000)
+        self._cache = TTLCache(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+        event.listen(db.session, 'after_flush', self._after_flush)
+        event.listen(db.session, 'after_commit', self._after_commit)
+        app.extensions['user_loader'] = self
+
+    def load(self, user_id):
+        """Return the User with ``user_id`` attached to the current session, or None"""
+        values = self._cache.get(user_id)
+        if values is None:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                self._cache.set(user_id, {key: getattr(user, key) for key in self._columns})
+            return user
+
+        user = User(**values)
+        make_transient_to_detached(user)  # as if freshly loaded, no pending changes
+        return db.session.merge(user, load=False)
+
+    def invalidate(self, user_id):
+        self._cache.delete(user_id)
+
+    def _after_flush(self, session, flush_context):
+        for obj in list(session.dirty) + list(session.deleted):
+            if isinstance(obj, User) and obj.id is not None:
+                self.invalidate(obj.id)
+                session.info.setdefault('changed_user_ids', set()).add(obj.id)
+
+    def _after_commit(self, session):
+        for user_id in session.info.pop('changed_user_ids', ()):
+            self.invalidate(user_id)
+
+
+user_loader = UserLoader()
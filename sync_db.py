@@ -1,7 +1,7 @@
 """
 Database Sync Script
 Compares SQLAlchemy models against the actual database schema
-and adds any missing columns/tables automatically.
+and adds any missing columns/tables/indexes automatically.
 
 Usage:
     python sync_db.py          # Dry run - shows what's missing
@@ -10,9 +10,10 @@ Usage:
 
 import sys
 from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
 from app import app
 from database import db
-from models import User, Pandit, PujaMaterial, Testimonial, Bundle, Admin, Booking, Order, OrderItem, OTP, Temple, TemplePuja
+from models import User, Pandit, PujaMaterial, Testimonial, Bundle, Admin, Booking, Order, OrderItem, OTP, Temple, TemplePuja, PaymentEvent, RevokedToken, LoginIdentity
 
 # Map SQLAlchemy types to PostgreSQL types
 TYPE_MAP = {
@@ -69,7 +70,7 @@ def get_default_clause(column):
 
 def sync_database(apply=False):
     """Compare models to database and report/fix mismatches."""
-    models = [User, Pandit, PujaMaterial, Testimonial, Bundle, Admin, Booking, Order, OrderItem, OTP, Temple, TemplePuja]
+    models = [User, Pandit, PujaMaterial, Testimonial, Bundle, Admin, Booking, Order, OrderItem, OTP, Temple, TemplePuja, PaymentEvent, RevokedToken, LoginIdentity]
 
     with app.app_context():
         inspector = inspect(db.engine)
@@ -122,11 +123,30 @@ def sync_database(apply=False):
                 })
                 print(f'  MISSING COLUMN: {col_name} ({pg_type}{default})')
 
+            # Find missing indexes (index=True columns added after the table was created)
+            db_indexes = {ix['name'] for ix in inspector.get_indexes(table_name, schema='public')}
+            missing_indexes = [index for index in model.__table__.indexes if index.name not in db_indexes]
+            if not missing_indexes:
+                print('  OK - all indexes in sync')
+
+            for index in missing_indexes:
+                sql = f'{CreateIndex(index).compile(db.engine)};'
+                changes.append({
+                    'type': 'missing_index',
+                    'table': table_name,
+                    'column': index.name,
+                    'sql': sql
+                })
+                print(f'  MISSING INDEX: {index.name}')
+
         if not changes:
             print('\nDatabase is fully in sync with models!')
             return
 
-        print(f'\n--- Found {len(changes)} change(s) needed ---\n')
+        counts = {kind: sum(1 for c in changes if c['type'] == kind)
+                  for kind in ('missing_table', 'missing_column', 'missing_index')}
+        print(f'\n--- Found {len(changes)} change(s) needed: {counts["missing_table"]} table(s), '
+              f'{counts["missing_column"]} column(s), {counts["missing_index"]} index(es) ---\n')
 
         if not apply:
             print('Run with --apply to execute these changes:')
@@ -147,13 +167,15 @@ def sync_database(apply=False):
             db.create_all()
             print('  Done.\n')
 
-        # Then, add missing columns
+        # Then, add missing columns and indexes (columns first, indexes may depend on them)
         missing_columns = [c for c in changes if c['type'] == 'missing_column']
+        missing_columns += [c for c in changes if c['type'] == 'missing_index']
         for c in missing_columns:
             try:
                 db.session.execute(text(c['sql']))
                 db.session.commit()
-                print(f'  ADDED: {c["table"]}.{c["column"]}')
+                kind = 'INDEX' if c['type'] == 'missing_index' else 'COLUMN'
+                print(f'  ADDED {kind}: {c["table"]}.{c["column"]}')
             except Exception as e:
                 db.session.rollback()
                 error_msg = str(e)
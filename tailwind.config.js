@@ -0,0 +1,9 @@
+/** Tailwind v3 config for static/css/app.css (built by build_css.py).
+ *  Matches the Play CDN defaults the templates were written against. */
+module.exports = {
+  content: ['./templates/**/*.html'],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+}